@@ -0,0 +1,92 @@
+# bench.py
+#
+# 合成データでルール・読み込み・書き出しの処理時間と最大メモリを計測し、基準と比べる。
+#
+#   python app/bench.py --rows 1000000 --save-baseline     # 基準を記録
+#   python app/bench.py --rows 1000000                     # 基準と比較（後退があれば終了コード 1）
+
+import argparse
+import os
+import sys
+from datetime import datetime
+
+from benchmarks.generator import DataSpec, ensure_csv
+from benchmarks.runner import (
+    DEFAULT_RSS_TOLERANCE, DEFAULT_TIME_TOLERANCE, compare, load_results, run_suite, save_results,
+)
+from benchmarks.scenarios import SCENARIOS, select_scenarios
+
+BENCH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+DEFAULT_RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ベンチマークを実行して基準と比較する")
+    parser.add_argument("scenarios", nargs="*", help="実行するシナリオ名（既定: すべて）")
+    parser.add_argument("--rows", type=int, default=200_000, help="行数")
+    parser.add_argument("--width", type=int, default=10, help="追加の数値列の本数")
+    parser.add_argument("--cardinality", type=int, default=50, help="部署・コード列の値の種類数")
+    parser.add_argument("--encoding", default="utf-8", help="CSV の文字コード")
+    parser.add_argument("--seed", type=int, default=0, help="乱数の種")
+    parser.add_argument("--repeat", type=int, default=3, help="シナリオごとの実行回数（最速値で比較）")
+    parser.add_argument("--data-dir", default=None, help="生成した CSV の置き場所（既定: 一時ディレクトリ）")
+    parser.add_argument("--output", default=None, help="結果 JSON（既定: benchmarks/results/日時.json）")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="比較する基準の結果 JSON")
+    parser.add_argument("--save-baseline", action="store_true", help="今回の結果を基準として保存する")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TIME_TOLERANCE,
+                        help="処理時間の許容増加率（0.25 = 25%%）")
+    parser.add_argument("--rss-tolerance", type=float, default=DEFAULT_RSS_TOLERANCE,
+                        help="最大メモリの許容増加率")
+    parser.add_argument("--list", action="store_true", help="シナリオの一覧を表示する")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for scenario in SCENARIOS:
+            print(f"{scenario.name:<20} {scenario.kind:<12} {scenario.description}")
+        return 0
+
+    scenarios = select_scenarios(args.scenarios)
+    spec = DataSpec(args.rows, args.width, args.cardinality, args.encoding, args.seed)
+    path = ensure_csv(spec, args.data_dir)
+    print(f"データ: {path} ({os.path.getsize(path) / 1024 / 1024:.1f} MB, {spec.rows:,} 行)")
+    print(f"シナリオ: {len(scenarios)} 件 × {args.repeat} 回")
+    print("----------------------------------------")
+
+    results = run_suite(scenarios, path, spec, repeat=args.repeat)
+
+    output = args.output or os.path.join(
+        DEFAULT_RESULTS_DIR, datetime.now().strftime("%Y%m%d_%H%M%S") + ".json"
+    )
+    save_results(results, output)
+    print("----------------------------------------")
+    print(f"結果: {output}")
+
+    if args.save_baseline:
+        save_results(results, args.baseline)
+        print(f"基準として保存: {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print("基準がありません（--save-baseline で作成）")
+        return 0
+
+    try:
+        regressions, lines = compare(results, load_results(args.baseline), args.tolerance, args.rss_tolerance)
+    except ValueError as e:
+        print(e)
+        return 0
+    print(f"基準との比較: {args.baseline}")
+    for line in lines:
+        print(line)
+    if regressions:
+        print("----------------------------------------")
+        print(f"後退: {len(regressions)} 件")
+        for note in regressions:
+            print(f"  - {note}")
+        return 1
+    print("後退なし")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+# benchmarks/generator.py
+
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+FAMILY_NAMES = ["田中", "鈴木", "佐藤", "高橋", "山田", "伊藤", "渡辺", "中村", "小林", "加藤"]
+GIVEN_NAMES = ["太郎", "花子", "次郎", "美咲", "健", "翔太", "陽菜", "大輔", "結衣", "蓮"]
+DEPARTMENTS = ["営業", "開発", "管理", "人事", "経理", "企画", "総務", "広報"]
+WORDS = ["至急", "確認", "対応済み", "保留", "要連絡", "新規", "継続", "完了", "再発", "調整中"]
+
+
+class DataSpec:
+    """
+    ベンチマーク用 CSV の形。同じ値なら同じ内容のファイルになる（seed で決まる）。
+
+    rows:        行数
+    width:       追加の数値列の本数（値1, 値2, ...）
+    cardinality: 部署・コード列の値の種類数
+    encoding:    ファイルの文字コード（utf-8 / utf-8-sig / cp932 など）
+    """
+
+    def __init__(self, rows=200_000, width=10, cardinality=50, encoding="utf-8", seed=0):
+        self.rows = rows
+        self.width = width
+        self.cardinality = max(1, cardinality)
+        self.encoding = encoding
+        self.seed = seed
+
+    def to_dict(self):
+        return {
+            "rows": self.rows,
+            "width": self.width,
+            "cardinality": self.cardinality,
+            "encoding": self.encoding,
+            "seed": self.seed,
+        }
+
+    def key(self):
+        encoded = json.dumps(self.to_dict(), sort_keys=True).encode("utf-8")
+        return hashlib.blake2b(encoded, digest_size=8).hexdigest()
+
+
+def generate_frame(spec):
+    """test_full_workflow.py のサンプル（名前・年齢・部署・給与）を大きくしたデータ"""
+    rng = np.random.default_rng(spec.seed)
+    n = spec.rows
+
+    departments = DEPARTMENTS[:spec.cardinality]
+    departments += [f"部署{i}" for i in range(len(departments), spec.cardinality)]
+    family = rng.integers(0, len(FAMILY_NAMES), n)
+    given = rng.integers(0, len(GIVEN_NAMES), n)
+    names = np.char.add(np.array(FAMILY_NAMES)[family], np.array(GIVEN_NAMES)[given])
+
+    # 備考: 1〜3語を空白区切りで並べた自由記述（contains 用）。1割は空欄
+    words = np.array(WORDS, dtype=object)
+    notes = words[rng.integers(0, len(WORDS), n)]
+    for _ in range(2):
+        more = rng.random(n) < 0.5
+        notes = np.where(more, notes + " " + words[rng.integers(0, len(WORDS), n)], notes)
+    notes = np.where(rng.random(n) < 0.1, None, notes)
+
+    data = {
+        "ID": np.arange(1, n + 1),
+        "名前": names,
+        "年齢": rng.integers(20, 66, n),
+        "部署": np.array(departments, dtype=object)[rng.integers(0, len(departments), n)],
+        "給与": rng.integers(200, 1200, n),
+        "評価": np.where(rng.random(n) < 0.05, np.nan, np.round(rng.normal(3.0, 1.0, n), 1)),
+        "コード": np.char.add("C", rng.integers(0, spec.cardinality, n).astype(str)),
+        "備考": notes,
+    }
+    for i in range(1, spec.width + 1):
+        data[f"値{i}"] = np.round(rng.random(n) * 1000, 3)
+    return pd.DataFrame(data)
+
+
+def generate_csv(spec, path):
+    """spec の CSV を path に書き出す"""
+    generate_frame(spec).to_csv(path, index=False, encoding=spec.encoding)
+    return path
+
+
+def ensure_csv(spec, data_dir=None):
+    """spec の CSV がなければ作り、パスを返す（同じ spec のファイルは使い回す）"""
+    data_dir = data_dir or os.path.join(tempfile.gettempdir(), "csv_workflow_bench")
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"bench_{spec.rows}x{spec.width}_{spec.key()}.csv")
+    if not os.path.exists(path):
+        # 書きかけのファイルを使わないよう、書き終えてから名前を付ける
+        partial = path + ".tmp"
+        generate_csv(spec, partial)
+        os.replace(partial, path)
+    return path
@@ -0,0 +1,222 @@
+# benchmarks/runner.py
+
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:
+    # Windows では最大使用メモリを取れないので記録しない
+    resource = None
+
+# 既定の許容範囲: 基準よりこれ以上遅い・大きいと後退とみなす
+DEFAULT_TIME_TOLERANCE = 0.25
+DEFAULT_RSS_TOLERANCE = 0.20
+# これより短い時間差はばらつきとして無視する（秒）
+MIN_TIME_DIFF = 0.01
+
+
+def peak_rss_mb():
+    """このプロセスの最大使用メモリ（MB）"""
+    try:
+        # Linux: VmHWM はこのプロセス自身の値（ru_maxrss は起動元のプロセスの値を引き継ぐことがある）
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux は KB、macOS はバイト
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def reset_peak_rss():
+    """最大使用メモリを現在値に戻す（Linux のみ）。戻せたら True"""
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def measure(scenario, path, repeat):
+    """
+    シナリオを repeat 回実行して計測する（呼び出しごとに新しいプロセスで実行される）。
+    読み込みなどの準備は計測に含めない。
+    """
+    import pandas as pd
+    from core.processor import CsvProcessor
+    from core.rule_factory import create_rule_from_dict
+    from core.services.csv_service import CsvService
+    from core.services.parse_cache import ParseCache
+    from core.streaming import StreamingProcessor
+
+    workdir = tempfile.mkdtemp(prefix="csvwf_bench_")
+    try:
+        CsvService.parse_cache = None
+        df = None
+        if scenario.kind == "load_cached":
+            CsvService.parse_cache = ParseCache(cache_dir=os.path.join(workdir, "cache"), min_file_size=0)
+            CsvService.load(path)
+        elif scenario.kind in ("save", "workflow"):
+            df = CsvService.load(path)
+        setup_rss = peak_rss_mb()
+        # 戻せた場合、peak_rss_mb は計測区間だけの最大値になる（準備の読み込みを含まない）
+        measured_only = reset_peak_rss()
+
+        output = os.path.join(workdir, "out.csv")
+        times = []
+        rows_in = rows_out = 0
+        for _ in range(repeat):
+            rules = [create_rule_from_dict(r) for r in scenario.rules]
+            start = time.perf_counter()
+            if scenario.kind in ("load", "load_cached"):
+                result = CsvService.load(path)
+                rows_in = rows_out = len(result)
+            elif scenario.kind == "save":
+                CsvService.save(df, output)
+                rows_in = rows_out = len(df)
+            elif scenario.kind == "workflow":
+                result = CsvProcessor(rules).execute(df)
+                rows_in, rows_out = len(df), len(result)
+            elif scenario.kind == "streaming":
+                processor = StreamingProcessor(rules)
+                rows_out = processor.execute(path, output)
+                rows_in = processor.rows_read
+            else:
+                raise ValueError(f"未知のシナリオ種別: {scenario.kind}")
+            times.append(time.perf_counter() - start)
+            result = None
+
+        best = min(times)
+        return {
+            "name": scenario.name,
+            "kind": scenario.kind,
+            "description": scenario.description,
+            "times": times,
+            "best": best,
+            "median": statistics.median(times),
+            "rows_in": rows_in,
+            "rows_out": rows_out,
+            "rows_per_sec": rows_in / best if best > 0 else None,
+            "setup_rss_mb": setup_rss,
+            "peak_rss_mb": peak_rss_mb(),
+            "peak_rss_excludes_setup": measured_only,
+            "pandas": pd.__version__,
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run_suite(scenarios, path, spec, repeat=3, out=print):
+    """シナリオを1つずつ別プロセスで実行し、結果の dict を返す"""
+    # 最大使用メモリをシナリオごとに分けるため、毎回新しいプロセスを起動する
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for scenario in scenarios:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            try:
+                result = pool.submit(measure, scenario, path, repeat).result()
+            except Exception as e:
+                out(f"[NG] {scenario.name}: {type(e).__name__}: {e}")
+                results.append({"name": scenario.name, "kind": scenario.kind, "error": f"{type(e).__name__}: {e}"})
+                continue
+        out(format_result(result))
+        results.append(result)
+
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "environment": environment(),
+        "data": dict(spec.to_dict(), path=os.path.basename(path), bytes=os.path.getsize(path)),
+        "repeat": repeat,
+        "scenarios": results,
+    }
+
+
+def environment():
+    import numpy as np
+    import pandas as pd
+    return {
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def format_result(result):
+    rss = result.get("peak_rss_mb")
+    rss_text = "-" if rss is None else f"{rss:,.0f} MB"
+    speed = result.get("rows_per_sec")
+    speed_text = "-" if speed is None else f"{speed:,.0f} 行/秒"
+    return (
+        f"[OK] {result['name']:<20} {result['best']:8.3f} 秒 (中央値 {result['median']:.3f}) "
+        f"{speed_text:>16}  最大メモリ {rss_text}  {result['rows_in']:,} → {result['rows_out']:,} 行"
+    )
+
+
+def save_results(results, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+def load_results(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(results, baseline, time_tolerance=DEFAULT_TIME_TOLERANCE, rss_tolerance=DEFAULT_RSS_TOLERANCE):
+    """
+    基準と比べて、後退したシナリオの説明のリストと比較表の行を返す。
+    データの形が違う基準とは比べない（ValueError）。
+    """
+    keys = ("rows", "width", "cardinality", "encoding", "seed")
+    if any(results["data"].get(k) != baseline["data"].get(k) for k in keys):
+        raise ValueError(
+            "基準とデータの条件が違うため比較できません: "
+            f"基準 {[baseline['data'].get(k) for k in keys]} / 今回 {[results['data'].get(k) for k in keys]}"
+        )
+
+    base = {s["name"]: s for s in baseline["scenarios"] if "error" not in s}
+    regressions = []
+    lines = []
+    for current in results["scenarios"]:
+        name = current["name"]
+        if "error" in current:
+            regressions.append(f"{name}: 実行に失敗 ({current['error']})")
+            continue
+        previous = base.get(name)
+        if previous is None:
+            lines.append(f"  {name:<20} 基準なし")
+            continue
+
+        ratio = current["best"] / previous["best"] if previous["best"] > 0 else 1.0
+        line = f"  {name:<20} {previous['best']:8.3f} → {current['best']:8.3f} 秒 ({ratio:5.2f} 倍)"
+        if ratio > 1 + time_tolerance and current["best"] - previous["best"] > MIN_TIME_DIFF:
+            regressions.append(f"{name}: 処理時間 {previous['best']:.3f} → {current['best']:.3f} 秒 ({ratio:.2f} 倍)")
+            line += "  ← 遅くなっています"
+
+        before, after = previous.get("peak_rss_mb"), current.get("peak_rss_mb")
+        if before and after:
+            rss_ratio = after / before
+            line += f"  メモリ {before:,.0f} → {after:,.0f} MB"
+            if rss_ratio > 1 + rss_tolerance:
+                regressions.append(f"{name}: 最大メモリ {before:,.0f} → {after:,.0f} MB ({rss_ratio:.2f} 倍)")
+                line += "  ← 増えています"
+        lines.append(line)
+    return regressions, lines
@@ -0,0 +1,118 @@
+# benchmarks/scenarios.py
+
+
+class Scenario:
+    """
+    計測する処理1つ。
+    kind: "load"        CsvService.load（解析済みキャッシュなし）
+          "load_cached" CsvService.load（解析済みキャッシュあり、作成は計測外）
+          "save"        CsvService.save
+          "workflow"    CsvProcessor.execute（読み込みは計測外）
+          "streaming"   StreamingProcessor.execute（読み込み・書き出しを含む）
+    rules: ルールの dict のリスト（ワークフロー JSON と同じ形）
+    """
+
+    def __init__(self, name, kind, rules=None, description=""):
+        self.name = name
+        self.kind = kind
+        self.rules = rules or []
+        self.description = description
+
+
+SCENARIOS = [
+    Scenario("load", "load", description="CSV 読み込み"),
+    Scenario("load_cached", "load_cached", description="CSV 読み込み（解析済みキャッシュ）"),
+    Scenario("save", "save", description="CSV 書き出し"),
+    Scenario("filter_eq", "workflow", [
+        {"type": "filter", "column": "部署", "operator": "==", "value": "営業"},
+    ], "文字列の一致フィルタ"),
+    Scenario("filter_range", "workflow", [
+        {"type": "filter", "column": "給与", "operator": ">=", "value": 800},
+    ], "数値の範囲フィルタ"),
+    Scenario("filter_contains", "workflow", [
+        {"type": "filter", "column": "備考", "operator": "contains", "value": "至急"},
+    ], "部分一致フィルタ"),
+    Scenario("filter_contains_any", "workflow", [
+        {"type": "filter", "column": "備考", "operator": "contains_any", "value": ["至急", "再発", "要連絡"]},
+    ], "複数語の部分一致フィルタ"),
+    Scenario("condition_group", "workflow", [
+        {"type": "ConditionGroupRule", "operator": "OR", "rules": [
+            {"type": "filter", "column": "年齢", "operator": "<", "value": 30},
+            {"type": "ConditionGroupRule", "operator": "AND", "rules": [
+                {"type": "filter", "column": "部署", "operator": "==", "value": "開発"},
+                {"type": "filter", "column": "評価", "operator": ">", "value": 3.5},
+            ]},
+        ]},
+    ], "入れ子の条件グループ"),
+    Scenario("condition_group_order", "workflow", [
+        {"type": "ConditionGroupRule", "operator": "AND", "rules": [
+            {"type": "filter", "column": "備考", "operator": "contains", "value": "至急"},
+            {"type": "filter", "column": "部署", "operator": "==", "value": "開発"},
+            {"type": "filter", "column": "年齢", "operator": "==", "value": 30},
+        ]},
+    ], "部分一致を先に置いた AND 条件グループ（評価順の並び替え）"),
+    Scenario("expression_filter", "workflow", [
+        {"type": "expression", "expression": "給与 * 12 > 9000 and 年齢 < 40"},
+    ], "式フィルタ"),
+    Scenario("expression_column", "workflow", [
+        {"type": "expression", "expression": "給与 * 12 + 値1", "target": "年収"},
+    ], "計算列"),
+    Scenario("sort", "workflow", [
+        {"type": "sort", "column": "給与", "ascending": False},
+    ], "並び替え"),
+    Scenario("sort_multi", "workflow", [
+        {"type": "sort", "keys": [
+            {"column": "部署", "ascending": True, "na_position": "last"},
+            {"column": "給与", "ascending": False, "na_position": "last"},
+        ]},
+    ], "複数キーの並び替え（文字列 + 数値）"),
+    Scenario("top_n", "workflow", [
+        {"type": "sort", "column": "評価", "ascending": False},
+        {"type": "limit", "count": 100},
+    ], "並び替え + 先頭100件（上位N件に置き換え）"),
+    Scenario("drop_rename", "workflow", [
+        {"type": "drop_column", "columns": ["備考", "コード"]},
+        {"type": "rename", "old_name": "給与", "new_name": "月給"},
+    ], "列削除・列名変更"),
+    Scenario("mixed", "workflow", [
+        {"type": "sort", "column": "年齢", "ascending": True},
+        {"type": "rename", "old_name": "部署", "new_name": "所属"},
+        {"type": "filter", "column": "所属", "operator": "!=", "value": "管理"},
+        {"type": "drop_column", "columns": ["備考"]},
+        {"type": "filter", "column": "給与", "operator": "<", "value": 1000},
+    ], "並び替え・列名変更・フィルタの組み合わせ（最適化あり）"),
+    Scenario("dedupe", "workflow", [
+        {"type": "dedupe", "columns": ["名前", "部署"], "keep": "first"},
+    ], "重複削除（名前 + 部署）"),
+    Scenario("streaming_dedupe", "streaming", [
+        {"type": "dedupe", "columns": ["名前", "部署"], "keep": "first"},
+    ], "ストリーミング: 重複削除（ハッシュ集合）"),
+    Scenario("streaming_mixed", "streaming", [
+        {"type": "filter", "column": "部署", "operator": "==", "value": "開発"},
+        {"type": "sort", "column": "給与", "ascending": False},
+    ], "ストリーミング: フィルタ + 並び替え"),
+    Scenario("aggregate", "workflow", [
+        {"type": "aggregate", "keys": ["部署"], "aggregations": [
+            {"column": None, "func": "count", "name": "人数"},
+            {"column": "給与", "func": "mean", "name": "平均給与"},
+            {"column": "コード", "func": "count_distinct", "name": "コード数"},
+        ]},
+    ], "部署ごとの集計（件数・平均・種類数）"),
+    Scenario("streaming_aggregate", "streaming", [
+        {"type": "aggregate", "keys": ["ID"], "aggregations": [
+            {"column": "給与", "func": "sum", "name": "給与合計"},
+            {"column": "評価", "func": "max", "name": "最高評価"},
+        ], "max_groups": 50000},
+    ], "ストリーミング: 1行1グループの集計（グループ数の上限を超えて退避）"),
+]
+
+
+def select_scenarios(names=None):
+    """名前で絞り込んだシナリオ（names が空なら全件）"""
+    if not names:
+        return list(SCENARIOS)
+    known = {scenario.name: scenario for scenario in SCENARIOS}
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        raise ValueError(f"未知のシナリオ: {', '.join(unknown)}")
+    return [known[name] for name in names]
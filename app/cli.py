@@ -0,0 +1,200 @@
+# cli.py
+#
+# GUI なしでワークフローを多数の CSV に適用するバッチ実行用エントリポイント。
+# PySide6 は import しない（ワーカープロセスの起動を軽くするため）。
+#
+#   python app/cli.py -w workflow.json -o out/ "data/*.csv" --workers 8
+
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from core.processor import CsvProcessor
+from core.profiling import ChromeTraceSink, JsonLinesSink, LogSink, Profiler
+from core.rule_factory import create_rule_from_dict
+from core.services.csv_service import CsvService, DEFAULT_CHUNKSIZE
+from core.services.workflow_service import WorkflowService
+from core.streaming import StreamingProcessor
+
+
+def process_file(input_path, output_path, rules_data, streaming=False, chunksize=DEFAULT_CHUNKSIZE,
+                 use_cache=False, profile_dir=None, profile_memory=False):
+    """
+    1ファイルを処理する（ワーカープロセス内で実行される）
+    profile_dir: ルールごとの計測を <ファイル名>.profile.jsonl / .trace.json として書き出す
+    """
+    start = time.perf_counter()
+    # ファイル単位で並列化しているので、1ファイルの解析はこのプロセスだけで行う
+    CsvService.parallel_reader = None
+    rules = [create_rule_from_dict(r) for r in rules_data]
+    lines = []
+
+    if streaming:
+        processor = StreamingProcessor(rules, logger=lines.append, chunksize=chunksize)
+        rows_out = processor.execute(input_path, output_path)
+        rows_in = processor.rows_read
+    else:
+        profiler = None
+        if profile_dir:
+            stem = os.path.join(profile_dir, os.path.splitext(os.path.basename(input_path))[0])
+            sinks = [LogSink(), JsonLinesSink(stem + ".profile.jsonl"), ChromeTraceSink(stem + ".trace.json")]
+            profiler = Profiler(sinks, memory=profile_memory)
+        processor = CsvProcessor(rules, logger=lines.append, profiler=profiler)
+        df = processor.load(input_path, use_cache=use_cache)
+        result = processor.execute(df)
+        CsvService.save(result, output_path)
+        rows_in, rows_out = len(df), len(result)
+
+    return {
+        "rows_in": rows_in,
+        "rows_out": rows_out,
+        "bytes": os.path.getsize(input_path),
+        "elapsed": time.perf_counter() - start,
+        "log": lines,
+    }
+
+
+def expand_inputs(patterns):
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True))
+        paths.extend(matches if matches else [pattern])
+    # 重複は除く（順序は保つ）
+    return list(dict.fromkeys(os.path.abspath(p) for p in paths))
+
+
+def output_names(inputs):
+    """
+    入力ごとの出力ファイル名（出力先ディレクトリからの相対パス）。
+    入力の共通の親ディレクトリからの相対パスを保つので、別フォルダの同名ファイルも上書きし合わない
+    """
+    try:
+        root = os.path.commonpath([os.path.dirname(path) for path in inputs]) if inputs else ""
+    except ValueError:
+        # ドライブが異なるなど共通の親がないときはファイル名だけ
+        root = None
+    names = {
+        path: os.path.basename(path) if root is None else os.path.relpath(path, root)
+        for path in inputs
+    }
+    seen = {}
+    for path, name in names.items():
+        other = seen.setdefault(os.path.normcase(name), path)
+        if other != path:
+            raise ValueError(f"出力ファイル名が重複します: {other} と {path} → {name}")
+    return names
+
+
+def run_batch(inputs, output_dir, rules_data, workers=None, retries=1,
+              streaming=False, chunksize=DEFAULT_CHUNKSIZE, use_cache=False, verbose=False, out=print,
+              profile_dir=None, profile_memory=False):
+    """ファイルをプロセスプールに振り分けて処理し、(成功数, 失敗数) を返す"""
+    names = output_names(inputs)
+    for name in set(map(os.path.dirname, names.values())):
+        os.makedirs(os.path.join(output_dir, name), exist_ok=True)
+        if profile_dir:
+            os.makedirs(os.path.join(profile_dir, name), exist_ok=True)
+    start = time.perf_counter()
+    total = {"rows_in": 0, "rows_out": 0, "bytes": 0}
+    failed = []
+    done = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        attempts = {}
+        pending = {}
+
+        def submit(path):
+            attempts[path] = attempts.get(path, 0) + 1
+            output_path = os.path.join(output_dir, names[path])
+            future = pool.submit(
+                process_file, path, output_path, rules_data, streaming, chunksize, use_cache,
+                profile_dir and os.path.join(profile_dir, os.path.dirname(names[path])), profile_memory,
+            )
+            pending[future] = path
+
+        for path in inputs:
+            submit(path)
+
+        while pending:
+            future = next(as_completed(pending))
+            path = pending.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                reason = f"{type(e).__name__}: {e}"
+                if attempts[path] <= retries:
+                    out(f"[RETRY {attempts[path]}/{retries}] {path}: {reason}")
+                    submit(path)
+                else:
+                    failed.append(path)
+                    out(f"[NG] {path}: {reason}")
+                continue
+
+            done += 1
+            for key in total:
+                total[key] += result[key]
+            out(
+                f"[OK] {path}: {result['rows_in']} → {result['rows_out']} 行 "
+                f"({result['elapsed']:.2f} 秒)"
+            )
+            if verbose:
+                for line in result["log"]:
+                    out("    " + line.rstrip("\n").replace("\n", "\n    "))
+
+    elapsed = time.perf_counter() - start
+    out("----------------------------------------")
+    out(f"成功: {done} / 失敗: {len(failed)} / 合計: {len(inputs)} ファイル")
+    out(f"入力: {total['rows_in']:,} 行, {total['bytes'] / 1024 / 1024:.1f} MB → 出力: {total['rows_out']:,} 行")
+    if elapsed > 0:
+        out(
+            f"処理時間: {elapsed:.2f} 秒 "
+            f"({total['rows_in'] / elapsed:,.0f} 行/秒, {total['bytes'] / 1024 / 1024 / elapsed:.1f} MB/秒)"
+        )
+    return done, len(failed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ワークフローを複数のCSVに一括適用する")
+    parser.add_argument("inputs", nargs="+", help="入力CSV（glob 可、引用符で囲む）")
+    parser.add_argument("-w", "--workflow", required=True, help="ワークフロー JSON")
+    parser.add_argument("-o", "--output-dir", required=True, help="出力先ディレクトリ")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="プロセス数（既定: CPU数）")
+    parser.add_argument("--retries", type=int, default=1, help="失敗時の再試行回数")
+    parser.add_argument("--streaming", action="store_true", help="チャンク単位で処理する（大容量向け）")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="ストリーミング時のチャンク行数")
+    parser.add_argument("--cache", action="store_true",
+                        help="解析済みキャッシュを使う・作る（同じファイルを繰り返し処理するとき向け）")
+    parser.add_argument("-v", "--verbose", action="store_true", help="ルールごとのログも表示する")
+    parser.add_argument("--profile", metavar="DIR", default=None,
+                        help="ルールごとの計測を DIR へ書き出す（JSON Lines と Chrome トレース）")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="計測にメモリの増加量も含める（tracemalloc を使うため遅くなる）")
+    args = parser.parse_args(argv)
+
+    version, rules_data = WorkflowService.read(args.workflow)
+    # 読めないワークフローはプールを作る前に弾く
+    for data in rules_data:
+        create_rule_from_dict(data)
+
+    inputs = expand_inputs(args.inputs)
+    try:
+        output_names(inputs)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"ワークフロー: {args.workflow} (version {version}, {len(rules_data)} ルール)")
+    print(f"入力ファイル: {len(inputs)} 件")
+
+    _, failed = run_batch(
+        inputs, args.output_dir, rules_data,
+        workers=args.workers, retries=args.retries,
+        streaming=args.streaming, chunksize=args.chunksize, use_cache=args.cache,
+        verbose=args.verbose, profile_dir=args.profile, profile_memory=args.profile_memory,
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+# core/aggregate.py
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from core.external_sort import ExternalSorter
+from core.hashing import hash_rows
+from core.sort_keys import normalize_keys, sort_order
+from core.spill import DEFAULT_MEMORY_BUDGET
+
+# 集計関数と表示名
+FUNCTIONS = {
+    "count": "件数",
+    "sum": "合計",
+    "mean": "平均",
+    "min": "最小",
+    "max": "最大",
+    "count_distinct": "種類数",
+}
+# ストリーミング時にメモリへ置くグループ数の既定の上限（超えたらディスクへ退避）
+DEFAULT_MAX_GROUPS = 1_000_000
+# 退避するときのハッシュ分割数
+DEFAULT_PARTITIONS = 16
+
+# 部分集計の列名（CSV の列名に NUL は含まれないので衝突しない）
+_ROWS = "rows\0"
+# グループ化キーがないとき（全体の集計）に使う仮のキー列
+_ALL = "all\0"
+# 部分集計の状態 → 部分集計どうしをまとめるときの関数
+_MERGE = {"rows": "sum", "count": "sum", "sum": "sum", "min": "min", "max": "max"}
+
+
+def normalize_aggregations(aggregations):
+    """
+    集計の指定を (列名, 関数, 出力列名) のリストにそろえる。
+    指定は dict（column / func / name）または (列名, 関数[, 出力列名]) のタプル。
+    件数（count）だけは列名を省略でき、その場合は全行を数える。
+    """
+    normalized = []
+    for item in aggregations:
+        if isinstance(item, dict):
+            column, func, name = item.get("column"), item.get("func"), item.get("name")
+        else:
+            column, func, name = (tuple(item) + (None,))[:3]
+        if func not in FUNCTIONS:
+            raise ValueError(f"未知の集計関数: {func}")
+        if column is None and func != "count":
+            raise ValueError(f"{FUNCTIONS[func]}には列の指定が必要です")
+        if not name:
+            name = FUNCTIONS[func] if column is None else f"{column}_{func}"
+        normalized.append((column, func, name))
+    if not normalized:
+        raise ValueError("集計の指定が空です")
+    names = [name for _, _, name in normalized]
+    if len(set(names)) != len(names):
+        raise ValueError("集計結果の列名が重複しています")
+    return normalized
+
+
+class HashAggregator:
+    """
+    グループ化キーごとのハッシュ集計。チャンクを順に受け取り、部分集計をまとめていく。
+
+    1. チャンクごとに groupby（ハッシュ表、sort=False）で部分集計を作る
+       合計・件数・最小・最大はそのまま、平均は (合計, 件数)、種類数は (キー, 値) の重複なしの組
+    2. 部分集計が max_groups 行を超えたら部分集計どうしを再集計してまとめる
+    3. まとめても max_groups の半分を超えるなら、キーのハッシュで partitions 個に分けて一時ファイルへ退避
+    4. 最後に分割ごとに読み戻して再集計する（同じキーは必ず同じ分割に入る）
+    結果はキーの昇順（欠損は末尾）。max_groups=None なら退避しない。
+    """
+
+    def __init__(self, keys, aggregations, max_groups=DEFAULT_MAX_GROUPS,
+                 spill_dir=None, partitions=DEFAULT_PARTITIONS):
+        self.keys = [keys] if isinstance(keys, str) else list(keys)
+        self.aggregations = normalize_aggregations(aggregations)
+        for _, _, name in self.aggregations:
+            if name in self.keys:
+                raise ValueError(f"集計結果の列名がグループ化キーと重複しています: {name}")
+        self.max_groups = max_groups
+        self.spill_dir = spill_dir
+        self.partitions = max(2, partitions)
+        self.spills = 0
+
+        self._group_keys = self.keys or [_ALL]
+        self._states = {}
+        self._distinct = []
+        for column, func, _ in self.aggregations:
+            if func == "count_distinct":
+                if column not in self._distinct:
+                    self._distinct.append(column)
+                continue
+            for kind in _state_kinds(column, func):
+                self._states[_state_name(kind, column)] = (kind, column)
+        self._states[_ROWS] = ("rows", None)
+
+        self._pending = []
+        self._pending_rows = 0
+        self._files = [[] for _ in range(self.partitions)]
+        self._tmpdir = None
+
+    def columns(self):
+        """入力から読む列"""
+        names = list(self.keys)
+        for column, _, _ in self.aggregations:
+            if column is not None and column not in names:
+                names.append(column)
+        return names
+
+    def add(self, chunk):
+        if not len(chunk):
+            return
+        partial = self._partial(chunk)
+        self._pending.append(partial)
+        self._pending_rows += _size(partial)
+        if self.max_groups is None or self._pending_rows <= self.max_groups:
+            return
+
+        state = self._merge(self._pending)
+        self._pending, self._pending_rows = [state], _size(state)
+        if _size(state) > self.max_groups // 2:
+            self._spill(state)
+            self._pending, self._pending_rows = [], 0
+
+    def results(self):
+        """集計結果を（退避したときは分割ごとに）チャンクで返す"""
+        try:
+            if not self.spills:
+                state = self._merge(self._pending) if self._pending else None
+                yield self._finish(state)
+                return
+
+            if self._pending:
+                self._spill(self._merge(self._pending))
+                self._pending = []
+            # 分割ごとの結果はキーの範囲が重なるので、外部ソートで1つの並びにまとめる
+            finished = (
+                self._finish(self._merge([pd.read_pickle(path) for path in paths]))
+                for paths in self._files if paths
+            )
+            sorter = ExternalSorter(self.keys, memory_budget=DEFAULT_MEMORY_BUDGET, spill_dir=self.spill_dir)
+            yield from sorter.sort_chunks(finished)
+        finally:
+            self.close()
+
+    def close(self):
+        self._pending = []
+        if self._tmpdir is not None:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+            self._tmpdir = None
+
+    # --- 部分集計 ---
+    def _partial(self, chunk):
+        frame = chunk[self.columns()]
+        if not self.keys:
+            frame = frame.assign(**{_ALL: 0})
+        for name, (kind, column) in self._states.items():
+            if kind == "sum" and not pd.api.types.is_numeric_dtype(frame[column].dtype):
+                raise ValueError(f"合計・平均は数値の列にだけ使えます: {column}")
+
+        grouped = frame.groupby(self._group_keys, dropna=False, sort=False, observed=True)
+        spec = {}
+        for name, (kind, column) in self._states.items():
+            if kind == "rows":
+                spec[name] = (self._group_keys[0], "size")
+            else:
+                spec[name] = (column, kind)
+        groups = grouped.agg(**spec).reset_index()
+
+        distinct = {}
+        for column in self._distinct:
+            names = list(dict.fromkeys(self._group_keys + [column]))
+            pairs = frame[names].dropna(subset=[column]).drop_duplicates()
+            distinct[column] = pairs.reset_index(drop=True)
+        return {"groups": groups, "distinct": distinct}
+
+    def _merge(self, partials):
+        if len(partials) == 1:
+            return partials[0]
+        groups = pd.concat([partial["groups"] for partial in partials], ignore_index=True)
+        spec = {name: (name, _MERGE[kind]) for name, (kind, _) in self._states.items()}
+        groups = groups.groupby(self._group_keys, dropna=False, sort=False, observed=True).agg(**spec)
+        distinct = {}
+        for column in self._distinct:
+            pairs = pd.concat([partial["distinct"][column] for partial in partials], ignore_index=True)
+            distinct[column] = pairs.drop_duplicates().reset_index(drop=True)
+        return {"groups": groups.reset_index(), "distinct": distinct}
+
+    def _finish(self, state):
+        if state is None:
+            groups = pd.DataFrame({name: [] for name in self._group_keys + list(self._states)})
+            state = {"groups": groups, "distinct": {}}
+        groups = state["groups"]
+        if not self.keys and not len(groups):
+            # 全体の集計は入力が空でも1行返す（件数 0）
+            groups = pd.DataFrame({name: [0] for name in [_ALL] + list(self._states)})
+            for name, (kind, _) in self._states.items():
+                if kind in ("min", "max"):
+                    groups[name] = np.nan
+
+        result = groups[self.keys].copy()
+        for column, func, name in self.aggregations:
+            if func == "count_distinct":
+                result[name] = self._distinct_counts(groups, state["distinct"].get(column))
+            elif func == "count":
+                result[name] = groups[_ROWS if column is None else _state_name("count", column)].astype(np.int64)
+            elif func == "mean":
+                total = groups[_state_name("sum", column)]
+                count = groups[_state_name("count", column)]
+                result[name] = total / count.where(count > 0)
+            else:
+                result[name] = groups[_state_name(func, column)]
+        if self.keys and len(result):
+            result = result.iloc[sort_order(result, normalize_keys(self.keys))]
+        return result.reset_index(drop=True)
+
+    def _distinct_counts(self, groups, pairs):
+        if pairs is None or not len(pairs):
+            return np.zeros(len(groups), dtype=np.int64)
+        counts = pairs.groupby(self._group_keys, dropna=False, sort=False, observed=True).size()
+        counts = counts.rename("\0count").reset_index()
+        # dropna=False の groupby と同じく、欠損のキーどうしも一致させて突き合わせる
+        merged = groups[self._group_keys].merge(counts, how="left", on=self._group_keys)
+        return merged["\0count"].fillna(0).astype(np.int64).to_numpy()
+
+    # --- 退避 ---
+    def _spill(self, state):
+        if self._tmpdir is None:
+            self._tmpdir = tempfile.mkdtemp(prefix="csvwf_agg_", dir=self.spill_dir)
+        groups = _plain_keys(state["groups"], self._group_keys)
+        distinct = {column: _plain_keys(pairs, self._group_keys) for column, pairs in state["distinct"].items()}
+        group_parts = _partition_ids(groups, self._group_keys, self.partitions)
+        distinct_parts = {
+            column: _partition_ids(pairs, self._group_keys, self.partitions)
+            for column, pairs in distinct.items()
+        }
+        for partition in range(self.partitions):
+            part = {
+                "groups": groups[group_parts == partition],
+                "distinct": {
+                    column: pairs[distinct_parts[column] == partition]
+                    for column, pairs in distinct.items()
+                },
+            }
+            if not len(part["groups"]):
+                continue
+            path = os.path.join(self._tmpdir, f"{partition:03d}_{self.spills:06d}.pkl")
+            pd.to_pickle(part, path)
+            self._files[partition].append(path)
+        self.spills += 1
+
+
+def _state_kinds(column, func):
+    if func == "count":
+        return ["rows"] if column is None else ["count"]
+    if func == "mean":
+        return ["sum", "count"]
+    return [func]
+
+
+def _state_name(kind, column):
+    return _ROWS if kind == "rows" else f"{kind}\0{column}"
+
+
+def _size(partial):
+    return len(partial["groups"]) + sum(len(pairs) for pairs in partial["distinct"].values())
+
+
+def _plain_keys(frame, keys):
+    """カテゴリ型のキーは値に戻す（分割ごとにカテゴリが異なっても比べられるように）"""
+    for key in keys:
+        dtype = frame[key].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            frame = frame.assign(**{key: frame[key].astype(dtype.categories.dtype)})
+    return frame
+
+
+def _partition_ids(frame, keys, partitions):
+    """キーの値のハッシュから分割番号を求める（チャンクごとに列の型が揺れても同じ値は同じ分割）"""
+    return (hash_rows(frame, keys) % np.uint64(partitions)).astype(np.intp)
@@ -0,0 +1,210 @@
+# core/column_index.py
+
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# インデックス全体の既定上限（バイト）
+DEFAULT_INDEX_BUDGET = 1024 * 1024 * 1024
+# 同じ列・同じ種類の条件がこの回数目に使われたときに索引を作る
+# （索引の作成は全行の走査より重いので、1回しか使わない列では作らない）
+DEFAULT_BUILD_AFTER = 2
+
+HASH_OPERATORS = ("==", "!=")
+RANGE_OPERATORS = (">", "<", ">=", "<=")
+
+
+class HashIndex:
+    """値 → 行位置の索引（== / != 用）。値ごとの行位置は昇順に並ぶ"""
+
+    def __init__(self, series):
+        codes, uniques = pd.factorize(series.to_numpy())
+        self.codes = codes
+        self.uniques = pd.Index(uniques)
+        # 種類が 65535 以下なら uint16 にして基数ソートで並べる
+        keys = (codes + 1).astype(np.uint16) if len(uniques) < 65535 else codes
+        self.order = _positions(np.argsort(keys, kind="stable"))
+        # 欠損（コード -1）を先頭のグループとして数える
+        counts = np.bincount(codes + 1, minlength=len(uniques) + 1)
+        self.starts = np.concatenate([[0], np.cumsum(counts)])
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.order.nbytes + self.starts.nbytes
+
+    def code(self, value):
+        try:
+            code = self.uniques.get_loc(value)
+        except (KeyError, TypeError):
+            return None
+        return code if isinstance(code, (int, np.integer)) else None
+
+    def equal(self, value):
+        """value と等しい行位置（昇順）"""
+        code = self.code(value)
+        if code is None:
+            return self.order[:0]
+        return self.order[self.starts[code + 1]:self.starts[code + 2]]
+
+
+class SortedIndex:
+    """値の順に並べた行位置（> / < / >= / <= 用）。欠損は含めない"""
+
+    def __init__(self, series):
+        values = series.to_numpy()
+        valid = np.flatnonzero(~pd.isna(values))
+        order = valid[np.argsort(values[valid], kind="stable")]
+        self.order = _positions(order)
+        self.keys = values[order]
+
+    @property
+    def nbytes(self):
+        # 文字列列の keys は元の文字列オブジェクトを参照するだけなのでポインタ分だけ数える
+        return self.order.nbytes + self.keys.nbytes
+
+    def range(self, operator, value):
+        """条件を満たす行位置（昇順）"""
+        lo_left = int(np.searchsorted(self.keys, value, side="left"))
+        lo_right = int(np.searchsorted(self.keys, value, side="right"))
+        if operator == ">":
+            hits = self.order[lo_right:]
+        elif operator == ">=":
+            hits = self.order[lo_left:]
+        elif operator == "<":
+            hits = self.order[:lo_left]
+        else:
+            hits = self.order[:lo_right]
+        return np.sort(hits)
+
+
+class ColumnIndexes:
+    """
+    読み込んだ DataFrame の列ごとの索引を保持する。
+    同じ列が build_after 回目に条件に使われたときに作り、以降の実行で使い回す。
+    元の DataFrame が解放された・列が差し替えられた（長さ・型・先頭アドレスが変わった）ときは作り直す。
+    列の値をその場で書き換えたことは検出しないので、書き換えた側が invalidate() を呼ぶ
+    （アプリの表は読み取り専用で、読み込み時に clear()、元に戻す / やり直すで読み戻した表は invalidate() する）。
+    上限を超えたら使われていない順に捨てる。
+    """
+
+    def __init__(self, memory_budget=DEFAULT_INDEX_BUDGET, build_after=DEFAULT_BUILD_AFTER):
+        self.memory_budget = memory_budget
+        self.build_after = build_after
+        self._entries = OrderedDict()
+        self._uses = {}
+        self._bytes = 0
+        self.builds = 0
+        self.hits = 0
+
+    def clear(self):
+        self._entries.clear()
+        self._uses.clear()
+        self._bytes = 0
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def invalidate(self, base):
+        """base の索引を捨てる（DataFrame をその場で書き換えたら、次の実行の前に必ず呼ぶ）"""
+        for key in [key for key in self._entries if key[0] == id(base)]:
+            self._bytes -= self._entries.pop(key)[3].nbytes
+
+    def select(self, view, column, operator, value):
+        """
+        索引で条件を評価して絞り込んだ FrameView を返す。
+        索引が使えない条件（型が合わない・列名が重複など）のときは None
+        """
+        if operator not in HASH_OPERATORS + RANGE_OPERATORS or not view.is_unique([column]):
+            return None
+        position = next(pos for pos, name in view.columns if name == column)
+        series = view.base.iloc[:, position]
+        if not _indexable(series, value):
+            return None
+
+        kind = "hash" if operator in HASH_OPERATORS else "sorted"
+        index = self._get(view.base, position, kind, series)
+        if index is None:
+            return None
+        if operator == "!=":
+            # 結果がほぼ全行になるので、文字列の比較の代わりにコードの比較で行を絞る
+            code = index.code(value)
+            codes = index.codes if view.rows is None else index.codes[view.rows]
+            return view.select(np.ones(len(codes), dtype=bool) if code is None else codes != code)
+
+        hits = index.equal(value) if operator == "==" else index.range(operator, value)
+        if view.rows is None:
+            return view.with_rows(hits.astype(np.int64))
+        member = np.zeros(len(view.base), dtype=bool)
+        member[hits] = True
+        return view.select(member[view.rows])
+
+    def _get(self, base, position, kind, series):
+        key = (id(base), position, kind)
+        signature = _signature(series)
+        entry = self._entries.get(key)
+        if entry is not None:
+            ref, stored, _, index = entry
+            if ref() is base and stored == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return index
+            self._bytes -= self._entries.pop(key)[3].nbytes
+
+        uses = self._uses.get(key)
+        if uses is None or uses[0]() is not base:
+            uses = [weakref.ref(base), 0]
+            self._uses[key] = uses
+        uses[1] += 1
+        if uses[1] < self.build_after:
+            return None
+
+        index = HashIndex(series) if kind == "hash" else SortedIndex(series)
+        self.builds += 1
+        if index.nbytes <= self.memory_budget:
+            # 元の DataFrame が解放されたら索引も捨てる
+            ref = weakref.ref(base, lambda _, key=key: self._discard(key))
+            self._entries[key] = (ref, signature, kind, index)
+            self._bytes += index.nbytes
+            while self._bytes > self.memory_budget:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted[3].nbytes
+        return index
+
+    def _discard(self, key):
+        self._uses.pop(key, None)
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[3].nbytes
+
+
+def _positions(order):
+    # 行数が少なければ int32 で持つ（索引のメモリを半分にする）
+    if len(order) < np.iinfo(np.int32).max:
+        return order.astype(np.int32)
+    return order.astype(np.int64)
+
+
+def _indexable(series, value):
+    """pandas の比較と同じ結果になる組み合わせだけ索引を使う"""
+    dtype = series.dtype
+    if isinstance(value, float) and np.isnan(value):
+        return False
+    if isinstance(dtype, np.dtype) and dtype.kind in "iuf":
+        return isinstance(value, (int, float, np.number)) and not isinstance(value, (bool, np.bool_))
+    if isinstance(dtype, pd.StringDtype):
+        return isinstance(value, str)
+    return False
+
+
+def _signature(series):
+    """列が差し替えられていないかを確かめる値（長さ・型・データの先頭アドレス）"""
+    address = None
+    if isinstance(series.dtype, np.dtype):
+        address = series.to_numpy().__array_interface__["data"][0]
+    return len(series), str(series.dtype), address
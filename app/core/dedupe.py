@@ -0,0 +1,167 @@
+# core/dedupe.py
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from core.hashing import hash_rows
+
+# ハッシュ集合の初期の大きさ（スロット数、2 のべき乗）
+INITIAL_CAPACITY = 1 << 16
+# ハッシュ集合の使用率の上限（超えたら2倍に広げる）
+MAX_LOAD = 0.5
+# 近似モード（Bloom フィルタ）の既定の誤判定率
+DEFAULT_ERROR_RATE = 0.001
+
+# ブロック型 Bloom フィルタで1キーに立てるビット数の上限（64 ビットの値から 6 ビットずつ取る）
+MAX_BLOCK_HASHES = 10
+
+_EMPTY = np.uint64(0)
+
+
+class HashSet:
+    """
+    64 ビットのハッシュ値だけを持つ固定長の集合（オープンアドレス法、線形探査）。
+    1キーあたり 8 バイト / 使用率 50% 以下で、キーの値そのものは保持しない。
+    0 は空きスロットの印なので、値 0 だけは別に覚える。
+    """
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        capacity = 1 << max(4, int(capacity - 1).bit_length())
+        self.table = np.zeros(capacity, dtype=np.uint64)
+        self.has_zero = False
+        self.size = 0
+
+    @property
+    def nbytes(self):
+        return self.table.nbytes
+
+    def add(self, values):
+        """
+        互いに異なるハッシュ値の配列を加え、それぞれが新しく入ったか（既にあれば False）を返す。
+        衝突の解決もまとめて行う: 空きスロットへ一斉に書き込み、書き込めた値以外は次のスロットへ進む。
+        """
+        added = np.zeros(len(values), dtype=bool)
+        zero = np.flatnonzero(values == _EMPTY)
+        if len(zero):
+            # 0 はスロットに置けないので別に覚える
+            added[zero] = not self.has_zero
+            self.has_zero = True
+            self.size += int(added[zero].sum())
+        while (self.size + len(values)) > len(self.table) * MAX_LOAD:
+            self._grow()
+
+        mask = np.uint64(len(self.table) - 1)
+        pending = np.flatnonzero(values != _EMPTY)
+        slots = (values[pending] & mask).astype(np.intp)
+        while len(pending):
+            current = self.table[slots]
+            wanted = values[pending]
+            empty = current == _EMPTY
+            # 同じ空きスロットを狙った値どうしは、最後に書いた1つだけが入る
+            claimed = slots[empty]
+            self.table[claimed] = wanted[empty]
+            won = np.zeros(len(pending), dtype=bool)
+            won[empty] = self.table[claimed] == wanted[empty]
+            added[pending[won]] = True
+            retry = ~won & (current != wanted)
+            pending = pending[retry]
+            slots = (slots[retry] + 1) & int(mask)
+        self.size += int(added[values != _EMPTY].sum())
+        return added
+
+    def _grow(self):
+        values = self.table[self.table != _EMPTY]
+        self.table = np.zeros(len(self.table) * 2, dtype=np.uint64)
+        self.size = int(self.has_zero)
+        self.add(values)
+
+
+class BloomFilter:
+    """
+    近似モード用の確率的な集合（1キーのビットを 64 ビットの1語にまとめるブロック型 Bloom フィルタ）。
+    expected_keys 件のとき誤判定率がおよそ error_rate になる大きさを取る
+    （誤判定率 0.1% で 1キーあたり約 3 バイト。HashSet の 1/5〜1/10）。
+    入っていないキーを「ある」と答えることがある（その行は重複として落ちる）が、その逆はない。
+    """
+
+    def __init__(self, expected_keys, error_rate=DEFAULT_ERROR_RATE):
+        expected_keys = max(1, int(expected_keys))
+        # 通常の Bloom フィルタの大きさから始め、1語に収めた分の誤判定の増加を計算で確かめながら広げる
+        words = max(1, int(math.ceil(-expected_keys * math.log(error_rate) / math.log(2) ** 2 / 64)))
+        while True:
+            error, hashes = min(
+                (_blocked_error(expected_keys / words, k), k) for k in range(1, MAX_BLOCK_HASHES + 1)
+            )
+            if error <= error_rate:
+                break
+            words = int(words * 1.05) + 1
+        self.words = np.zeros(words, dtype=np.uint64)
+        self.hashes = hashes
+        self.size = 0
+
+    @property
+    def nbytes(self):
+        return self.words.nbytes
+
+    def _locate(self, values):
+        """キーごとの (語の位置, 立てるビット)"""
+        # 値を2通りに混ぜ、一方の上位 32 ビットで語を選び（剰余の代わりに掛け算とシフト）、
+        # もう一方から 6 ビットずつ語の中の位置を取る
+        spread = values * np.uint64(0x9E3779B97F4A7C15)
+        words = ((spread >> np.uint64(32)) * np.uint64(len(self.words))) >> np.uint64(32)
+        mixed = (values ^ (values >> np.uint64(29))) * np.uint64(0xBF58476D1CE4E5B9)
+        bits = np.zeros(len(values), dtype=np.uint64)
+        for i in range(self.hashes):
+            bits |= np.uint64(1) << ((mixed >> np.uint64(6 * i)) & np.uint64(63))
+        return words.astype(np.intp), bits
+
+    def add(self, values):
+        """互いに異なるハッシュ値の配列を加え、それぞれが新しく入ったか（入っていたと判定されたら False）を返す"""
+        words, bits = self._locate(values)
+        added = (self.words[words] & bits) != bits
+        np.bitwise_or.at(self.words, words, bits)
+        self.size += int(added.sum())
+        return added
+
+
+def _blocked_error(keys_per_word, hashes):
+    """1語あたり平均 keys_per_word 件（ポアソン分布）入ったブロック型 Bloom フィルタの誤判定率"""
+    error = 0.0
+    probability = math.exp(-keys_per_word)
+    limit = int(keys_per_word + 10 * math.sqrt(keys_per_word) + 20)
+    for count in range(limit):
+        if count:
+            probability *= keys_per_word / count
+        error += probability * (1 - (1 - 1 / 64) ** (hashes * count)) ** hashes
+    return error
+
+
+class DuplicateTracker:
+    """
+    チャンクを順に受け取り、それまでに出てきたキーの行を落とす。
+    キー列の値の組を 64 ビットのハッシュにして集合で覚えるので、メモリはキーの種類数 × 16〜32 バイト。
+    異なるキーのハッシュが一致すると後の行が重複として落ちる（1 億種類で約 0.03% の確率）。
+    expected_keys を指定すると集合の代わりに Bloom フィルタを使う（さらに小さいが誤判定率 error_rate）。
+    """
+
+    def __init__(self, columns, expected_keys=None, error_rate=DEFAULT_ERROR_RATE):
+        self.columns = columns
+        if expected_keys:
+            self.seen = BloomFilter(expected_keys, error_rate)
+        else:
+            self.seen = HashSet()
+
+    def keep_mask(self, chunk, keep="first"):
+        """
+        残す行の bool 配列。
+        keep="first": これまでのチャンクにも、このチャンクの前の行にもないキーの行
+        keep="last":  チャンクを後ろから逆順に渡す。先に渡したチャンクにも、このチャンクの後ろの行にもないキーの行
+        """
+        columns = list(chunk.columns) if self.columns is None else self.columns
+        hashes = hash_rows(chunk, columns)
+        positions = np.flatnonzero(~pd.Series(hashes).duplicated(keep=keep).to_numpy())
+        mask = np.zeros(len(chunk), dtype=bool)
+        mask[positions[self.seen.add(hashes[positions])]] = True
+        return mask
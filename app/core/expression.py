@@ -0,0 +1,545 @@
+# core/expression.py
+
+import re
+
+import numpy as np
+import pandas as pd
+
+# 1回に評価する行数（途中結果の配列がキャッシュに収まる大きさ）
+BLOCK_ROWS = 16_384
+
+NUM = "数値"
+BOOL = "真偽値"
+STR = "文字列"
+
+_TOKEN = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+  | (?P<quoted>`[^`]+`)
+  | (?P<name>[^\W\d]\w*)
+  | (?P<op>\*\*|//|==|!=|<=|>=|&&|\|\||[-+*/%<>()!,])
+""", re.VERBOSE)
+
+_KEYWORDS = {"and": "and", "or": "or", "not": "not", "true": True, "false": False}
+_SYMBOLS = {"&&": "and", "||": "or", "!": "not"}
+
+# 二項演算子の結合の強さ
+_BINARY = {
+    "or": 1, "and": 2,
+    "==": 4, "!=": 4, "<": 4, "<=": 4, ">": 4, ">=": 4,
+    "+": 5, "-": 5,
+    "*": 6, "/": 6, "//": 6, "%": 6,
+    "**": 8,
+}
+_ARITHMETIC = {
+    "+": np.add, "-": np.subtract, "*": np.multiply, "/": np.true_divide,
+    # 整数の 0 除算は _division_operands で小数に直してから計算する
+    "//": np.floor_divide, "%": np.remainder,
+    # 整数の負の指数でエラーにならないよう、べき乗は常に小数で計算する
+    "**": np.float_power,
+}
+_INTEGER_DIVISION = (np.floor_divide, np.remainder)
+_COMPARISON = {
+    "==": np.equal, "!=": np.not_equal, "<": np.less, "<=": np.less_equal,
+    ">": np.greater, ">=": np.greater_equal,
+}
+_LOGICAL = {"and": np.logical_and, "or": np.logical_or}
+# 関数名 → (NumPy 関数, 引数の数)
+_FUNCTIONS = {
+    "abs": (np.absolute, 1), "sqrt": (np.sqrt, 1), "log": (np.log, 1), "exp": (np.exp, 1),
+    "floor": (np.floor, 1), "ceil": (np.ceil, 1), "round": (np.rint, 1),
+    "min": (np.fmin, 2), "max": (np.fmax, 2),
+}
+
+
+class ExpressionError(ValueError):
+    """式の構文・型の誤り"""
+
+
+class _ZeroDivisor(Exception):
+    """整数の // と % で割る数に 0 がある（小数で計算し直す合図）"""
+
+
+class Expression:
+    """
+    列を使った四則演算・比較・論理演算の式。
+
+        給与 * 12 > 5000 and 部署 == '営業'
+        `基本 給` + 手当
+
+    文字列を一度だけ構文木にし、列の型に合わせて型検査してから
+    BLOCK_ROWS 行ずつ NumPy で評価する。途中結果の配列はブロック間で使い回す。
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self._tokens = _tokenize(source)
+        self._pos = 0
+        self.tree = self._parse(0)
+        if self._peek() is not None:
+            self._error(f"余分な記号 '{self._peek()[1]}'")
+        self._compiled = {}
+
+    def columns(self):
+        """式が参照する列名（出現順）"""
+        return list(dict.fromkeys(self.tree.columns()))
+
+    def rename(self, mapping):
+        """列名を付け替えた式を返す"""
+        return Expression(self.tree.rename(mapping).source())
+
+    def type_of(self, df):
+        return self._compile(df).type
+
+    def evaluate(self, df):
+        """df の各行で式を評価した ndarray を返す"""
+        return self._compile(df).run(df)
+
+    # --- コンパイル ---
+    def _compile(self, df):
+        inputs = {}
+        for name in self.columns():
+            if name not in df.columns:
+                raise KeyError(name)
+            series = df[name]
+            if isinstance(series, pd.DataFrame):
+                raise ExpressionError(f"列名 '{name}' が重複しています")
+            inputs[name] = _column_type(series)
+        key = tuple(inputs.items())
+        if key not in self._compiled:
+            self._compiled[key] = _Program(self.tree, inputs)
+        return self._compiled[key]
+
+    # --- 構文解析（優先順位つき再帰下降） ---
+    def _peek(self):
+        return self._tokens[self._pos] if self._pos < len(self._tokens) else None
+
+    def _next(self):
+        token = self._peek()
+        if token is None:
+            self._error("式が途中で終わっています")
+        self._pos += 1
+        return token
+
+    def _expect(self, value):
+        token = self._next()
+        if token[1] != value:
+            self._error(f"'{value}' が必要です（'{token[1]}'）")
+
+    def _error(self, message):
+        raise ExpressionError(f"式を解釈できません: {message}: {self.source}")
+
+    def _parse(self, min_power):
+        left = self._prefix()
+        while True:
+            token = self._peek()
+            if token is None or token[0] != "op" or token[1] not in _BINARY:
+                return left
+            op = token[1]
+            power = _BINARY[op]
+            if power < min_power:
+                return left
+            self._next()
+            if power == 4:
+                # 比較は連鎖させない（a < b < c はエラー）
+                right = self._parse(power + 1)
+                left = _Binary(op, left, right)
+                following = self._peek()
+                if following is not None and following[0] == "op" and _BINARY.get(following[1]) == 4:
+                    self._error("比較演算子は続けて使えません")
+            elif op == "**":
+                left = _Binary(op, left, self._parse(power))
+            else:
+                left = _Binary(op, left, self._parse(power + 1))
+
+    def _prefix(self):
+        kind, value = self._next()
+        if kind == "number":
+            return _Literal(float(value) if any(c in value for c in ".eE") else int(value))
+        if kind == "string":
+            # \ の直後の1文字はそのまま（\' で引用符を含められる）
+            return _Literal(re.sub(r"\\(.)", r"\1", value[1:-1]))
+        if kind == "quoted":
+            return _Column(value[1:-1])
+        if kind == "op" and value == "not":
+            return _Unary("not", self._parse(3))
+        if kind == "op" and value == "-":
+            return _Unary("-", self._parse(7))
+        if kind == "op" and value == "+":
+            return self._parse(7)
+        if kind == "op" and value == "(":
+            node = self._parse(0)
+            self._expect(")")
+            return node
+        if kind == "bool":
+            return _Literal(value)
+        if kind == "name":
+            token = self._peek()
+            if token is not None and token[1] == "(":
+                return self._call(value)
+            return _Column(value)
+        self._error(f"予期しない記号 '{value}'")
+
+    def _call(self, name):
+        self._expect("(")
+        args = []
+        if self._peek() is not None and self._peek()[1] == ")":
+            self._next()
+        else:
+            while True:
+                args.append(self._parse(0))
+                token = self._next()
+                if token[1] == ")":
+                    break
+                if token[1] != ",":
+                    self._error(f"',' か ')' が必要です（'{token[1]}'）")
+        return _Call(name, args)
+
+
+def _tokenize(source):
+    tokens = []
+    pos = 0
+    while pos < len(source):
+        match = _TOKEN.match(source, pos)
+        if match is None:
+            raise ExpressionError(f"式を解釈できません: 位置 {pos + 1} の '{source[pos]}': {source}")
+        kind = match.lastgroup
+        text = match.group()
+        pos = match.end()
+        if kind == "space":
+            continue
+        if kind == "name" and text.lower() in _KEYWORDS:
+            keyword = _KEYWORDS[text.lower()]
+            tokens.append(("bool", keyword) if isinstance(keyword, bool) else ("op", keyword))
+        elif kind == "op" and text in _SYMBOLS:
+            tokens.append(("op", _SYMBOLS[text]))
+        else:
+            tokens.append((kind, text))
+    if not tokens:
+        raise ExpressionError("式が空です")
+    return tokens
+
+
+def _column_type(series):
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        dtype = dtype.categories.dtype
+    if pd.api.types.is_bool_dtype(dtype) and isinstance(dtype, np.dtype):
+        return BOOL
+    if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+        return NUM
+    if pd.api.types.is_string_dtype(dtype):
+        return STR
+    raise ExpressionError(f"列 '{series.name}' の型 {series.dtype} は式で使えません")
+
+
+def _column_values(series, kind):
+    """評価用の NumPy 配列。整数は桁あふれしないよう int64、小数は float64 で計算する"""
+    if kind == NUM:
+        dtype = series.dtype
+        if not isinstance(dtype, np.dtype):
+            # Int64 などの拡張型・カテゴリ型: 欠損がなければ整数のまま、あれば NaN にした float64
+            if pd.api.types.is_integer_dtype(dtype) and not series.hasnans:
+                return series.to_numpy(dtype=np.int64)
+            return series.to_numpy(dtype=np.float64, na_value=np.nan)
+        if dtype.kind == "f":
+            return series.to_numpy().astype(np.float64, copy=False)
+        if dtype == np.uint64:
+            return series.to_numpy()
+        return series.to_numpy().astype(np.int64, copy=False)
+    if kind == STR:
+        return series.to_numpy(dtype=object, na_value=np.nan)
+    return series.to_numpy()
+
+
+# --- 構文木 ---
+class _Column:
+    def __init__(self, name):
+        self.name = name
+
+    def columns(self):
+        return [self.name]
+
+    def rename(self, mapping):
+        return _Column(mapping.get(self.name, self.name))
+
+    def source(self):
+        if self.name.isidentifier() and self.name.lower() not in _KEYWORDS and self.name not in _FUNCTIONS:
+            return self.name
+        return f"`{self.name}`"
+
+
+class _Literal:
+    def __init__(self, value):
+        self.value = value
+
+    def columns(self):
+        return []
+
+    def rename(self, mapping):
+        return self
+
+    def source(self):
+        if isinstance(self.value, bool):
+            return "true" if self.value else "false"
+        if isinstance(self.value, str):
+            return "'" + self.value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+        return repr(self.value)
+
+
+class _Unary:
+    def __init__(self, op, operand):
+        self.op = op
+        self.operand = operand
+
+    def columns(self):
+        return self.operand.columns()
+
+    def rename(self, mapping):
+        return _Unary(self.op, self.operand.rename(mapping))
+
+    def source(self):
+        return f"(not {self.operand.source()})" if self.op == "not" else f"(-{self.operand.source()})"
+
+
+class _Binary:
+    def __init__(self, op, left, right):
+        self.op = op
+        self.left = left
+        self.right = right
+
+    def columns(self):
+        return self.left.columns() + self.right.columns()
+
+    def rename(self, mapping):
+        return _Binary(self.op, self.left.rename(mapping), self.right.rename(mapping))
+
+    def source(self):
+        return f"({self.left.source()} {self.op} {self.right.source()})"
+
+
+class _Call:
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def columns(self):
+        return [name for arg in self.args for name in arg.columns()]
+
+    def rename(self, mapping):
+        return _Call(self.name, [arg.rename(mapping) for arg in self.args])
+
+    def source(self):
+        return f"{self.name}({', '.join(arg.source() for arg in self.args)})"
+
+
+# --- 型検査とブロック評価 ---
+class _Program:
+    """
+    構文木を「ufunc(入力スロット...) → 出力スロット」の命令列に変換したもの。
+    一時スロットは BLOCK_ROWS 行分を1回だけ確保し、全ブロックで使い回す。
+    """
+
+    def __init__(self, tree, input_types):
+        self.input_types = input_types
+        self.steps = []
+        self._inputs = []
+        self._slots = 0
+        self.result = self._emit(tree)
+        self.type = self.result[1]
+
+    def run(self, df):
+        size = len(df)
+        arrays = {name: _column_values(df[name], self.input_types[name]) for name in self._inputs}
+        slot, _, const = self.result
+        if slot is None:
+            # 列を使わない式（定数）
+            return np.full(size, const, dtype=object if isinstance(const, str) else None)
+        if slot < 0:
+            return arrays[self._input_of(slot)].copy()
+
+        try:
+            return self._execute(arrays, size, promote=False)
+        except _ZeroDivisor:
+            # NumPy の整数の 0 除算は黙って 0 になるので、pandas と同じく小数で計算して inf / NaN にする
+            return self._execute(arrays, size, promote=True)
+
+    def _execute(self, arrays, size, promote):
+        slot = self.result[0]
+        dtypes = self._infer_dtypes(arrays, promote)
+        out = np.empty(size, dtype=dtypes[slot])
+        if size == 0:
+            return out
+        block = min(BLOCK_ROWS, size)
+        buffers = [np.empty(block, dtype=dtype) for dtype in dtypes]
+        with np.errstate(all="ignore"):
+            for start in range(0, size, block):
+                stop = min(start + block, size)
+                count = stop - start
+                values = {name: array[start:stop] for name, array in arrays.items()}
+                for func, args, target in self.steps:
+                    resolved = [self._resolve(arg, values, buffers, count) for arg in args]
+                    if func in _INTEGER_DIVISION:
+                        resolved = _division_operands(resolved, promote)
+                    # 最後の命令は結果の配列へ直接書き込む
+                    destination = out[start:stop] if target == slot else buffers[target][:count]
+                    func(*resolved, out=destination)
+        return out
+
+    def _infer_dtypes(self, arrays, promote):
+        # 0 行で一度実行して各スロットの型を決める（入力の dtype で変わるので毎回）
+        empty = {name: array[:0] for name, array in arrays.items()}
+        results = []
+        with np.errstate(all="ignore"):
+            for func, args, _ in self.steps:
+                resolved = [self._resolve(arg, empty, results, 0) for arg in args]
+                if func in _INTEGER_DIVISION:
+                    resolved = _division_operands(resolved, promote)
+                results.append(np.asarray(func(*resolved)))
+        return [result.dtype for result in results]
+
+    def _input_of(self, slot):
+        return self._inputs[-slot - 1]
+
+    @staticmethod
+    def _resolve(arg, values, buffers, count):
+        kind, value = arg
+        if kind == "slot":
+            return buffers[value][:count]
+        if kind == "input":
+            return values[value]
+        return value
+
+    def _new_slot(self):
+        self._slots += 1
+        return self._slots - 1
+
+    def _emit(self, node):
+        """(スロット, 型, 定数) を返す。スロットが None なら定数、負なら入力列"""
+        if isinstance(node, _Literal):
+            return None, _literal_type(node.value), node.value
+        if isinstance(node, _Column):
+            if node.name not in self._inputs:
+                self._inputs.append(node.name)
+            return -(self._inputs.index(node.name) + 1), self.input_types[node.name], None
+
+        if isinstance(node, _Unary):
+            operand = self._emit(node.operand)
+            if node.op == "not":
+                self._require(operand, BOOL, "not")
+                return self._step(np.logical_not, [operand], BOOL)
+            self._require(operand, NUM, "-")
+            return self._step(np.negative, [operand], NUM)
+
+        if isinstance(node, _Binary):
+            left = self._emit(node.left)
+            right = self._emit(node.right)
+            if node.op in _LOGICAL:
+                self._require(left, BOOL, node.op)
+                self._require(right, BOOL, node.op)
+                return self._step(_LOGICAL[node.op], [left, right], BOOL)
+            if node.op in _COMPARISON:
+                if left[1] != right[1]:
+                    raise ExpressionError(f"{left[1]}と{right[1]}は比較できません: {node.source()}")
+                if left[1] != NUM and node.op not in ("==", "!="):
+                    raise ExpressionError(f"{left[1]}の大小は比較できません: {node.source()}")
+                return self._step(_COMPARISON[node.op], [left, right], BOOL)
+            self._require(left, NUM, node.op)
+            self._require(right, NUM, node.op)
+            return self._step(_ARITHMETIC[node.op], [left, right], NUM)
+
+        if isinstance(node, _Call):
+            if node.name == "where":
+                if len(node.args) != 3:
+                    raise ExpressionError("where は引数が3つ必要です: where(条件, 真のとき, 偽のとき)")
+                cond, when_true, when_false = (self._emit(arg) for arg in node.args)
+                self._require(cond, BOOL, "where")
+                if when_true[1] != when_false[1]:
+                    raise ExpressionError(f"where の2つの値の型が違います: {node.source()}")
+                return self._step(_where, [cond, when_true, when_false], when_true[1])
+            if node.name == "isnull":
+                if len(node.args) != 1:
+                    raise ExpressionError("isnull は引数が1つ必要です")
+                return self._step(_isnull, [self._emit(node.args[0])], BOOL)
+            if node.name not in _FUNCTIONS:
+                raise ExpressionError(f"不明な関数: {node.name}")
+            func, arity = _FUNCTIONS[node.name]
+            if len(node.args) != arity:
+                raise ExpressionError(f"{node.name} は引数が{arity}つ必要です")
+            args = [self._emit(arg) for arg in node.args]
+            for arg in args:
+                self._require(arg, NUM, node.name)
+            return self._step(func, args, NUM)
+
+        raise ExpressionError(f"式を解釈できません: {node!r}")
+
+    def _step(self, func, operands, kind):
+        if all(slot is None for slot, _, _ in operands):
+            # 定数どうしの演算はここで計算してしまう
+            consts = [const for _, _, const in operands]
+            if func in _INTEGER_DIVISION:
+                try:
+                    consts = _division_operands(consts, promote=False)
+                except _ZeroDivisor:
+                    consts = _division_operands(consts, promote=True)
+            with np.errstate(all="ignore"):
+                value = func(*consts)
+            if isinstance(value, (np.generic, np.ndarray)):
+                value = value.item()
+            return None, kind, value
+        args = []
+        for slot, _, const in operands:
+            if slot is None:
+                args.append(("const", const))
+            elif slot < 0:
+                args.append(("input", self._input_of(slot)))
+            else:
+                args.append(("slot", slot))
+        target = self._new_slot()
+        self.steps.append((func, args, target))
+        return target, kind, None
+
+    @staticmethod
+    def _require(operand, kind, op):
+        if operand[1] != kind:
+            raise ExpressionError(f"'{op}' には{kind}が必要です（{operand[1]}が渡されました）")
+
+
+def _division_operands(operands, promote):
+    """
+    整数どうしの // と % の被演算子。promote なら float64 にする。
+    小数にしていない状態で割る数に 0 があれば _ZeroDivisor を送出する。
+    """
+    left, right = operands
+    if np.asarray(left).dtype.kind not in "iu" or np.asarray(right).dtype.kind not in "iu":
+        return operands
+    if promote:
+        return [np.asarray(left, dtype=np.float64), np.asarray(right, dtype=np.float64)]
+    if np.any(np.asarray(right) == 0):
+        raise _ZeroDivisor
+    return operands
+
+
+def _literal_type(value):
+    if isinstance(value, (bool, np.bool_)):
+        return BOOL
+    if isinstance(value, str):
+        return STR
+    return NUM
+
+
+def _where(cond, when_true, when_false, out=None):
+    result = np.where(cond, when_true, when_false)
+    if out is None:
+        return result
+    out[:] = result
+    return out
+
+
+def _isnull(values, out=None):
+    result = pd.isna(values)
+    if out is None:
+        return np.asarray(result, dtype=bool)
+    out[:] = result
+    return out
@@ -0,0 +1,243 @@
+# core/external_sort.py
+
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+from core.sort_keys import normalize_keys, sort_order
+from core.spill import DEFAULT_MEMORY_BUDGET
+
+# 一度にマージするラン数の上限（超えたら多段マージ）
+DEFAULT_FAN_IN = 16
+
+
+class ExternalSorter:
+    """
+    メモリ上限つきの外部マージソート。
+
+    1. 上限に収まる分だけチャンクを集めて安定ソートし、ランとして一時ファイルへ書き出す
+    2. 各ランの先頭ページだけをメモリに置き、k-way マージで出力する
+    同値の行は (キー, ラン番号, ラン内位置) の順に並ぶため、
+    メモリ上の安定ソート（SortRule）と同じ結果になる。
+    """
+
+    def __init__(self, by, ascending=True, memory_budget=DEFAULT_MEMORY_BUDGET,
+                 spill_dir=None, fan_in=DEFAULT_FAN_IN, na_position="last"):
+        self.keys = normalize_keys(by, ascending, na_position)
+        self.by = [column for column, _, _ in self.keys]
+        self.ascending = [asc for _, asc, _ in self.keys]
+        self.na_position = [position for _, _, position in self.keys]
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
+        self.fan_in = max(2, fan_in)
+        self.runs = 0
+        self._tmpdir = None
+        self._row_bytes = None
+        self._page_count = 0
+
+    def sort_frame(self, df):
+        """メモリ上の DataFrame を外部ソートして1つの DataFrame で返す"""
+        step = max(1, self._run_rows(df))
+        chunks = (df.iloc[i:i + step] for i in range(0, max(len(df), 1), step))
+        return pd.concat(list(self.sort_chunks(chunks)))
+
+    def sort_chunks(self, chunks):
+        """チャンクの iterator を受け取り、ソート済みチャンクを順に返す"""
+        try:
+            template = None
+            runs = []
+            buffer = []
+            buffered = 0
+            for chunk in chunks:
+                if template is None:
+                    template = chunk.iloc[:0]
+                if not len(chunk):
+                    continue
+                buffer.append(chunk)
+                buffered += len(chunk)
+                if buffered >= self._run_rows(chunk):
+                    runs.append(self._write_run(self._sort(pd.concat(buffer))))
+                    buffer, buffered = [], 0
+
+            if not runs:
+                # 全件がメモリに収まった
+                if buffer:
+                    yield self._sort(pd.concat(buffer))
+                elif template is not None:
+                    yield template
+                return
+
+            if buffer:
+                runs.append(self._write_run(self._sort(pd.concat(buffer))))
+            self.runs = len(runs)
+
+            # ラン数がファンインに収まるまで多段マージ
+            while len(runs) > self.fan_in:
+                merged = []
+                for i in range(0, len(runs), self.fan_in):
+                    group = runs[i:i + self.fan_in]
+                    if len(group) == 1:
+                        merged.append(group[0])
+                    else:
+                        merged.append(self._write_pages(self._merge(group)))
+                runs = merged
+
+            yield from self._merge(runs)
+        finally:
+            self.close()
+
+    def close(self):
+        if self._tmpdir is not None:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+            self._tmpdir = None
+
+    # --- ランの作成 ---
+    def _sort(self, df):
+        return df.iloc[sort_order(df, self.keys)]
+
+    def _estimate_row_bytes(self, df):
+        if self._row_bytes is None and len(df):
+            self._row_bytes = max(1, int(df.memory_usage(deep=True).sum() / len(df)))
+        return self._row_bytes or 1
+
+    def _run_rows(self, df):
+        # ソート時に一時的に2倍になるため上限の半分をランに使う
+        return max(1, self.memory_budget // 2 // self._estimate_row_bytes(df))
+
+    def _page_rows(self):
+        return max(1, self.memory_budget // 2 // (self.fan_in + 1) // (self._row_bytes or 1))
+
+    def _write_run(self, df):
+        return self._write_pages([df])
+
+    def _write_pages(self, frames):
+        """ソート済みのフレーム列をページ単位のバイナリ(pickle)として書き出す"""
+        if self._tmpdir is None:
+            self._tmpdir = tempfile.mkdtemp(prefix="csvwf_sort_", dir=self.spill_dir)
+        page_rows = self._page_rows()
+        pages = []
+        pending = []
+        pending_rows = 0
+
+        def flush(frame):
+            path = os.path.join(self._tmpdir, f"{self._page_count:08d}.pkl")
+            self._page_count += 1
+            frame.to_pickle(path)
+            pages.append(path)
+
+        for frame in frames:
+            pending.append(frame)
+            pending_rows += len(frame)
+            while pending_rows >= page_rows:
+                joined = pd.concat(pending)
+                flush(joined.iloc[:page_rows])
+                rest = joined.iloc[page_rows:]
+                pending, pending_rows = [rest], len(rest)
+        if pending_rows:
+            flush(pd.concat(pending))
+        return pages
+
+    # --- k-way マージ ---
+    def _merge(self, runs):
+        cursors = [_RunCursor(pages) for pages in runs]
+        while True:
+            active = [i for i, cursor in enumerate(cursors) if cursor.page is not None]
+            if not active:
+                return
+
+            # 各ランの現在ページ末尾のうち最小のものを境界にする
+            bound_run = active[0]
+            bound_key = cursors[bound_run].last_key(self.by)
+            for i in active[1:]:
+                key = cursors[i].last_key(self.by)
+                if self._key_less(key, bound_key):
+                    bound_run, bound_key = i, key
+
+            # 境界以下の行は、これ以降のページのどの行よりも前に並ぶ
+            parts = []
+            for i in active:
+                cursor = cursors[i]
+                if i == bound_run:
+                    count = len(cursor.page)
+                else:
+                    mask = self._le_mask(cursor.page, bound_key, include_equal=i < bound_run)
+                    count = int(mask.sum())
+                if count:
+                    parts.append(cursor.take(count))
+
+            yield self._sort(pd.concat(parts))
+
+    def _key_less(self, a, b):
+        """キー a が b より前に並ぶか（同値は False）"""
+        for x, y, asc, na_position in zip(a, b, self.ascending, self.na_position):
+            x_na, y_na = pd.isna(x), pd.isna(y)
+            if x_na or y_na:
+                if x_na and y_na:
+                    continue
+                return x_na if na_position == "first" else y_na
+            if x == y:
+                continue
+            return x < y if asc else x > y
+        return False
+
+    def _le_mask(self, page, bound_key, include_equal):
+        less = pd.Series(False, index=page.index)
+        equal = pd.Series(True, index=page.index)
+        for column, value, asc, na_position in zip(self.by, bound_key, self.ascending, self.na_position):
+            s = page[column]
+            isna = s.isna()
+            if isinstance(s.dtype, pd.CategoricalDtype):
+                # カテゴリ型はコードで比べる（last_key もコードを返す）
+                s = s.cat.codes
+            if pd.isna(value):
+                # 欠損が先頭なら境界より前の値はなく、末尾なら欠損以外はすべて前
+                col_less = pd.Series(False, index=page.index) if na_position == "first" else ~isna
+                col_equal = isna
+            else:
+                col_less = ((s < value) if asc else (s > value)) & ~isna
+                if na_position == "first":
+                    col_less = col_less | isna
+                col_equal = (s == value) & ~isna
+            less |= equal & col_less
+            equal &= col_equal
+        return less | equal if include_equal else less
+
+
+def _sort_value(series):
+    """末尾行のソートキー。カテゴリ型はカテゴリの並び順（コード）で返す"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        code = series.cat.codes.iloc[-1]
+        return None if code < 0 else int(code)
+    return series.iloc[-1]
+
+
+class _RunCursor:
+    """ランのページを順に読み出す"""
+
+    def __init__(self, pages):
+        self.pages = list(pages)
+        self.page = None
+        self._next_page()
+
+    def _next_page(self):
+        while self.pages:
+            path = self.pages.pop(0)
+            page = pd.read_pickle(path)
+            os.remove(path)
+            if len(page):
+                self.page = page
+                return
+        self.page = None
+
+    def last_key(self, by):
+        # 行単位で取り出すと型が混ざって丸められるため列ごとに取る
+        return tuple(_sort_value(self.page[column]) for column in by)
+
+    def take(self, count):
+        part = self.page.iloc[:count]
+        self.page = self.page.iloc[count:]
+        if not len(self.page):
+            self._next_page()
+        return part
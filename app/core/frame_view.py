@@ -0,0 +1,106 @@
+# core/frame_view.py
+
+import numpy as np
+import pandas as pd
+
+
+class FrameView:
+    """
+    元の DataFrame をコピーせずに「残っている行」と「見えている列」だけを持つビュー。
+
+    base:    元の DataFrame（変更しない）
+    rows:    base 内の行位置 (int64 配列)。None なら全行
+    columns: (base 内の列位置, 現在の列名) のリスト
+    indexes: base の列索引（ColumnIndexes）。ある場合はフィルタが索引で行を引く
+             索引は base が変わらない前提で使い回すので、base の値をその場で書き換えたら
+             次の実行の前に indexes.invalidate(base) を呼ぶ（呼ばないと古い索引で絞り込まれる）
+    フィルタは rows を絞るだけ、列削除・列名変更は columns を変えるだけで、
+    DataFrame を作るのは materialize() の1回だけになる。
+    """
+
+    def __init__(self, base, rows=None, columns=None, indexes=None):
+        self.base = base
+        self.rows = rows
+        if columns is None:
+            columns = list(enumerate(base.columns))
+        self.columns = columns
+        self.indexes = indexes
+        self._frame = None
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls(df)
+
+    def __len__(self):
+        return len(self.base) if self.rows is None else len(self.rows)
+
+    @property
+    def column_names(self):
+        return [name for _, name in self.columns]
+
+    def is_unique(self, names):
+        """names がそれぞれ1列だけに対応しているか（重複列名はビューで扱わない）"""
+        current = self.column_names
+        return all(current.count(name) == 1 for name in names)
+
+    def positions(self):
+        """base 内の行位置（全行なら 0..n-1）"""
+        if self.rows is None:
+            return np.arange(len(self.base), dtype=np.int64)
+        return self.rows
+
+    def frame(self, names=None):
+        """指定した列だけを実体化する（条件式の評価用）"""
+        if names is None:
+            selected = self.columns
+        else:
+            selected = []
+            for name in dict.fromkeys(names):
+                matches = [item for item in self.columns if item[1] == name]
+                if not matches:
+                    raise KeyError(name)
+                selected.extend(matches)
+        return self._take(selected)
+
+    def materialize(self):
+        """DataFrame を作る（2回目以降は同じものを返す）"""
+        if self._frame is None:
+            if self.rows is None and self.columns == list(enumerate(self.base.columns)):
+                self._frame = self.base
+            else:
+                self._frame = self._take(self.columns)
+        return self._frame
+
+    def _take(self, columns):
+        col_positions = [position for position, _ in columns]
+        if self.rows is None:
+            df = self.base.iloc[:, col_positions]
+        else:
+            df = self.base.iloc[self.rows, col_positions]
+        names = [name for _, name in columns]
+        if list(df.columns) != names:
+            df = df.set_axis(pd.Index(names), axis=1)
+        return df
+
+    # --- ルールから呼ばれる操作（いずれも新しいビューを返す） ---
+    def select(self, mask):
+        """現在の行に対応する bool 配列で行を絞る"""
+        mask = np.asarray(mask, dtype=bool)
+        return self.with_rows(self.positions()[mask])
+
+    def take(self, order):
+        """現在の行の並びを order（0..len-1 の位置）で並べ替える"""
+        return self.with_rows(self.positions()[np.asarray(order)])
+
+    def with_rows(self, rows):
+        """base 内の行位置 rows をそのまま使うビュー"""
+        return FrameView(self.base, rows, self.columns, self.indexes)
+
+    def drop(self, names):
+        names = set(names)
+        columns = [item for item in self.columns if item[1] not in names]
+        return FrameView(self.base, self.rows, columns, self.indexes)
+
+    def rename(self, mapping):
+        columns = [(position, mapping.get(name, name)) for position, name in self.columns]
+        return FrameView(self.base, self.rows, columns, self.indexes)
@@ -0,0 +1,38 @@
+# core/hashing.py
+
+import numpy as np
+import pandas as pd
+
+# 欠損のハッシュ値（pandas のハッシュは数値 0 を 0 にするので、0 以外の固定値を使う）
+_NULL_HASH = np.uint64(0x9E3779B97F4A7C15)
+
+
+def hash_rows(frame, columns):
+    """
+    列の値の組を行ごとに 64 ビットのハッシュにする（ベクトル化）。
+    チャンクごとに列の型が揺れても、同じ値は同じハッシュになるようにそろえる:
+      整数は 64 ビット整数のままハッシュ（2^53 を超える値も区別する）
+      小数は整数値なら整数としてハッシュ（欠損を含むチャンクだけ小数になった整数列など）
+      欠損は型によらず同じ値
+    """
+    combined = np.zeros(len(frame), dtype=np.uint64)
+    for column in columns:
+        series = frame[column]
+        if series.dtype.kind in "iub":
+            hashed = pd.util.hash_array(series.to_numpy(na_value=0).astype(np.int64, copy=False))
+        elif series.dtype.kind == "f":
+            hashed = _hash_floats(series.to_numpy(dtype=np.float64, na_value=np.nan))
+        else:
+            hashed = pd.util.hash_pandas_object(series, index=False).to_numpy()
+        hashed = np.where(series.isna().to_numpy(), _NULL_HASH, hashed)
+        combined = combined * np.uint64(31) + hashed
+    return combined
+
+
+def _hash_floats(values):
+    # 整数値の小数は整数と同じハッシュにし、それ以外は小数のままハッシュする
+    whole = np.isfinite(values) & (np.floor(values) == values) & (np.abs(values) < 2.0 ** 63)
+    as_int = pd.util.hash_array(np.where(whole, values, 0).astype(np.int64))
+    if whole.all():
+        return as_int
+    return np.where(whole, as_int, pd.util.hash_array(values))
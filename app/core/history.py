@@ -0,0 +1,143 @@
+# core/history.py
+
+import os
+import pickle
+import shutil
+import tempfile
+import zlib
+
+from core.frame_view import FrameView
+
+# メモリ上に置く履歴の既定上限（バイト）
+DEFAULT_HISTORY_BUDGET = 256 * 1024 * 1024
+
+
+class _Entry:
+    """
+    履歴1件。読み込んだ元データ (source) 上の FrameView なら
+    行位置と列情報だけを持ち、それ以外のときは元になった DataFrame も持つ。
+    """
+
+    def __init__(self, view, source):
+        self.rows = view.rows
+        self.columns = list(view.columns)
+        self.base = None if view.base is source else view.base
+        self.path = None
+        self._size = 0 if self.rows is None else self.rows.nbytes
+        if self.base is not None:
+            self._size += int(self.base.memory_usage(deep=True).sum())
+
+    @property
+    def nbytes(self):
+        return 0 if self.path is not None else self._size
+
+    def spill(self, directory, name):
+        """圧縮してディスクへ退避し、メモリ上のデータを手放す"""
+        self.path = os.path.join(directory, name)
+        payload = pickle.dumps((self.rows, self.base), protocol=pickle.HIGHEST_PROTOCOL)
+        with open(self.path, "wb") as f:
+            f.write(zlib.compress(payload, 1))
+        self.rows = None
+        self.base = None
+
+    def restore(self, source):
+        rows, base = self.rows, self.base
+        if self.path is not None:
+            with open(self.path, "rb") as f:
+                rows, base = pickle.loads(zlib.decompress(f.read()))
+        return FrameView(source if base is None else base, rows, self.columns)
+
+    def discard(self):
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class HistoryStore:
+    """
+    元に戻す / やり直す の履歴。DataFrame のコピーではなく差分（行位置・列情報）を持つ。
+    合計がメモリ上限を超えたら古い履歴から圧縮してディスクへ退避する。
+    """
+
+    def __init__(self, memory_budget=DEFAULT_HISTORY_BUDGET, spill_dir=None):
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
+        self.source = None
+        self._undo = []
+        self._redo = []
+        self._tmpdir = None
+        self._spilled = 0
+
+    def reset(self, source):
+        """CSV を読み込み直したときに呼ぶ。source が以降の差分の基準になる"""
+        self.clear()
+        self.source = source
+
+    def clear(self):
+        for entry in self._undo + self._redo:
+            entry.discard()
+        self._undo = []
+        self._redo = []
+
+    @property
+    def can_undo(self):
+        return bool(self._undo)
+
+    @property
+    def can_redo(self):
+        return bool(self._redo)
+
+    @property
+    def nbytes(self):
+        return sum(entry.nbytes for entry in self._undo + self._redo)
+
+    def push(self, view):
+        """実行前の状態を積む（やり直し履歴は消える）"""
+        for entry in self._redo:
+            entry.discard()
+        self._redo = []
+        self._undo.append(_Entry(view, self.source))
+        self._enforce_budget()
+
+    def undo(self, current):
+        """current をやり直し側へ積み、1つ前の状態を返す"""
+        self._redo.append(_Entry(current, self.source))
+        view = self._pop(self._undo)
+        self._enforce_budget()
+        return view
+
+    def redo(self, current):
+        self._undo.append(_Entry(current, self.source))
+        view = self._pop(self._redo)
+        self._enforce_budget()
+        return view
+
+    def close(self):
+        self.clear()
+        if self._tmpdir is not None:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+            self._tmpdir = None
+
+    def _pop(self, stack):
+        entry = stack.pop()
+        view = entry.restore(self.source)
+        entry.discard()
+        return view
+
+    def _enforce_budget(self):
+        # 現在の状態から遠いもの（undo / redo それぞれのスタックの底）から退避する
+        ranked = [(len(self._undo) - i, e) for i, e in enumerate(self._undo)]
+        ranked += [(len(self._redo) - i, e) for i, e in enumerate(self._redo)]
+        ranked.sort(key=lambda item: item[0], reverse=True)
+
+        total = self.nbytes
+        for _, entry in ranked:
+            if total <= self.memory_budget:
+                break
+            if entry.path is not None:
+                continue
+            size = entry.nbytes
+            if self._tmpdir is None:
+                self._tmpdir = tempfile.mkdtemp(prefix="csvwf_history_", dir=self.spill_dir)
+            entry.spill(self._tmpdir, f"{self._spilled:06d}.bin")
+            self._spilled += 1
+            total -= size
@@ -0,0 +1,170 @@
+# core/join.py
+
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from core.services.csv_service import CsvService
+from core.services.parse_cache import ParseCache
+
+# 結合の種類と表示名
+JOIN_TYPES = {
+    "inner": "内部結合",
+    "left": "左外部結合",
+    "semi": "存在する行のみ",
+}
+# 参照側ハッシュ表キャッシュの既定上限（バイト）
+DEFAULT_BUILD_CACHE_BUDGET = 512 * 1024 * 1024
+# 整数キーの値の範囲がキーの種類数のこの倍数以下なら、ハッシュの代わりに値で直接引く配列を作る
+DIRECT_TABLE_RATIO = 8
+
+
+class HashTable:
+    """
+    参照 CSV（ビルド側）のキー → 行位置のハッシュ表。
+    キーの種類ごとに行をまとめ、種類の番号 → (開始位置, 件数) で引く（CSR 形式）。
+    キーに欠損がある行はどの行とも一致しない。
+    """
+
+    def __init__(self, frame, keys, payload):
+        """frame: 参照 CSV / keys: キー列 / payload: 結合で付け加える列"""
+        key_frame = frame[keys]
+        valid = key_frame.notna().all(axis=1).to_numpy()
+        positions = np.flatnonzero(valid)
+        key_frame = key_frame.iloc[positions]
+        if len(keys) == 1:
+            codes, uniques = pd.factorize(key_frame.iloc[:, 0])
+            self.index = pd.Index(uniques)
+        else:
+            codes, self.index = pd.MultiIndex.from_frame(key_frame).factorize()
+        self.keys = list(keys)
+        self.counts = np.bincount(codes, minlength=len(self.index)).astype(np.int64)
+        self.starts = np.concatenate([[0], np.cumsum(self.counts)[:-1]]).astype(np.int64)
+        self.order = positions[np.argsort(codes, kind="stable")]
+        self.unique = not len(self.counts) or int(self.counts.max()) <= 1
+        self.payload = frame[payload].reset_index(drop=True)
+        self._low, self._direct = 0, None
+        if self.index.dtype.kind == "i" and len(self.index):
+            # 社員番号のように範囲の狭い整数キーは「値 - 最小値」の位置に種類番号を置いた配列で引く
+            low, high = int(self.index.min()), int(self.index.max())
+            if high - low < DIRECT_TABLE_RATIO * len(self.index) + 1024:
+                self._low = low
+                self._direct = np.full(high - low + 1, -1, dtype=np.int32 if len(self.index) < 1 << 31 else np.int64)
+                self._direct[self.index.to_numpy().astype(np.int64) - low] = np.arange(len(self.index))
+        # 初回の検索でハッシュ表を作っておく（以降の検索は作り直さない）
+        self.index.get_indexer(self.index[:1])
+
+    @property
+    def nbytes(self):
+        arrays = self.counts.nbytes + self.starts.nbytes + self.order.nbytes
+        if self._direct is not None:
+            arrays += self._direct.nbytes
+        return arrays + int(self.index.memory_usage(deep=True)) + int(self.payload.memory_usage(deep=True).sum())
+
+    def lookup(self, key_frame):
+        """プローブ側のキーごとの種類番号（一致しなければ -1）"""
+        if len(self.keys) > 1:
+            return self.index.get_indexer(pd.MultiIndex.from_frame(key_frame))
+        series = key_frame.iloc[:, 0]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # カテゴリ型はカテゴリの値だけを引き、行ごとの番号はコードから配る
+            found = self.index.get_indexer(series.cat.categories)
+            codes = series.cat.codes.to_numpy()
+            return np.where(codes >= 0, found[codes], -1)
+        if self._direct is not None and isinstance(series.dtype, np.dtype) and series.dtype.kind == "i":
+            offset = series.to_numpy().astype(np.int64, copy=False) - self._low
+            codes = np.take(self._direct, offset, mode="clip")
+            codes[(offset < 0) | (offset >= len(self._direct))] = -1
+            return codes
+        return self.index.get_indexer(series)
+
+    def contains(self, key_frame):
+        """プローブ側の行ごとに、参照側に一致するキーがあるか"""
+        return self.lookup(key_frame) >= 0
+
+    def match(self, key_frame, keep_unmatched=False):
+        """
+        (プローブ側の行位置, 参照側の行位置) を返す。並びはプローブ側の行順、同じ行の中では参照側の行順。
+        keep_unmatched=True なら一致しない行も1回ずつ残し、参照側の行位置を -1 にする。
+        """
+        codes = self.lookup(key_frame)
+        hit = codes >= 0
+        if not len(self.order):
+            probe = np.arange(len(codes)) if keep_unmatched else np.empty(0, dtype=np.int64)
+            return probe, np.full(len(probe), -1, dtype=np.int64)
+        if self.unique:
+            probe = np.arange(len(codes)) if keep_unmatched else np.flatnonzero(hit)
+            picked = codes[probe]
+            build = np.where(picked >= 0, self.order[self.starts[np.maximum(picked, 0)]], -1)
+            return probe, build
+
+        counts = np.where(hit, self.counts[np.maximum(codes, 0)], 0)
+        if keep_unmatched:
+            counts = np.maximum(counts, 1)
+        probe = np.repeat(np.arange(len(codes)), counts)
+        # 行ごとの何件目か（0, 1, ...）を足して参照側の位置を求める
+        offsets = np.arange(len(probe)) - np.repeat(np.cumsum(counts) - counts, counts)
+        picked = codes[probe]
+        build = np.where(
+            picked >= 0,
+            self.order[np.minimum(self.starts[np.maximum(picked, 0)] + offsets, len(self.order) - 1)],
+            -1,
+        )
+        return probe, build
+
+
+class BuildCache:
+    """
+    参照 CSV のハッシュ表を実行をまたいで保持する LRU キャッシュ。
+    キーは (ファイルパス, キー列, 取り出す列)。ファイルのサイズ・更新時刻・内容の簡易指紋が
+    変わっていたら作り直す。バッチ処理では同じワーカープロセスのファイル間で使い回される。
+    """
+
+    def __init__(self, memory_budget=DEFAULT_BUILD_CACHE_BUDGET):
+        self.memory_budget = memory_budget
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, path, keys, payload):
+        key = (os.path.normcase(os.path.abspath(path)), tuple(keys), tuple(payload))
+        # 読み込み中に書き換えられても古い内容で登録しないよう、先に状態を取っておく
+        stamp = ParseCache.source_stamp(path)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == stamp:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        if entry is not None:
+            self._bytes -= self._entries.pop(key)[2]
+        table = build_table(path, keys, payload)
+        size = table.nbytes
+        if size <= self.memory_budget:
+            self._entries[key] = (stamp, table, size)
+            self._bytes += size
+            while self._bytes > self.memory_budget:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+        return table
+
+
+def build_table(path, keys, payload):
+    """参照 CSV のキー列と取り出す列だけを読み、ハッシュ表を作る"""
+    frame = CsvService.load(path, usecols=list(dict.fromkeys(list(keys) + list(payload))))
+    return HashTable(frame, keys, payload)
@@ -0,0 +1,420 @@
+# core/planner.py
+
+import copy
+
+from core.rules.filter_rule import FilterRule
+from core.rules.aggregate_rule import AggregateRule
+from core.rules.condition_group_rule import ConditionGroupRule
+from core.rules.dedupe_rule import DedupeRule
+from core.rules.drop_column_rule import DropColumnRule
+from core.rules.expression_rule import ExpressionRule
+from core.rules.join_rule import JoinRule
+from core.rules.limit_rule import LimitRule
+from core.rules.rename_column_rule import RenameColumnRule
+from core.rules.sort_rule import SortRule
+from core.rules.top_n_rule import TopNRule
+
+# 小さいほど前へ移動させる
+_PRIORITY = {
+    "drop": 0,
+    "filter": 1,
+    "expr": 1,
+    "semi": 1,
+    "rename": 2,
+    "sort": 3,
+}
+
+
+class _Unplannable(Exception):
+    """列構成が曖昧で安全に並び替えられない場合"""
+
+
+class _Op:
+    """列を入力時の列ID で表した論理演算"""
+
+    def __init__(self, kind, rule, position, reads=(), ids=(), new_name=None):
+        self.kind = kind
+        self.rule = rule
+        self.positions = [position]
+        self.reads = set(reads)
+        self.ids = list(ids)
+        self.new_name = new_name
+        # filter 用: (ルール, 元の列名 → 列ID)
+        self.children = []
+        # sort 用: 行の値によってはエラーになる（行を減らすと結果が変わりうる）
+        self.fragile = False
+
+
+class LogicalPlan:
+    def __init__(self, original, rules, rewrites=None):
+        self.original = list(original)
+        self.rules = list(rules)
+        self.rewrites = rewrites or []
+
+    @property
+    def changed(self):
+        return bool(self.rewrites)
+
+    def explain(self):
+        lines = ["実行計画:"]
+        for index, rule in enumerate(self.rules, start=1):
+            lines.append(f"  [{index}] {rule.description()}")
+        if self.rewrites:
+            lines.append("書き換え:")
+            lines.extend(f"  - {note}" for note in self.rewrites)
+        else:
+            lines.append("書き換え: なし")
+        return "\n".join(lines)
+
+
+class QueryPlanner:
+    """
+    ルール列を実行前に並び替えて、同じ結果をより少ない処理量で得る。
+
+    - フィルタは並び替え・列名変更より前へ
+    - 列削除は列を参照するルールの直後(参照がなければ先頭)へ
+    - 連続するフィルタは1つの AND 条件グループへ統合（式フィルタは統合せずそのまま移動）
+    - 並び替えの直後の「先頭N件」は上位N件（部分選択）へ置き換え
+    解釈できないルールや列構成が曖昧な場合は元の順序のまま実行する。
+    """
+
+    def __init__(self, columns, fold=True, dtypes=None):
+        """
+        fold=False: 連続フィルタを統合しない（途中結果キャッシュの先頭一致を保つため）
+        dtypes: 入力の列名 → dtype。object 型（値の型が混在しうる）の列で並び替えるときは、
+                行によって並び替えがエラーになるかが変わるので、フィルタをその前へ移動しない。
+                None は CSV から解析した入力（列の値の型は混在しない）
+        """
+        self.columns = list(columns)
+        self.fold = fold
+        self.dtypes = dtypes or {}
+
+    def optimize(self, rules):
+        rules = list(rules)
+        try:
+            ops, rest = self._to_ops(rules)
+            ordered = self._reorder(ops)
+            merged = self._fold(ordered) if self.fold else ordered
+            planned = self._emit(merged)
+        except _Unplannable:
+            planned, rewrites = _fuse_top_n(rules)
+            return LogicalPlan(rules, planned, rewrites)
+
+        planned.extend(rest)
+        rewrites = self._describe(ops, merged)
+        rewrites.extend(f"「{rule.description()}」は対象列がないため除外" for rule in self._removed)
+        if not rewrites:
+            planned = rules
+        planned, fused = _fuse_top_n(planned)
+        rewrites.extend(fused)
+        return LogicalPlan(rules, planned, rewrites)
+
+    def required_columns(self, rules):
+        """
+        ルール列が参照・出力する入力列名を入力の列順で返す。
+        列構成が曖昧、または存在しない列を参照する場合は None（全列を読む）。
+        """
+        if len(set(self.columns)) != len(self.columns):
+            return None
+
+        live = [(i, name) for i, name in enumerate(self.columns)]
+        used = set()
+
+        def resolve(name):
+            for col_id, current in live:
+                if current == name:
+                    return col_id
+            return None
+
+        for rule in rules:
+            if _is_expression_filter(rule):
+                ids = [resolve(name) for name in rule.columns()]
+                if None in ids:
+                    return None
+                used.update(ids)
+
+            elif _is_semi_join(rule):
+                ids = [resolve(name) for name in rule.columns()]
+                if None in ids:
+                    return None
+                used.update(ids)
+
+            elif isinstance(rule, (FilterRule, ConditionGroupRule, SortRule)):
+                names = rule.columns() if isinstance(rule, SortRule) else _filter_columns(rule)
+                ids = [resolve(name) for name in names]
+                if None in ids:
+                    return None
+                used.update(ids)
+
+            elif isinstance(rule, TopNRule):
+                ids = [resolve(name) for name in rule.columns]
+                if None in ids:
+                    return None
+                used.update(ids)
+
+            elif isinstance(rule, LimitRule):
+                continue
+
+            elif isinstance(rule, DedupeRule):
+                # 判定に使う列だけが必要（全列で判定するなら残っている列すべて）
+                ids = [col_id for col_id, _ in live] if rule.columns is None else [resolve(n) for n in rule.columns]
+                if None in ids:
+                    return None
+                used.update(ids)
+
+            elif isinstance(rule, AggregateRule):
+                # 集計後の列はすべて集計結果なので、入力で必要なのはキーと集計する列だけ
+                ids = [resolve(name) for name in rule.columns()]
+                if None in ids:
+                    return None
+                used.update(ids)
+                live = []
+                break
+
+            elif isinstance(rule, DropColumnRule):
+                live = [(col_id, name) for col_id, name in live if name not in rule.columns]
+
+            elif isinstance(rule, RenameColumnRule):
+                if resolve(rule.old_name) is None or rule.old_name == rule.new_name:
+                    continue
+                if resolve(rule.new_name) is not None:
+                    return None
+                live = [(i, rule.new_name if name == rule.old_name else name) for i, name in live]
+
+            else:
+                # 未知のルールはどの列を読むか分からないので、残っている列はすべて必要
+                break
+
+        used.update(col_id for col_id, _ in live)
+        if not used:
+            # 列が0本だと行数が分からなくなるので全列を読む
+            return None
+        return [name for i, name in enumerate(self.columns) if i in used]
+
+    # --- 列構成のシミュレーション ---
+    def _to_ops(self, rules):
+        if len(set(self.columns)) != len(self.columns):
+            raise _Unplannable()
+
+        # (列ID, 現在の列名)
+        live = [(i, name) for i, name in enumerate(self.columns)]
+
+        def resolve(name):
+            for col_id, current in live:
+                if current == name:
+                    return col_id
+            # 存在しない列 → 元の順序で実行してエラーもそのまま出す
+            raise _Unplannable()
+
+        ops = []
+        self._removed = []
+        for position, rule in enumerate(rules):
+            if isinstance(rule, (FilterRule, ConditionGroupRule)):
+                bindings = {name: resolve(name) for name in _filter_columns(rule)}
+                op = _Op("filter", rule, position, reads=bindings.values())
+                op.children = [(rule, bindings)]
+                ops.append(op)
+
+            elif _is_expression_filter(rule):
+                bindings = {name: resolve(name) for name in rule.columns()}
+                op = _Op("expr", rule, position, reads=bindings.values())
+                op.children = [(rule, bindings)]
+                ops.append(op)
+
+            elif _is_semi_join(rule):
+                # 参照 CSV にキーがある行へ絞るだけなので、フィルタと同じく前へ動かせる
+                bindings = {name: resolve(name) for name in rule.columns()}
+                op = _Op("semi", rule, position, reads=bindings.values())
+                op.children = [(rule, bindings)]
+                ops.append(op)
+
+            elif isinstance(rule, SortRule):
+                bindings = {name: resolve(name) for name in rule.columns()}
+                op = _Op("sort", rule, position, reads=bindings.values(), ids=bindings.values())
+                op.children = [(rule, bindings)]
+                op.fragile = any(
+                    self.dtypes.get(self.columns[col_id]) == object for col_id in bindings.values()
+                )
+                ops.append(op)
+
+            elif isinstance(rule, DropColumnRule):
+                dropped = [col_id for col_id, name in live if name in rule.columns]
+                live = [(col_id, name) for col_id, name in live if col_id not in dropped]
+                ops.append(_Op("drop", rule, position, ids=dropped))
+
+            elif isinstance(rule, RenameColumnRule):
+                targets = [col_id for col_id, name in live if name == rule.old_name]
+                if not targets or rule.old_name == rule.new_name:
+                    # 何も変わらないので計画からは外す
+                    self._removed.append(rule)
+                    continue
+                if any(name == rule.new_name for _, name in live):
+                    raise _Unplannable()
+                col_id = targets[0]
+                live = [(i, rule.new_name if i == col_id else name) for i, name in live]
+                ops.append(_Op("rename", rule, position, ids=[col_id], new_name=rule.new_name))
+
+            else:
+                # 未知のルール以降はそのまま実行
+                return ops, rules[position:]
+
+        return ops, []
+
+    # --- 並び替え ---
+    @staticmethod
+    def _commutes(op, other):
+        """op を other の前へ移動できるか"""
+        kinds = {op.kind, other.kind}
+        if kinds == {"sort"} or kinds == {"rename"}:
+            return False
+        if other.fragile and op.kind in ("filter", "expr", "semi"):
+            # 行を減らしてから並び替えると、元の順序ならエラーになる入力が通ってしまう
+            return False
+        if "drop" in kinds:
+            drop, peer = (op, other) if op.kind == "drop" else (other, op)
+            if peer.kind == "drop":
+                return True
+            if peer.kind == "rename":
+                return not set(drop.ids) & set(peer.ids)
+            return not set(drop.ids) & peer.reads
+        return True
+
+    def _reorder(self, ops):
+        ordered = []
+        for op in ops:
+            index = len(ordered)
+            while (
+                index > 0
+                and _PRIORITY[op.kind] < _PRIORITY[ordered[index - 1].kind]
+                and self._commutes(op, ordered[index - 1])
+            ):
+                index -= 1
+            ordered.insert(index, op)
+        return ordered
+
+    @staticmethod
+    def _fold(ops):
+        merged = []
+        for op in ops:
+            previous = merged[-1] if merged else None
+            if previous is not None and previous.kind == op.kind and op.kind in ("filter", "drop"):
+                combined = _Op(op.kind, None, None)
+                combined.positions = previous.positions + op.positions
+                combined.reads = previous.reads | op.reads
+                combined.ids = previous.ids + op.ids
+                combined.children = previous.children + op.children
+                merged[-1] = combined
+            else:
+                merged.append(op)
+        return merged
+
+    # --- ルールへ戻す ---
+    def _emit(self, ops):
+        names = {i: name for i, name in enumerate(self.columns)}
+        rules = []
+        for op in ops:
+            if op.kind == "drop":
+                columns = [names.pop(col_id) for col_id in op.ids if col_id in names]
+                if columns:
+                    rules.append(DropColumnRule(columns))
+
+            elif op.kind in ("filter", "expr", "semi"):
+                children = []
+                for child, bindings in op.children:
+                    if any(col_id not in names for col_id in bindings.values()):
+                        raise _Unplannable()
+                    mapping = {old: names[col_id] for old, col_id in bindings.items()}
+                    children.append(_rebind(child, mapping))
+                rules.append(children[0] if len(children) == 1 else _and_group(children))
+
+            elif op.kind == "sort":
+                (sort, bindings), = op.children
+                if any(col_id not in names for col_id in bindings.values()):
+                    raise _Unplannable()
+                rules.append(sort.rebind({old: names[col_id] for old, col_id in bindings.items()}))
+
+            elif op.kind == "rename":
+                col_id = op.ids[0]
+                if col_id not in names or op.new_name in names.values():
+                    raise _Unplannable()
+                rules.append(RenameColumnRule(names[col_id], op.new_name))
+                names[col_id] = op.new_name
+
+        return rules
+
+    @staticmethod
+    def _describe(ops, merged):
+        notes = []
+        order = [position for op in merged for position in op.positions]
+        for rank, position in enumerate(order):
+            earlier = [p for p in order[rank + 1:] if p < position]
+            if earlier:
+                rule = next(op.rule for op in ops if op.positions == [position])
+                notes.append(f"「{rule.description()}」を {position + 1} 番目から前方へ移動")
+        for op in merged:
+            if len(op.positions) > 1 and op.kind == "filter":
+                notes.append(f"フィルタ {len(op.positions)} 件を1つの AND 条件グループに統合")
+            elif len(op.positions) > 1 and op.kind == "drop":
+                notes.append(f"列削除 {len(op.positions)} 件を1つに統合")
+        return notes
+
+
+def _filter_columns(rule):
+    if isinstance(rule, ConditionGroupRule):
+        return rule.columns()
+    return [rule.column]
+
+
+def _fuse_top_n(rules):
+    """並び替えの直後の「先頭N件」を上位N件のルール1つにまとめる"""
+    fused = []
+    notes = []
+    for rule in rules:
+        previous = fused[-1] if fused else None
+        if isinstance(rule, LimitRule) and isinstance(previous, SortRule):
+            columns, ascending, na_position = zip(*previous.keys)
+            fused[-1] = TopNRule(columns, list(ascending), rule.count, list(na_position))
+            notes.append(f"「{previous.description()}」と「{rule.description()}」を上位 {rule.count} 件の部分選択に置き換え")
+        else:
+            fused.append(rule)
+    return fused, notes
+
+
+def _is_expression_filter(rule):
+    """行を絞るだけの式ルール（構文に誤りがあれば未知のルールとして実行時にエラーを出す）"""
+    if not isinstance(rule, ExpressionRule) or rule.target is not None:
+        return False
+    try:
+        rule.columns()
+    except ValueError:
+        return False
+    return True
+
+
+def _is_semi_join(rule):
+    """列を足さずに行を絞るだけの結合"""
+    return isinstance(rule, JoinRule) and rule.how == "semi"
+
+
+def _rebind(rule, mapping):
+    """列名変更をまたいで移動したフィルタの列名を付け替える"""
+    if isinstance(rule, (ExpressionRule, JoinRule)):
+        return rule.rebind(mapping)
+    if isinstance(rule, ConditionGroupRule):
+        return ConditionGroupRule([_rebind(r, mapping) for r in rule.rules], rule.operator)
+    column = mapping.get(rule.column, rule.column)
+    if column == rule.column:
+        return rule
+    rebound = copy.copy(rule)
+    rebound.column = column
+    return rebound
+
+
+def _and_group(rules):
+    flat = []
+    for rule in rules:
+        if isinstance(rule, ConditionGroupRule) and rule.operator == "AND":
+            flat.extend(rule.rules)
+        else:
+            flat.append(rule)
+    return ConditionGroupRule(flat, operator="AND")
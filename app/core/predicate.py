@@ -0,0 +1,326 @@
+# core/predicate.py
+
+import operator
+
+import numpy as np
+import pandas as pd
+
+from core.rules.filter_rule import TEXT_OPERATORS
+
+# 数値列 × 数値の比較は NumPy で直接評価する
+_NUMPY_OPS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    ">": operator.gt,
+    "<": operator.lt,
+    ">=": operator.ge,
+    "<=": operator.le,
+}
+
+# 評価順の見積もりに使う標本の行数（これ以下の行数なら全行で見積もる）
+SAMPLE_ROWS = 2_000
+# 1行あたりの評価コストの目安（数値列の比較を 1 とする）
+COST_NUMERIC = 1.0
+COST_CATEGORY = 1.0
+COST_COMPARE = 4.0
+COST_CONTAINS = 20.0
+COST_REGEX = 50.0
+
+
+class Predicate:
+    """
+    FilterRule / ConditionGroupRule を1つの条件木にまとめて評価する。
+
+    評価は行数分の bool 配列1本を使い回す:
+      AND: まだ残っている行だけで次の条件を評価し、mask &= 結果
+      OR : まだ True になっていない行だけで次の条件を評価し、mask |= 結果
+    条件ごとに全行分のマスクを作って pd.concat で結合するより割り当てが少ない。
+    reordered() で子条件の評価順を見積もりに基づいて並び替えられる（結果は同じ）。
+    """
+
+    def __init__(self, node):
+        self._node = node
+        # 評価順の見積もり（ログ用の行のリスト）
+        self.estimates = []
+
+    def columns(self):
+        return list(dict.fromkeys(self._node.columns()))
+
+    def evaluate(self, df):
+        """df の各行が条件を満たすかを bool の ndarray で返す"""
+        if df.columns.has_duplicates and df.columns[df.columns.duplicated()].isin(self.columns()).any():
+            return _all(_duplicate_masks(self._node, df), len(df))
+        context = _Columns(df)
+        selected = np.ones(len(df), dtype=bool)
+        return self._node.evaluate(context, selected)
+
+    def reordered(self, df):
+        """
+        df の標本で子条件ごとの通過率を測り、コストの目安と合わせて評価順を決めた条件木を返す。
+          AND: 安くて多くを落とす条件から（コスト / 落とす割合 の小さい順）
+          OR : 安くて多くを通す条件から（コスト / 通す割合 の小さい順）
+        見積もれない（列がない・型が合わないなど）ときは自分をそのまま返す。
+        標本の全行で各条件を評価できたなら、列の型による比較のエラーは起きない。
+        ただし object 型の列（値の型が混在しうる）の比較は行によってエラーになるかが変わり、
+        評価順を変えるとエラーが出なくなることがあるので並び替えない。
+        """
+        if not len(df):
+            return self
+        try:
+            if any(
+                rule is not None and rule.operator not in TEXT_OPERATORS and df[rule.column].dtype == object
+                for rule in _order(self._node)
+            ):
+                return self
+        except (KeyError, AttributeError):
+            return self
+        if len(df) > SAMPLE_ROWS:
+            # 並び替え済みの入力でも偏らないよう、全体から等間隔に抜き取る
+            df = df.iloc[np.linspace(0, len(df) - 1, SAMPLE_ROWS).astype(np.intp)]
+        try:
+            node = self._node.reorder(_Columns(df))
+        except Exception:
+            return self
+        planned = Predicate(node)
+        changed = _order(node) != _order(self._node)
+        planned.estimates = [
+            f"条件の評価順 (標本 {len(df):,} 行で見積もり, {'並び替えあり' if changed else '元の順序のまま'}):"
+        ] + node.explain(depth=1)
+        return planned
+
+    def mask(self, df):
+        return pd.Series(self.evaluate(df), index=df.index)
+
+
+def compile_predicate(rule):
+    """フィルタ系ルールを条件木に変換する"""
+    return Predicate(_compile(rule))
+
+
+def _compile(rule):
+    if hasattr(rule, "rules"):
+        children = [_compile(child) for child in rule.rules]
+        if not children:
+            return _Const(True)
+        return _And(children) if rule.operator == "AND" else _Or(children)
+    return _Leaf(rule)
+
+
+class _Columns:
+    """評価中に使う列のキャッシュ"""
+
+    def __init__(self, df):
+        self.df = df
+        self._series = {}
+
+    def __len__(self):
+        return len(self.df)
+
+    def get(self, name):
+        if name not in self._series:
+            self._series[name] = self.df[name]
+        return self._series[name]
+
+
+class _Const:
+    def __init__(self, value):
+        self.value = value
+        self.estimate = (0.0, 1.0 if value else 0.0)
+
+    def columns(self):
+        return []
+
+    def reorder(self, context):
+        return self
+
+    def explain(self, depth):
+        return [f"{'  ' * depth}{'すべて通す' if self.value else 'すべて落とす'}"]
+
+    def evaluate(self, context, selected):
+        return selected.copy() if self.value else np.zeros_like(selected)
+
+
+class _And:
+    label = "AND"
+
+    def __init__(self, children):
+        self.children = children
+        # (1行あたりの評価コスト, 通過率)。reorder で標本から求める
+        self.estimate = None
+
+    def columns(self):
+        return [name for child in self.children for name in child.columns()]
+
+    def reorder(self, context):
+        children = [child.reorder(context) for child in self.children]
+        # 同じ見積もりの条件は元の順序のまま
+        children.sort(key=lambda child: _rank(child.estimate[0], 1 - child.estimate[1], len(context)))
+        return _estimated(_And(children), context)
+
+    def explain(self, depth):
+        return _explain_group(self, depth)
+
+    def evaluate(self, context, selected):
+        alive = selected.copy()
+        for child in self.children:
+            # 子は alive の範囲でだけ True を返すので、そのまま絞り込める
+            alive &= child.evaluate(context, alive)
+        return alive
+
+
+class _Or:
+    label = "OR"
+
+    def __init__(self, children):
+        self.children = children
+        self.estimate = None
+
+    def columns(self):
+        return [name for child in self.children for name in child.columns()]
+
+    def reorder(self, context):
+        children = [child.reorder(context) for child in self.children]
+        children.sort(key=lambda child: _rank(child.estimate[0], child.estimate[1], len(context)))
+        return _estimated(_Or(children), context)
+
+    def explain(self, depth):
+        return _explain_group(self, depth)
+
+    def evaluate(self, context, selected):
+        hit = np.zeros_like(selected)
+        pending = selected.copy()
+        for child in self.children:
+            matched = child.evaluate(context, pending)
+            hit |= matched
+            pending &= ~matched
+        return hit
+
+
+class _Leaf:
+    def __init__(self, rule):
+        self.rule = rule
+        self.estimate = None
+
+    def columns(self):
+        return [self.rule.column]
+
+    def reorder(self, context):
+        leaf = _Leaf(self.rule)
+        passed = leaf.evaluate(context, np.ones(len(context), dtype=bool))
+        leaf.estimate = (_leaf_cost(self.rule, context.get(self.rule.column)), float(passed.mean()))
+        return leaf
+
+    def explain(self, depth):
+        cost, selectivity = self.estimate
+        return [f"{'  ' * depth}{self.rule.description()} (通過率 {selectivity:.1%}, コスト {cost:g})"]
+
+    def evaluate(self, context, selected):
+        series = context.get(self.rule.column)
+        if selected.all():
+            result = self._compare(series)
+            return result
+        result = np.zeros_like(selected)
+        index = np.flatnonzero(selected)
+        result[index] = self._compare(series.iloc[index])
+        return result
+
+    def _compare(self, series):
+        value = self.rule.value
+        op = _NUMPY_OPS.get(self.rule.operator)
+        if (
+            op is not None
+            and series.dtype.kind in "iuf"
+            and isinstance(value, (int, float, np.number))
+            and not isinstance(value, bool)
+        ):
+            return op(series.to_numpy(), value)
+        return _to_bool(self.rule._compare(series))
+
+
+def _duplicate_masks(node, df):
+    """
+    参照する列名が重複した入力用（列名変更で既存の列名に重ねたときなど）。
+    同名の列それぞれで条件を評価したマスクを並べ、AND はすべて・OR はいずれかを満たす行を残す
+    （短絡評価はしない）
+    """
+    if isinstance(node, _Const):
+        return [np.full(len(df), node.value)]
+    if isinstance(node, _Leaf):
+        column = df[node.rule.column]
+        if isinstance(column, pd.Series):
+            return [node._compare(column)]
+        return [node._compare(column.iloc[:, i]) for i in range(column.shape[1])]
+    masks = [mask for child in node.children for mask in _duplicate_masks(child, df)]
+    if isinstance(node, _And):
+        return [_all(masks, len(df))]
+    return [np.logical_or.reduce(masks)]
+
+
+def _all(masks, rows):
+    return np.logical_and.reduce(masks) if masks else np.ones(rows, dtype=bool)
+
+
+def _leaf_cost(rule, series):
+    """1行あたりの評価コストの目安"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # カテゴリ型は種類ごとに1回だけ評価し、行へはコードで引き当てる
+        return COST_CATEGORY
+    if rule.operator in TEXT_OPERATORS:
+        return COST_REGEX if rule.regex or rule.operator == "contains_any" else COST_CONTAINS
+    if (
+        series.dtype.kind in "iuf"
+        and isinstance(rule.value, (int, float, np.number))
+        and not isinstance(rule.value, bool)
+    ):
+        return COST_NUMERIC
+    return COST_COMPARE
+
+
+def _rank(cost, fraction, rows):
+    """評価順の並べ替えキー。fraction は AND なら落とす割合、OR なら通す割合（0 / 1 にならないよう補正）"""
+    return cost / ((fraction * rows + 0.5) / (rows + 1))
+
+
+def _estimated(node, context):
+    """並び替えた子の順に標本を評価し、グループ全体のコストと通過率を求める"""
+    selected = np.ones(len(context), dtype=bool)
+    rows = max(len(context), 1)
+    cost = 0.0
+    if isinstance(node, _And):
+        alive = selected.copy()
+        for child in node.children:
+            cost += child.estimate[0] * alive.sum() / rows
+            alive &= child.evaluate(context, alive)
+        passed = alive
+    else:
+        passed = np.zeros_like(selected)
+        pending = selected.copy()
+        for child in node.children:
+            cost += child.estimate[0] * pending.sum() / rows
+            matched = child.evaluate(context, pending)
+            passed |= matched
+            pending &= ~matched
+    node.estimate = (cost, float(passed.mean()) if len(passed) else 0.0)
+    return node
+
+
+def _explain_group(node, depth):
+    cost, selectivity = node.estimate
+    lines = [f"{'  ' * depth}{node.label} (通過率 {selectivity:.1%}, コスト {cost:.3g})"]
+    for child in node.children:
+        lines.extend(child.explain(depth + 1))
+    return lines
+
+
+def _order(node):
+    """条件木の葉の並び（並び替えたかどうかの判定用）"""
+    if hasattr(node, "children"):
+        return [rule for child in node.children for rule in _order(child)]
+    return [getattr(node, "rule", None)]
+
+
+def _to_bool(mask):
+    if mask.dtype == bool:
+        return mask.to_numpy()
+    # 欠損を含む nullable boolean などは False 扱い
+    return mask.to_numpy(dtype=bool, na_value=False)
@@ -1,18 +1,132 @@
 # core/processor.py
 
+from core.frame_view import FrameView
+from core.planner import QueryPlanner
+from core.services.csv_service import CsvService
+
+class ExecutionCancelled(Exception):
+    """cancel() が True を返したため実行を中断した"""
+
+
 class CsvProcessor:
-    def __init__(self, rules, logger=None):
+    def __init__(self, rules, logger=None, optimize=True, progress=None, cancel=None, cache=None,
+                 indexes=None, profiler=None):
+        """
+        progress: progress(処理済み行数, 進捗率 0.0〜1.0) を呼ぶコールバック
+        cancel:   True を返すとルールの区切りで ExecutionCancelled を送出する
+        cache:    ResultCache。渡すとルール列の先頭部分の途中結果を再利用する
+        indexes:  ColumnIndexes。渡すと入力の列索引を作って実行をまたいで使い回す
+                  （入力をその場で書き換えたら indexes.invalidate(入力) を呼ぶ）
+        profiler: Profiler。渡すとルールごとの処理時間・行数・メモリを計測する
+        """
         self.rules = rules
         self.logger = logger
+        self.optimize = optimize
+        self.progress = progress
+        self.cancel = cancel
+        self.cache = cache
+        self.indexes = indexes
+        self.profiler = profiler
+
+    def plan(self, df):
+        """実行前にルール列を最適化した計画を返す"""
+        # キャッシュ利用時は、後ろのルールを変えても計画の先頭が変わらないよう統合しない
+        planner = QueryPlanner(_column_names(df), fold=self.cache is None, dtypes=_column_dtypes(df))
+        return planner.optimize(self.rules)
+
+    def required_columns(self, columns):
+        """入力の列名一覧から、このワークフローが読む・出力する列だけを返す"""
+        return QueryPlanner(columns).required_columns(self.rules)
+
+    def load(self, path, dtype=None, use_cache=True, compact=None):
+        """必要な列だけを読み込む（列の射影を CSV 読み込みへ押し下げる）"""
+        header = CsvService.read_header(path)
+        usecols = self.required_columns(header.columns)
+        if self.logger and usecols is not None:
+            self.logger(f"読み込み列: {len(usecols)} / {len(header.columns)} 列")
+        return CsvService.load(
+            path, usecols=usecols, dtype=dtype, use_cache=use_cache, compact=compact, logger=self.logger
+        )
 
     def execute(self, df):
-        result = df
-        for index, rule in enumerate(self.rules, start=1):
-            before = len(result)
+        return self.execute_view(FrameView.from_frame(df)).materialize()
+
+    def execute_view(self, view):
+        """FrameView を受け取り、実体化せずに結果の FrameView を返す"""
+        if not self.optimize:
+            return self._run(self.rules, view)
+
+        # 計画は元の順序と同じ入力でエラーになる（ならない）ように組むので、エラーはそのまま出す
+        plan = self.plan(view)
+        if self.logger:
+            self.logger(plan.explain() + "\n")
+        return self._run(plan.rules, view)
+
+    def _run(self, rules, view):
+        if self.profiler is None:
+            return self._run_rules(rules, view)
+        self.profiler.begin(len(rules), logger=self.logger)
+        try:
+            return self._run_rules(rules, view)
+        finally:
+            self.profiler.end()
+
+    def _run_rules(self, rules, view):
+        # ルール間は FrameView（行位置 + 列情報）で受け渡し、最後に1回だけ実体化する
+        if self.indexes is not None:
+            view = FrameView(view.base, view.rows, view.columns, self.indexes)
+        done = 0
+        base = view.base
+        keys = [None] * len(rules)
+        start = 0
+        if self.cache is not None:
+            keys = self.cache.prefix_keys(self.cache.input_key(view), rules)
+            # 変わっていない最長の先頭部分から再開する
+            for k in range(len(rules), 0, -1):
+                cached = self.cache.get(keys[k - 1], base) if keys[k - 1] else None
+                if cached is not None:
+                    view, start = cached, k
+                    view.indexes = self.indexes
+                    if self.logger:
+                        self.logger(f"キャッシュを再利用: 先頭 {k} ルールをスキップ\n")
+                    break
+
+        for index, rule in enumerate(rules, start=1):
+            if index <= start:
+                continue
+            if self.cancel and self.cancel():
+                raise ExecutionCancelled()
+            before = len(view)
             if self.logger:
                 self.logger(f"[{index}] {rule.description()}")
-            result = rule.apply(result)
-            after = len(result)
+            if self.profiler is None:
+                view = rule.apply_view(view)
+            else:
+                probe = self.profiler.start(index, rule, before)
+                view = rule.apply_view(view)
+                self.profiler.stop(probe, len(view))
+            after = len(view)
             if self.logger:
+                for note in rule.execution_notes():
+                    self.logger(note)
                 self.logger(f"件数: {before} → {after}\n")
-        return result
+            if self.cache is not None:
+                self.cache.put(keys[index - 1], base, view)
+            if self.progress:
+                # 残りのルールは多くても現在の行数しか処理しない
+                done += before
+                remaining = after * (len(rules) - index)
+                self.progress(done, done / (done + remaining) if done + remaining else 1.0)
+        return view
+
+
+def _column_names(data):
+    if isinstance(data, FrameView):
+        return data.column_names
+    return data.columns
+
+
+def _column_dtypes(data):
+    if isinstance(data, FrameView):
+        return {name: data.base.dtypes.iloc[position] for position, name in data.columns}
+    return dict(data.dtypes.items())
@@ -0,0 +1,207 @@
+# core/profiling.py
+
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+
+class Profiler:
+    """
+    CsvProcessor のルールごとの計測値を集めて出力先（sink）へ渡す。
+
+    1ルールごとに1件の event（dict）を作る:
+      index, rule, type, start_s, wall_s, cpu_s, rows_in, rows_out, selectivity,
+      alloc_bytes, peak_bytes（memory=True のときだけ。それ以外は None）
+    alloc_bytes はルールの前後で増えたメモリ、peak_bytes はルール実行中の最大増加量。
+    memory=True は tracemalloc を使うため処理が数倍遅くなる。既定の計測は時刻を読むだけ。
+    """
+
+    def __init__(self, sinks=(), memory=False):
+        self.sinks = list(sinks)
+        self.memory = memory
+        self.events = []
+        self.runs = 0
+        self._origin = time.perf_counter()
+        self._started_tracing = False
+        self._run_start = None
+
+    def begin(self, rule_count, logger=None):
+        """実行の開始。logger は LogSink の既定の出力先"""
+        self.runs += 1
+        self.events = []
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._run_start = (time.perf_counter(), time.thread_time())
+        for sink in self.sinks:
+            sink.begin(self, rule_count, logger)
+
+    def start(self, index, rule, rows_in):
+        """ルールの直前に呼ぶ。stop へ渡す値を返す"""
+        memory = None
+        if self.memory:
+            tracemalloc.reset_peak()
+            memory = tracemalloc.get_traced_memory()[0]
+        return index, rule, rows_in, memory, time.perf_counter(), time.thread_time()
+
+    def stop(self, probe, rows_out):
+        """ルールの直後に呼ぶ"""
+        wall_end, cpu_end = time.perf_counter(), time.thread_time()
+        index, rule, rows_in, memory, wall_start, cpu_start = probe
+        alloc = peak = None
+        if memory is not None:
+            current, highest = tracemalloc.get_traced_memory()
+            alloc, peak = current - memory, highest - memory
+        event = {
+            "run": self.runs,
+            "index": index,
+            "rule": rule.description(),
+            "type": type(rule).__name__,
+            "start_s": wall_start - self._origin,
+            "wall_s": wall_end - wall_start,
+            "cpu_s": cpu_end - cpu_start,
+            "rows_in": rows_in,
+            "rows_out": rows_out,
+            "selectivity": rows_out / rows_in if rows_in else None,
+            "alloc_bytes": alloc,
+            "peak_bytes": peak,
+        }
+        self.events.append(event)
+        for sink in self.sinks:
+            sink.rule(event)
+        return event
+
+    def end(self):
+        """実行の終了（エラーで中断したときも呼ぶ）"""
+        wall_start, cpu_start = self._run_start
+        summary = {
+            "run": self.runs,
+            "rules": len(self.events),
+            "start_s": wall_start - self._origin,
+            "wall_s": time.perf_counter() - wall_start,
+            "cpu_s": time.thread_time() - cpu_start,
+            "rows_in": self.events[0]["rows_in"] if self.events else None,
+            "rows_out": self.events[-1]["rows_out"] if self.events else None,
+        }
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        for sink in self.sinks:
+            sink.end(summary, self.events)
+        return summary
+
+
+class LogSink:
+    """計測値をログ（GUI のログ欄など）へ1行ずつ書き、最後に時間のかかったルールを並べる"""
+
+    def __init__(self, logger=None, top=5):
+        """logger を省略すると CsvProcessor の logger へ書く"""
+        self.logger = logger
+        self.top = top
+        self._write = None
+
+    def begin(self, profiler, rule_count, logger):
+        self._write = self.logger or logger
+
+    def rule(self, event):
+        if self._write is None:
+            return
+        line = (
+            f"計測 [{event['index']}] {event['wall_s'] * 1000:.1f} ms (CPU {event['cpu_s'] * 1000:.1f} ms) "
+            f"{event['rows_in']:,} → {event['rows_out']:,} 行"
+        )
+        if event["selectivity"] is not None:
+            line += f" ({event['selectivity']:.1%})"
+        if event["alloc_bytes"] is not None:
+            line += f" メモリ {_mb(event['alloc_bytes'])} (ピーク {_mb(event['peak_bytes'])})"
+        self._write(line)
+
+    def end(self, summary, events):
+        if self._write is None or not events:
+            return
+        total = summary["wall_s"]
+        self._write(f"ルール別の処理時間（上位 {min(self.top, len(events))} 件 / 合計 {total * 1000:.1f} ms）:")
+        for event in sorted(events, key=lambda e: e["wall_s"], reverse=True)[:self.top]:
+            share = event["wall_s"] / total if total else 0.0
+            self._write(f"  [{event['index']}] {event['wall_s'] * 1000:8.1f} ms {share:6.1%}  {event['rule']}")
+
+
+class JsonLinesSink:
+    """1ルール1行の JSON Lines ファイルへ追記する（実行の終わりに "event": "run" の行）"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def begin(self, profiler, rule_count, logger):
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def rule(self, event):
+        self._write(dict(event, event="rule"))
+
+    def end(self, summary, events):
+        self._write(dict(summary, event="run"))
+        self._file.close()
+        self._file = None
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+
+class ChromeTraceSink:
+    """
+    Chrome のトレース形式（chrome://tracing や Perfetto で開ける JSON）で書き出す。
+    実行ごとにファイル全体を書き直す（それまでの実行も含む）。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._events = []
+        self._tid = None
+
+    def begin(self, profiler, rule_count, logger):
+        self._tid = threading.get_ident()
+
+    def rule(self, event):
+        args = {k: v for k, v in event.items() if k not in ("rule", "start_s", "wall_s") and v is not None}
+        self._events.append({
+            "name": event["rule"],
+            "cat": event["type"],
+            "ph": "X",
+            "ts": event["start_s"] * 1e6,
+            "dur": event["wall_s"] * 1e6,
+            "pid": os.getpid(),
+            "tid": self._tid,
+            "args": args,
+        })
+        # 行数の推移をカウンタとして表示する
+        self._events.append({
+            "name": "行数",
+            "ph": "C",
+            "ts": (event["start_s"] + event["wall_s"]) * 1e6,
+            "pid": os.getpid(),
+            "args": {"rows": event["rows_out"]},
+        })
+
+    def end(self, summary, events):
+        self._events.append({
+            "name": f"実行 {summary['run']}",
+            "cat": "run",
+            "ph": "X",
+            "ts": summary["start_s"] * 1e6,
+            "dur": summary["wall_s"] * 1e6,
+            "pid": os.getpid(),
+            "tid": self._tid,
+            "args": {k: v for k, v in summary.items() if v is not None},
+        })
+        partial = self.path + ".tmp"
+        with open(partial, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self._events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+        os.replace(partial, self.path)
+
+
+def _mb(size):
+    return f"{size / 1024 / 1024:+.1f} MB"
@@ -0,0 +1,92 @@
+# core/result_cache.py
+
+import hashlib
+import json
+import weakref
+from collections import OrderedDict
+
+from core.frame_view import FrameView
+
+# 途中結果キャッシュの既定上限（バイト）
+DEFAULT_CACHE_BUDGET = 512 * 1024 * 1024
+
+
+class ResultCache:
+    """
+    ルール列の先頭 k 件を適用した途中結果（FrameView）を保持する LRU キャッシュ。
+    キーは「入力の同一性」+「先頭 k 件の cache_key()（既定は to_dict()）」のハッシュ。
+    最後のルールだけ変えて再実行したときは、変わっていない先頭部分を飛ばせる。
+    """
+
+    def __init__(self, memory_budget=DEFAULT_CACHE_BUDGET):
+        self.memory_budget = memory_budget
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    # --- キー ---
+    @staticmethod
+    def input_key(view):
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(repr((id(view.base), view.base.shape, view.columns)).encode("utf-8"))
+        if view.rows is not None:
+            digest.update(view.rows.tobytes())
+        return digest.hexdigest()
+
+    @staticmethod
+    def prefix_keys(input_key, rules):
+        """先頭 1..n 件ぶんのキーを返す。cache_key（既定は to_dict）できないルール以降は None"""
+        keys = []
+        digest = hashlib.blake2b(input_key.encode("utf-8"), digest_size=16)
+        for rule in rules:
+            try:
+                data = rule.cache_key()
+                encoded = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+            except (NotImplementedError, TypeError):
+                break
+            digest.update(encoded.encode("utf-8"))
+            keys.append(digest.copy().hexdigest())
+        return keys + [None] * (len(rules) - len(keys))
+
+    # --- 取得・登録 ---
+    def get(self, key, base):
+        entry = self._entries.get(key)
+        # id() の再利用で別の DataFrame に当たらないよう、入力の実体も確かめる
+        if entry is None or entry[0]() is not base:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        _, view, _ = entry
+        return FrameView(view.base, view.rows, view.columns)
+
+    def put(self, key, base, view):
+        if key is None:
+            return
+        # 実体化済みのフレームは持たず、行位置と列情報だけを保持する
+        view = FrameView(view.base, view.rows, view.columns)
+        size = 0 if view.rows is None else view.rows.nbytes
+        if view.base is not base:
+            size += int(view.base.memory_usage(deep=True).sum())
+        if size > self.memory_budget:
+            return
+
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[2]
+        self._entries[key] = (weakref.ref(base), view, size)
+        self._bytes += size
+        while self._bytes > self.memory_budget:
+            _, (_, _, evicted) = self._entries.popitem(last=False)
+            self._bytes -= evicted
@@ -2,6 +2,13 @@ from core.rules.filter_rule import FilterRule
 from core.rules.drop_column_rule import DropColumnRule
 from core.rules.sort_rule import SortRule
 from core.rules.rename_column_rule import RenameColumnRule
+from core.rules.condition_group_rule import ConditionGroupRule
+from core.rules.expression_rule import ExpressionRule
+from core.rules.limit_rule import LimitRule
+from core.rules.top_n_rule import TopNRule
+from core.rules.aggregate_rule import AggregateRule
+from core.rules.join_rule import JoinRule
+from core.rules.dedupe_rule import DedupeRule
 
 def create_rule_from_dict(data):
     rule_type = data.get("type")
@@ -18,5 +25,26 @@ def create_rule_from_dict(data):
     elif rule_type == "rename":
         return RenameColumnRule.from_dict(data)
 
+    elif rule_type == "ConditionGroupRule":
+        return ConditionGroupRule.from_dict(data)
+
+    elif rule_type == "expression":
+        return ExpressionRule.from_dict(data)
+
+    elif rule_type == "limit":
+        return LimitRule.from_dict(data)
+
+    elif rule_type == "top_n":
+        return TopNRule.from_dict(data)
+
+    elif rule_type == "aggregate":
+        return AggregateRule.from_dict(data)
+
+    elif rule_type == "join":
+        return JoinRule.from_dict(data)
+
+    elif rule_type == "dedupe":
+        return DedupeRule.from_dict(data)
+
     else:
         raise ValueError(f"未知のルールタイプ: {rule_type}")
@@ -0,0 +1,66 @@
+import pandas as pd
+
+from .base_rule import BaseRule
+from core.aggregate import DEFAULT_MAX_GROUPS, FUNCTIONS, HashAggregator, normalize_aggregations
+from core.frame_view import FrameView
+
+class AggregateRule(BaseRule):
+    pipeline_breaker = True
+
+    def __init__(self, keys, aggregations, max_groups=None):
+        """
+        keys: グループ化する列名のリスト（空なら全体で1行）
+        aggregations: (列名, 関数, 出力列名) または dict のリスト。関数は core.aggregate.FUNCTIONS
+        max_groups: ストリーミング時にメモリへ置くグループ数の上限（None は既定値）
+        """
+        self.keys = [keys] if isinstance(keys, str) else list(keys or [])
+        self.aggregations = normalize_aggregations(aggregations)
+        self.max_groups = max_groups
+
+    def columns(self):
+        """集計に使う入力列"""
+        return HashAggregator(self.keys, self.aggregations).columns()
+
+    def apply(self, df):
+        # メモリ上の DataFrame はグループ数も収まっているので退避しない
+        aggregator = HashAggregator(self.keys, self.aggregations, max_groups=None)
+        aggregator.add(df)
+        return pd.concat(list(aggregator.results()), ignore_index=True)
+
+    def apply_view(self, view):
+        # 集計に使う列だけを取り出して集計する
+        if not view.is_unique(self.columns()):
+            return super().apply_view(view)
+        return FrameView.from_frame(self.apply(view.frame(self.columns())))
+
+    def apply_stream(self, chunks):
+        # チャンクごとの部分集計をまとめるので、メモリはグループ数分で済む
+        aggregator = HashAggregator(self.keys, self.aggregations, max_groups=self.max_groups or DEFAULT_MAX_GROUPS)
+        for chunk in chunks:
+            aggregator.add(chunk)
+        yield from aggregator.results()
+
+    def description(self):
+        items = []
+        for column, func, name in self.aggregations:
+            label = FUNCTIONS[func] if column is None else f"{FUNCTIONS[func]}({column})"
+            items.append(label if name == label else f"{name} = {label}")
+        group = f"{', '.join(self.keys)} ごと" if self.keys else "全体"
+        return f"集計: {group} / {', '.join(items)}"
+
+    def to_dict(self):
+        data = {
+            "type": "aggregate",
+            "keys": self.keys,
+            "aggregations": [
+                {"column": column, "func": func, "name": name}
+                for column, func, name in self.aggregations
+            ]
+        }
+        if self.max_groups:
+            data["max_groups"] = self.max_groups
+        return data
+
+    @staticmethod
+    def from_dict(data):
+        return AggregateRule(data.get("keys", []), data["aggregations"], data.get("max_groups"))
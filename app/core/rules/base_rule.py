@@ -1,13 +1,46 @@
+from core.frame_view import FrameView
+
+
 class BaseRule:
+    # 全行がそろわないと処理できないルール（並び替えなど）は True
+    pipeline_breaker = False
+
     def apply(self, df):
         raise NotImplementedError
 
+    def apply_view(self, view):
+        """FrameView を受け取り FrameView を返す。既定では実体化して apply する"""
+        return FrameView.from_frame(self.apply(view.materialize()))
+
+    def apply_stream(self, chunks):
+        """
+        チャンクの iterator を受け取り、処理済みチャンクを順に返す。
+        全行が必要なルール（pipeline_breaker）は、メモリ上限を守る apply_stream を自分で実装する
+        （全チャンクをメモリ上で1つにまとめる既定の処理は用意しない）
+        """
+        if self.pipeline_breaker:
+            raise NotImplementedError(f"ストリーミング処理に対応していないルールです: {self.description()}")
+        for chunk in chunks:
+            yield self.apply(chunk)
+
+    def supports_streaming(self):
+        """チャンク単位で処理できるか（全行が必要なルールは apply_stream の実装が要る）"""
+        return not self.pipeline_breaker or type(self).apply_stream is not BaseRule.apply_stream
+
     def description(self):
         raise NotImplementedError
 
+    def execution_notes(self):
+        """直前の実行で決めた内部の処理方法（条件の評価順など）をログ用の行のリストで返す"""
+        return []
+
     def to_dict(self):
         raise NotImplementedError
 
+    def cache_key(self):
+        """途中結果キャッシュのキーに使う値。ルール外のファイルを読むルールはその状態も含める"""
+        return self.to_dict()
+
     @staticmethod
     def from_dict(data):
         raise NotImplementedError
@@ -1,9 +1,12 @@
 # app/core/rules/condition_group_rule.py
 
+from core.rules.base_rule import BaseRule
 from core.rules.filter_rule import FilterRule
+from core.frame_view import FrameView
+from core.predicate import compile_predicate
 import pandas as pd
 
-class ConditionGroupRule:
+class ConditionGroupRule(BaseRule):
     def __init__(self, rules=None, operator="AND"):
         """
         rules: FilterRule のリスト
@@ -11,20 +14,82 @@ class ConditionGroupRule:
         """
         self.rules = rules or []
         self.operator = operator
+        self._estimates = []
 
     def apply(self, df: pd.DataFrame) -> pd.DataFrame:
         if not self.rules:
             return df
 
-        # 各 FilterRule の条件を Series として取得
-        masks = [rule._get_mask(df) for rule in self.rules]
+        return df[self._get_mask(df)].copy()
 
-        if self.operator == "AND":
-            combined_mask = pd.concat(masks, axis=1).all(axis=1)
-        else:  # OR
-            combined_mask = pd.concat(masks, axis=1).any(axis=1)
+    def apply_view(self, view):
+        if not self.rules:
+            return view
+        group, notes = self, []
+        if self.operator == "AND" and view.indexes is not None:
+            # 統合したフィルタも、1件ずつ実行したときと同じく列索引を使う
+            view, group, notes = self._select_indexed(view)
+            if not group.rules:
+                self._estimates = notes
+                return view
+        # 存在しない列のエラーは通常の評価と同じ順序で出す
+        names = [name for name in group.columns() if name in view.column_names]
+        if not view.is_unique(names):
+            view = FrameView.from_frame(group.apply(view.materialize()))
+        else:
+            frame = view.frame(names)
+            view = view.select(group._predicate(frame).evaluate(frame))
+        if group is not self:
+            self._estimates = notes + group._estimates
+        return view
+
+    def _select_indexed(self, view):
+        """
+        AND の子のうち列索引で引ける単純な条件を先に索引で評価する（索引の評価はエラーにならず、AND の結果は順序によらない）。
+        (絞った view, 残りの条件のグループ, ログ用の行) を返す
+        """
+        rest, notes = [], []
+        for rule in self.rules:
+            selected = None
+            if type(rule) is FilterRule and view.is_unique([rule.column]):
+                selected = view.indexes.select(view, rule.column, rule.operator, rule.value)
+            if selected is None:
+                rest.append(rule)
+                continue
+            notes.append(f"  {rule.description()} (件数: {len(view)} → {len(selected)})")
+            view = selected
+        if notes:
+            notes.insert(0, "列索引で評価した条件:")
+        return view, ConditionGroupRule(rest, self.operator), notes
+
+    def apply_stream(self, chunks):
+        # 評価順は最初のチャンクで見積もり、列の型が同じチャンクにはそのまま使う
+        # （型が変わったら見積もり直す。見積もりは条件を標本の全行で評価して、型のエラーを確かめる）
+        predicate, signature = compile_predicate(self), None
+        for chunk in chunks:
+            if self.rules and len(chunk) and signature != _dtype_signature(chunk):
+                predicate, signature = self._predicate(chunk), _dtype_signature(chunk)
+            yield chunk[predicate.mask(chunk)].copy()
 
-        return df[combined_mask].copy()
+    def columns(self):
+        """条件で参照する列名（入れ子のグループも含む）"""
+        names = []
+        for rule in self.rules:
+            names.extend(rule.columns() if isinstance(rule, ConditionGroupRule) else [rule.column])
+        return names
+
+    def _get_mask(self, df):
+        # 子条件ごとのマスクを結合せず、1本の bool 配列で短絡評価する
+        return self._predicate(df).mask(df)
+
+    def _predicate(self, df):
+        """df の標本で子条件の評価順を決めた条件木（入力の並びは使う人が選んだ順で、コストを考えていない）"""
+        predicate = compile_predicate(self).reordered(df)
+        self._estimates = predicate.estimates
+        return predicate
+
+    def execution_notes(self):
+        return list(self._estimates)
 
     def description(self):
         cond_desc = [r.description() for r in self.rules]
@@ -42,3 +107,7 @@ class ConditionGroupRule:
         from core.rule_factory import create_rule_from_dict
         rules = [create_rule_from_dict(r) for r in data.get("rules", [])]
         return cls(rules=rules, operator=data.get("operator", "AND"))
+
+
+def _dtype_signature(df):
+    return tuple(df.columns), tuple(map(str, df.dtypes))
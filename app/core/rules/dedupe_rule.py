@@ -0,0 +1,96 @@
+from .base_rule import BaseRule
+from core.dedupe import DEFAULT_ERROR_RATE, DuplicateTracker
+from core.spill import DEFAULT_MEMORY_BUDGET, SpillBuffer
+
+KEEP_OPTIONS = ("first", "last")
+
+class DedupeRule(BaseRule):
+
+    def __init__(self, columns=None, keep="first", expected_keys=None, error_rate=DEFAULT_ERROR_RATE,
+                 memory_budget=None):
+        """
+        columns: 重複を判定する列（None なら全列）
+        keep: "first"（最初の行を残す）/ "last"（最後の行を残す）
+        expected_keys: ストリーミング時にキーの種類数の見込みを指定すると、
+                       ハッシュ集合の代わりに Bloom フィルタで判定する（省メモリ、誤判定率 error_rate）
+        memory_budget: 最後の行を残すストリーミング時に溜める行のメモリ上限（None は既定値）
+        """
+        if keep not in KEEP_OPTIONS:
+            raise ValueError(f"残す行は first / last のいずれかです: {keep}")
+        self.columns = None if columns is None else ([columns] if isinstance(columns, str) else list(columns))
+        self.keep = keep
+        self.expected_keys = expected_keys
+        self.error_rate = error_rate
+        self.memory_budget = memory_budget
+
+    @property
+    def pipeline_breaker(self):
+        # 最後の行を残すときは、後ろのチャンクを見るまでどの行を残すか決まらない
+        return self.keep == "last"
+
+    def _duplicated(self, df):
+        # メモリ上では値そのもので判定する（ハッシュの衝突がない）
+        return df.duplicated(subset=self.columns, keep=self.keep).to_numpy()
+
+    def apply(self, df):
+        return df[~self._duplicated(df)].copy()
+
+    def apply_view(self, view):
+        # 判定に使う列だけを取り出し、行位置を絞る
+        names = view.column_names if self.columns is None else self.columns
+        if not view.is_unique(names):
+            return super().apply_view(view)
+        return view.select(~self._duplicated(view.frame(names)))
+
+    def apply_stream(self, chunks):
+        tracker = DuplicateTracker(self.columns, self.expected_keys, self.error_rate)
+        if self.keep == "first":
+            # 見たキーのハッシュだけを覚えて、チャンクごとにそのまま流す
+            for chunk in chunks:
+                yield chunk[tracker.keep_mask(chunk)]
+            return
+
+        # 最後の行を残す: 入力をいったん溜め（上限を超えたらディスクへ退避）、後ろから判定する。
+        # 残した行は行の並びも逆にして溜める（kept 全体が入力の完全な逆順になる）。
+        # 退避したファイルは複数チャンク分が1つにまとまるので、逆順に読み出したチャンクの行を
+        # さらに逆にすることで、まとまり方によらず元の順序に戻る
+        budget = self.memory_budget or DEFAULT_MEMORY_BUDGET
+        with SpillBuffer(budget) as buffer, SpillBuffer(budget) as kept:
+            template = None
+            for chunk in chunks:
+                if template is None:
+                    template = chunk.iloc[:0]
+                buffer.append(chunk)
+            for part in reversed(buffer):
+                kept.append(part[tracker.keep_mask(part, keep="last")].iloc[::-1])
+            if not kept.rows and template is not None:
+                yield template
+            yield from (part.iloc[::-1] for part in reversed(kept) if len(part))
+
+    def description(self):
+        columns = "全列" if self.columns is None else ", ".join(self.columns)
+        keep = "最初の行を残す" if self.keep == "first" else "最後の行を残す"
+        if self.expected_keys:
+            keep += f", 近似 {self.expected_keys:,} 種類 / 誤判定率 {self.error_rate:.2%}"
+        return f"重複削除: {columns} ({keep})"
+
+    def to_dict(self):
+        data = {
+            "type": "dedupe",
+            "columns": self.columns,
+            "keep": self.keep
+        }
+        if self.expected_keys:
+            data["expected_keys"] = self.expected_keys
+            data["error_rate"] = self.error_rate
+        if self.memory_budget:
+            data["memory_budget"] = self.memory_budget
+        return data
+
+    @staticmethod
+    def from_dict(data):
+        return DedupeRule(
+            data.get("columns"), data.get("keep", "first"),
+            data.get("expected_keys"), data.get("error_rate", DEFAULT_ERROR_RATE),
+            data.get("memory_budget"),
+        )
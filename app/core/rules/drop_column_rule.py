@@ -8,6 +8,9 @@ class DropColumnRule(BaseRule):
     def apply(self, df):
         return df.drop(columns=self.columns, errors="ignore")
 
+    def apply_view(self, view):
+        return view.drop(self.columns)
+
     def description(self):
         return f"列削除: {', '.join(self.columns)}"
 
@@ -0,0 +1,70 @@
+from .base_rule import BaseRule
+from core.expression import BOOL, Expression, ExpressionError
+
+
+class ExpressionRule(BaseRule):
+
+    def __init__(self, expression, target=None):
+        """
+        expression: 列を使った式（例: 給与 * 12 > 5000 and 部署 == '営業'）
+        target: None なら式が真の行に絞る。列名を指定するとその列に式の値を入れる（計算列）
+        """
+        self.expression = expression
+        self.target = target or None
+        self._compiled = None
+
+    def compiled(self):
+        """構文解析済みの式（文字列が変わらなければ使い回す）"""
+        if self._compiled is None or self._compiled.source != self.expression:
+            self._compiled = Expression(self.expression)
+        return self._compiled
+
+    def columns(self):
+        return self.compiled().columns()
+
+    def rebind(self, mapping):
+        """列名を付け替えたルールを返す（列名変更の前へ移動するとき用）"""
+        if not any(name in mapping for name in self.columns()):
+            return self
+        return ExpressionRule(self.compiled().rename(mapping).tree.source(), self.target)
+
+    def _get_mask(self, df):
+        expression = self.compiled()
+        if expression.type_of(df) != BOOL:
+            raise ExpressionError(f"フィルタの式は真偽値になる必要があります: {self.expression}")
+        return expression.evaluate(df)
+
+    def apply(self, df):
+        if self.target is None:
+            return df[self._get_mask(df)].copy()
+        values = self.compiled().evaluate(df)
+        df = df.copy()
+        df[self.target] = values
+        return df
+
+    def apply_view(self, view):
+        # フィルタは参照する列だけを取り出して評価し、行位置を絞る
+        if self.target is not None or not view.is_unique(self.columns()):
+            return super().apply_view(view)
+        return view.select(self._get_mask(view.frame(self.columns())))
+
+    def description(self):
+        if self.target is None:
+            return f"式フィルタ: {self.expression}"
+        return f"計算列: {self.target} = {self.expression}"
+
+    def to_dict(self):
+        data = {
+            "type": "expression",
+            "expression": self.expression
+        }
+        if self.target is not None:
+            data["target"] = self.target
+        return data
+
+    @staticmethod
+    def from_dict(data):
+        return ExpressionRule(
+            data["expression"],
+            data.get("target")
+        )
@@ -1,63 +1,101 @@
+import pandas as pd
+
 from .base_rule import BaseRule
+from core.text_search import TextMatcher
+
+# 文字列検索の演算子（contains_any の value はパターンのリスト）
+TEXT_OPERATORS = ("contains", "contains_any")
+
 
 class FilterRule(BaseRule):
 
-    def __init__(self, column, operator, value):
+    def __init__(self, column, operator, value, regex=False):
+        """regex: contains / contains_any の値を正規表現として扱う（既定は文字列そのまま）"""
         self.column = column
         self.operator = operator
         self.value = value
-
-    def apply(self, df):
-        if self.operator == "==":
-            return df[df[self.column] == self.value]
-        elif self.operator == "!=":
-            return df[df[self.column] != self.value]
-        elif self.operator == ">":
-            return df[df[self.column] > self.value]
-        elif self.operator == "<":
-            return df[df[self.column] < self.value]
-        elif self.operator == "contains":
-            return df[df[self.column].astype(str).str.contains(str(self.value), na=False)]
-        else:
-            return df
+        self.regex = regex
+        self._matcher = None
 
     def description(self):
-        return f"フィルタ: {self.column} {self.operator} {self.value}"
+        value = ", ".join(map(str, self.value)) if self.operator == "contains_any" else self.value
+        mark = " (正規表現)" if self.regex else ""
+        return f"フィルタ: {self.column} {self.operator} {value}{mark}"
 
     def to_dict(self):
-        return {
+        data = {
             "type": "filter",
             "column": self.column,
             "operator": self.operator,
             "value": self.value
         }
+        if self.regex:
+            data["regex"] = True
+        return data
 
     @staticmethod
     def from_dict(data):
         return FilterRule(
             data["column"],
             data["operator"],
-            data["value"]
+            data["value"],
+            data.get("regex", False)
         )
 
     def _get_mask(self, df):
+        return self._compare(df[self.column])
+
+    def _compare(self, series):
+        """列(Series)に条件を当てた bool の Series を返す"""
+        if self.operator in TEXT_OPERATORS:
+            return pd.Series(self.text_matcher().mask(series), index=series.index)
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            return self._compare_categories(series)
         if self.operator == "==":
-            return df[self.column] == self.value
+            return series == self.value
         elif self.operator == "!=":
-            return df[self.column] != self.value
+            return series != self.value
         elif self.operator == ">":
-            return df[self.column] > self.value
+            return series > self.value
         elif self.operator == "<":
-            return df[self.column] < self.value
+            return series < self.value
         elif self.operator == ">=":
-            return df[self.column] >= self.value
+            return series >= self.value
         elif self.operator == "<=":
-            return df[self.column] <= self.value
-        elif self.operator == "contains":
-            return df[self.column].astype(str).str.contains(str(self.value))
+            return series <= self.value
         else:
             raise ValueError(f"不明な演算子: {self.operator}")
 
+    def text_matcher(self):
+        """contains / contains_any の判定器（パターンのコンパイルは1回だけ）"""
+        patterns = list(self.value) if self.operator == "contains_any" else [self.value]
+        key = (tuple(map(str, patterns)), self.regex)
+        if self._matcher is None or self._matcher[0] != key:
+            self._matcher = (key, TextMatcher(patterns, regex=self.regex))
+        return self._matcher[1]
+
+    def _compare_categories(self, series):
+        # カテゴリ型は種類ごとに1回だけ評価し、コードで各行へ引き当てる
+        # 末尾に欠損を1つ足し、欠損のコード -1 もそのまま引けるようにする
+        categories = pd.Series(series.cat.categories)
+        lookup = self._compare(categories.reindex(range(len(categories) + 1)))
+        lookup = lookup.to_numpy(dtype=bool, na_value=False)
+        return pd.Series(lookup[series.cat.codes.to_numpy()], index=series.index)
+
     def apply(self, df):
         mask = self._get_mask(df)
-        return df[mask].copy()
\ No newline at end of file
+        return df[mask].copy()
+
+    def apply_view(self, view):
+        # 対象列だけを取り出して条件を評価し、行位置を絞る（コピーしない）
+        if not view.is_unique([self.column]):
+            return super().apply_view(view)
+        if view.indexes is not None:
+            # 同じ列で繰り返し絞り込むときは列索引を使い回す（全行は走査しない）
+            selected = view.indexes.select(view, self.column, self.operator, self.value)
+            if selected is not None:
+                return selected
+        mask = self._get_mask(view.frame([self.column]))
+        if mask.dtype != bool:
+            return super().apply_view(view)
+        return view.select(mask)
\ No newline at end of file
@@ -0,0 +1,131 @@
+import os
+
+import pandas as pd
+
+from .base_rule import BaseRule
+from core.join import JOIN_TYPES, BuildCache, build_table
+from core.services.csv_service import CsvService
+from core.services.parse_cache import ParseCache
+
+class JoinRule(BaseRule):
+    # 参照 CSV のハッシュ表を実行・バッチのファイルをまたいで使い回す（None で無効）
+    build_cache = BuildCache()
+
+    def __init__(self, path, on, how="inner", reference_on=None, columns=None, suffix="_参照"):
+        """
+        path: 参照 CSV（社員マスタなど）
+        on: 入力側のキー列（複数可） / reference_on: 参照側のキー列（省略時は on と同じ名前）
+        how: "inner"（一致する行だけ）/ "left"（一致しない行も残す）/ "semi"（一致する行に絞るだけで列は足さない）
+        columns: 参照側から付け加える列（省略時はキー以外のすべて）
+        suffix: 入力側と同じ名前の列に付ける接尾辞
+        """
+        if how not in JOIN_TYPES:
+            raise ValueError(f"未知の結合の種類: {how}")
+        self.path = path
+        self.on = [on] if isinstance(on, str) else list(on)
+        self.reference_on = self.on if reference_on is None else (
+            [reference_on] if isinstance(reference_on, str) else list(reference_on)
+        )
+        if not self.on or len(self.on) != len(self.reference_on):
+            raise ValueError("結合キーの列数が入力側と参照側で一致しません")
+        self.how = how
+        self.columns_to_add = None if columns is None else list(columns)
+        self.suffix = suffix
+
+    def columns(self):
+        """入力側で参照する列"""
+        return list(self.on)
+
+    def rebind(self, mapping):
+        """列名を付け替えたルールを返す（列名変更の前へ移動するとき用）"""
+        on = [mapping.get(column, column) for column in self.on]
+        if on == self.on:
+            return self
+        return JoinRule(self.path, on, self.how, self.reference_on, self.columns_to_add, self.suffix)
+
+    def _table(self):
+        header = list(CsvService.read_header(self.path).columns)
+        if self.how == "semi":
+            payload = []
+        elif self.columns_to_add is not None:
+            payload = self.columns_to_add
+        else:
+            payload = [column for column in header if column not in self.reference_on]
+        missing = [column for column in self.reference_on + payload if column not in header]
+        if missing:
+            raise ValueError(f"参照CSVに列がありません: {', '.join(map(str, missing))}")
+        if JoinRule.build_cache is None:
+            return build_table(self.path, self.reference_on, payload)
+        return JoinRule.build_cache.get(self.path, self.reference_on, payload)
+
+    def _keys(self, df):
+        missing = [column for column in self.on if column not in df.columns]
+        if missing:
+            raise ValueError(f"結合キーの列がありません: {', '.join(map(str, missing))}")
+        return df[self.on]
+
+    def apply(self, df):
+        return self._join(df, self._table())
+
+    def apply_stream(self, chunks):
+        # 参照側のハッシュ表は最初に1回だけ用意し、各チャンクはそれで引くだけにする
+        table = None
+        for chunk in chunks:
+            if table is None:
+                table = self._table()
+            yield self._join(chunk, table)
+
+    def _join(self, df, table):
+        if self.how == "semi":
+            return df[table.contains(self._keys(df))].copy()
+
+        probe, build = table.match(self._keys(df), keep_unmatched=self.how == "left")
+        result = df.iloc[probe]
+        added = {}
+        for column in table.payload.columns:
+            name = column if column not in df.columns else f"{column}{self.suffix}"
+            # 一致しない行（-1）は欠損にする
+            values = pd.api.extensions.take(table.payload[column].array, build, allow_fill=True)
+            added[name] = pd.Series(values, index=result.index, copy=False)
+        if not added:
+            return result.copy()
+        return pd.concat([result, pd.DataFrame(added, index=result.index)], axis=1)
+
+    def apply_view(self, view):
+        # 存在する行のみ（semi）はキー列だけで判定し、行位置を絞る
+        if self.how != "semi" or not view.is_unique(self.columns()):
+            return super().apply_view(view)
+        return view.select(self._table().contains(self._keys(view.frame(self.columns()))))
+
+    def description(self):
+        keys = ", ".join(
+            on if on == reference else f"{on} = {reference}"
+            for on, reference in zip(self.on, self.reference_on)
+        )
+        return f"{JOIN_TYPES[self.how]}: {os.path.basename(self.path)} ({keys})"
+
+    def to_dict(self):
+        data = {
+            "type": "join",
+            "path": self.path,
+            "on": self.on,
+            "how": self.how
+        }
+        if self.reference_on != self.on:
+            data["reference_on"] = self.reference_on
+        if self.columns_to_add is not None:
+            data["columns"] = self.columns_to_add
+        if self.suffix != "_参照":
+            data["suffix"] = self.suffix
+        return data
+
+    def cache_key(self):
+        # 参照 CSV が書き換えられたら、途中結果キャッシュも使わない
+        return dict(self.to_dict(), source=list(ParseCache.source_stamp(self.path)))
+
+    @staticmethod
+    def from_dict(data):
+        return JoinRule(
+            data["path"], data["on"], data.get("how", "inner"),
+            data.get("reference_on"), data.get("columns"), data.get("suffix", "_参照"),
+        )
@@ -0,0 +1,37 @@
+import numpy as np
+
+from .base_rule import BaseRule
+
+class LimitRule(BaseRule):
+
+    def __init__(self, count):
+        self.count = int(count)
+
+    def apply(self, df):
+        return df.head(max(self.count, 0))
+
+    def apply_view(self, view):
+        return view.take(np.arange(min(max(self.count, 0), len(view)), dtype=np.int64))
+
+    def apply_stream(self, chunks):
+        # 必要な行数に達したら、それ以降のチャンクは読まない
+        remaining = max(self.count, 0)
+        for chunk in chunks:
+            part = chunk.iloc[:remaining]
+            yield part
+            remaining -= len(part)
+            if remaining <= 0:
+                return
+
+    def description(self):
+        return f"先頭 {self.count} 件"
+
+    def to_dict(self):
+        return {
+            "type": "limit",
+            "count": self.count
+        }
+
+    @staticmethod
+    def from_dict(data):
+        return LimitRule(data["count"])
@@ -9,6 +9,9 @@ class RenameColumnRule(BaseRule):
     def apply(self, df):
         return df.rename(columns={self.old_name: self.new_name})
 
+    def apply_view(self, view):
+        return view.rename({self.old_name: self.new_name})
+
     def description(self):
         return f"列名変更: {self.old_name} → {self.new_name}"
 
@@ -1,25 +1,106 @@
 from .base_rule import BaseRule
+from core.external_sort import ExternalSorter
+from core.sort_keys import normalize_keys, sort_order
+from core.spill import DEFAULT_MEMORY_BUDGET
 
 class SortRule(BaseRule):
+    pipeline_breaker = True
 
-    def __init__(self, column, ascending=True):
-        self.column = column
-        self.ascending = ascending
+    def __init__(self, column, ascending=True, memory_budget=None, na_position="last"):
+        """
+        column: 列名、または列名のリスト（前のキーほど優先）
+        ascending / na_position: キーごとの昇順・欠損位置（"last" / "first"）。1つなら全キー共通
+        """
+        self.keys = normalize_keys(column, ascending, na_position)
+        # None: メモリ上でソート / バイト数: 超えたら外部ソート
+        self.memory_budget = memory_budget
+
+    @property
+    def column(self):
+        """第1キーの列名"""
+        return self.keys[0][0]
+
+    @property
+    def ascending(self):
+        """第1キーの昇順"""
+        return self.keys[0][1]
+
+    def columns(self):
+        return [column for column, _, _ in self.keys]
+
+    def rebind(self, mapping):
+        """列名を付け替えたルールを返す（列名変更の前へ移動するとき用）"""
+        columns = [mapping.get(column, column) for column in self.columns()]
+        if columns == self.columns():
+            return self
+        return SortRule(columns, self._ascending_list(), self.memory_budget, self._na_positions())
 
     def apply(self, df):
-        return df.sort_values(by=self.column, ascending=self.ascending)
+        if self.memory_budget and df.memory_usage(deep=True).sum() > self.memory_budget:
+            return self._sorter().sort_frame(df)
+        # 全キーを1つの並び順にまとめて1回で安定ソートする（同値の行は元の順序を保つ）
+        return df.iloc[sort_order(df, self.keys)]
+
+    def apply_view(self, view):
+        # キー列だけで並び順を求め、行位置の並びだけを入れ替える
+        if not view.is_unique(self.columns()):
+            return super().apply_view(view)
+        return view.take(sort_order(view.frame(self.columns()), self.keys))
+
+    def apply_stream(self, chunks):
+        # ストリーミング時は常に外部ソート（上限内なら一時ファイルは作らない）
+        return self._sorter().sort_chunks(chunks)
+
+    def _sorter(self):
+        return ExternalSorter(
+            self.columns(),
+            self._ascending_list(),
+            memory_budget=self.memory_budget or DEFAULT_MEMORY_BUDGET,
+            na_position=self._na_positions(),
+        )
+
+    def _ascending_list(self):
+        return [ascending for _, ascending, _ in self.keys]
+
+    def _na_positions(self):
+        return [na_position for _, _, na_position in self.keys]
 
     def description(self):
-        order = "昇順" if self.ascending else "降順"
-        return f"並び替え: {self.column} ({order})"
+        keys = []
+        for column, ascending, na_position in self.keys:
+            order = "昇順" if ascending else "降順"
+            mark = ", 欠損を先頭" if na_position == "first" else ""
+            keys.append(f"{column} ({order}{mark})")
+        return f"並び替え: {', '.join(keys)}"
 
     def to_dict(self):
-        return {
-            "type": "sort",
-            "column": self.column,
-            "ascending": self.ascending
-        }
+        if len(self.keys) == 1 and self.keys[0][2] == "last":
+            # 1キーで欠損が末尾なら従来の形式で保存する（古いバージョンでも読める）
+            data = {
+                "type": "sort",
+                "column": self.column,
+                "ascending": self.ascending
+            }
+        else:
+            data = {
+                "type": "sort",
+                "keys": [
+                    {"column": column, "ascending": ascending, "na_position": na_position}
+                    for column, ascending, na_position in self.keys
+                ]
+            }
+        if self.memory_budget:
+            data["memory_budget"] = self.memory_budget
+        return data
 
     @staticmethod
     def from_dict(data):
-        return SortRule(data["column"], data["ascending"])
+        if "keys" in data:
+            keys = data["keys"]
+            return SortRule(
+                [key["column"] for key in keys],
+                [key.get("ascending", True) for key in keys],
+                data.get("memory_budget"),
+                [key.get("na_position", "last") for key in keys],
+            )
+        return SortRule(data["column"], data["ascending"], data.get("memory_budget"))
@@ -0,0 +1,63 @@
+from .base_rule import BaseRule
+from core.sort_keys import normalize_keys
+from core.top_n import TopNCollector, top_n_order
+
+class TopNRule(BaseRule):
+    """並び替えて先頭 n 件を取るのと同じ結果を、全件ソートせずに求める"""
+
+    def __init__(self, columns, ascending=True, count=10, na_position="last"):
+        self.keys = normalize_keys(columns, ascending, na_position)
+        self.count = int(count)
+
+    @property
+    def columns(self):
+        return [column for column, _, _ in self.keys]
+
+    @property
+    def ascending(self):
+        return [ascending for _, ascending, _ in self.keys]
+
+    @property
+    def na_position(self):
+        return [na_position for _, _, na_position in self.keys]
+
+    def apply(self, df):
+        return df.iloc[top_n_order(df, self.keys, self.count)]
+
+    def apply_view(self, view):
+        # キー列だけで上位の行位置を求め、行の並びだけを入れ替える
+        if not view.is_unique(self.columns):
+            return super().apply_view(view)
+        keys = view.frame(self.columns)
+        return view.take(top_n_order(keys, self.keys, self.count))
+
+    def apply_stream(self, chunks):
+        # チャンクごとに上位 n 件だけを残すので、メモリは n 行分で済む
+        collector = TopNCollector(self.keys, self.count)
+        for chunk in chunks:
+            collector.add(chunk)
+        if collector.result() is not None:
+            yield collector.result()
+
+    def description(self):
+        keys = []
+        for column, ascending, na_position in self.keys:
+            order = "昇順" if ascending else "降順"
+            mark = ", 欠損を先頭" if na_position == "first" else ""
+            keys.append(f"{column} ({order}{mark})")
+        return f"上位 {self.count} 件: {', '.join(keys)}"
+
+    def to_dict(self):
+        data = {
+            "type": "top_n",
+            "columns": self.columns,
+            "ascending": self.ascending,
+            "count": self.count
+        }
+        if "first" in self.na_position:
+            data["na_position"] = self.na_position
+        return data
+
+    @staticmethod
+    def from_dict(data):
+        return TopNRule(data["columns"], data.get("ascending", True), data["count"], data.get("na_position", "last"))
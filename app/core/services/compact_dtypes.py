@@ -0,0 +1,104 @@
+# core/services/compact_dtypes.py
+
+import numpy as np
+import pandas as pd
+
+# 値の種類数 / 行数 がこれ以下の文字列列をカテゴリ型にする
+DEFAULT_MAX_UNIQUE_RATIO = 0.5
+# 種類数がこれを超える列はカテゴリ型にしない
+DEFAULT_MAX_CATEGORIES = 100_000
+
+_INT_TYPES = [np.int8, np.int16, np.int32, np.int64]
+
+
+class DtypeCompactor:
+    """
+    読み込んだ DataFrame の型を、値を変えない範囲で小さくする。
+      整数   : 値の範囲に収まる最小の符号付き整数型
+      小数   : float32 にしても値が変わらない列だけ float32（downcast_floats=True のとき。
+               保存時の小数の表記が変わることがあるため既定では行わない）
+      文字列 : 種類が少ない列はカテゴリ型（辞書 + コード）
+    """
+
+    def __init__(self, max_unique_ratio=DEFAULT_MAX_UNIQUE_RATIO,
+                 max_categories=DEFAULT_MAX_CATEGORIES, downcast_floats=False):
+        self.max_unique_ratio = max_unique_ratio
+        self.max_categories = max_categories
+        self.downcast_floats = downcast_floats
+
+    def apply(self, df, logger=None):
+        before_total = 0
+        after_total = 0
+        columns = {}
+        for i, name in enumerate(df.columns):
+            series = df.iloc[:, i]
+            compacted = self.compact_series(series)
+            before = int(series.memory_usage(index=False, deep=True))
+            after = int(compacted.memory_usage(index=False, deep=True))
+            before_total += before
+            after_total += after
+            if compacted is not series:
+                columns[i] = compacted
+            if logger:
+                logger(f"  {name}: {series.dtype} {_mb(before)} → {compacted.dtype} {_mb(after)}")
+
+        if columns:
+            df = df.copy(deep=False)
+            for i, compacted in columns.items():
+                df.isetitem(i, compacted)
+        if logger:
+            logger(f"メモリ: {_mb(before_total)} → {_mb(after_total)}")
+        return df
+
+    def compact_series(self, series):
+        """型を小さくした Series を返す（変えないときは series をそのまま返す）"""
+        dtype = series.dtype
+        if not isinstance(dtype, np.dtype) or dtype.kind == "O":
+            # object 列は中身がすべて文字列のときだけ対象にする
+            if not isinstance(dtype, pd.CategoricalDtype) and pd.api.types.is_string_dtype(series):
+                return self._categorize(series)
+            return series
+        if dtype.kind in "iu":
+            return self._downcast_int(series)
+        if dtype.kind == "f" and self.downcast_floats and dtype.itemsize > 4:
+            return self._downcast_float(series)
+        return series
+
+    def _downcast_int(self, series):
+        if series.empty:
+            return series
+        values = series.to_numpy()
+        low, high = values.min(), values.max()
+        for int_type in _INT_TYPES:
+            info = np.iinfo(int_type)
+            if np.dtype(int_type).itemsize >= series.dtype.itemsize:
+                return series
+            if info.min <= low and high <= info.max:
+                return series.astype(int_type)
+        return series
+
+    @staticmethod
+    def _downcast_float(series):
+        values = series.to_numpy()
+        narrow = values.astype(np.float32)
+        # 往復で値が変わる（精度が落ちる）列はそのまま
+        same = (narrow.astype(values.dtype) == values) | np.isnan(values)
+        if not same.all():
+            return series
+        return pd.Series(narrow, index=series.index, name=series.name)
+
+    def _categorize(self, series):
+        if series.empty:
+            return series
+        try:
+            unique = series.nunique(dropna=True)
+        except TypeError:
+            # リストなどハッシュできない値を含む列
+            return series
+        if unique > self.max_categories or unique > len(series) * self.max_unique_ratio:
+            return series
+        return series.astype("category")
+
+
+def _mb(size):
+    return f"{size / 1024 / 1024:.1f}MB"
@@ -1,11 +1,92 @@
+import os
+
 import pandas as pd
 
+from core.services.parallel_csv import ParallelCsvReader
+from core.services.parse_cache import ParseCache
+
+# ストリーミング処理の既定チャンク行数
+DEFAULT_CHUNKSIZE = 200_000
+
 class CsvService:
+    # 解析済みデータのキャッシュ（None で無効）
+    parse_cache = ParseCache()
+    # 大きなファイルを複数プロセスで解析する（None で無効）
+    parallel_reader = ParallelCsvReader()
+
+    @staticmethod
+    def load(path, usecols=None, dtype=None, use_cache=True, compact=None, logger=None):
+        """
+        usecols: 読む列（ほかの列は解析しない） / dtype: 列ごとの型指定
+        use_cache: 解析済みキャッシュを使う・作る（元ファイルが変わっていれば作り直す）
+        compact: DtypeCompactor を渡すと読み込み後に型を小さくする（列ごとの変化を logger へ）
+        """
+        df = CsvService._load(path, usecols, dtype, use_cache)
+        if compact is not None:
+            if logger:
+                logger("省メモリ型に変換:")
+            df = compact.apply(df, logger=logger)
+        return df
+
+    @staticmethod
+    def _load(path, usecols, dtype, use_cache):
+        cache = CsvService.parse_cache if use_cache else None
+        if cache is None or not cache.accepts(path):
+            return CsvService._parse(path, usecols, dtype)
+
+        df = cache.get(path, usecols=usecols, dtype=dtype)
+        if df is not None:
+            return df
+        # 解析中に書き換えられても古い内容で登録しないよう、先に状態を取っておく
+        stamp = cache.source_stamp(path)
+        df = CsvService._parse(path, usecols, dtype)
+        try:
+            cache.put(path, df, stamp, dtype=dtype, usecols=usecols)
+        except OSError:
+            pass
+        return df
+
+    @staticmethod
+    def _parse(path, usecols, dtype):
+        reader = CsvService.parallel_reader
+        if reader is not None and reader.accepts(path):
+            return reader.read(path, usecols=usecols, dtype=dtype)
+        return pd.read_csv(path, usecols=usecols, dtype=dtype)
 
     @staticmethod
-    def load(path):
-        return pd.read_csv(path)
+    def read_header(path):
+        """列名だけを読む（0行の DataFrame）"""
+        return pd.read_csv(path, nrows=0)
+
+    @staticmethod
+    def load_chunks(path, chunksize=DEFAULT_CHUNKSIZE, usecols=None, dtype=None, progress=None):
+        """
+        CSVをチャンクごとに読む。空ファイルでも列だけの0行チャンクを1つ返す。
+        progress: チャンクごとに progress(読んだバイト数, ファイルサイズ) を呼ぶ
+        """
+        empty = True
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            with pd.read_csv(f, chunksize=chunksize, usecols=usecols, dtype=dtype) as reader:
+                for chunk in reader:
+                    empty = False
+                    if progress:
+                        progress(f.tell(), size)
+                    yield chunk
+        if empty:
+            header = CsvService.read_header(path)
+            yield header if usecols is None else header[[c for c in header.columns if c in usecols]]
 
     @staticmethod
     def save(df, path):
         df.to_csv(path, index=False)
+
+    @staticmethod
+    def save_chunks(chunks, path):
+        """チャンクを順に追記保存する。書き込んだ行数を返す"""
+        rows = 0
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            for i, chunk in enumerate(chunks):
+                chunk.to_csv(f, index=False, header=(i == 0))
+                rows += len(chunk)
+        return rows
@@ -0,0 +1,186 @@
+# core/services/parallel_csv.py
+
+import io
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+# これより小さいファイルは分割せずに読む（プロセス起動のほうが高くつく）
+PARALLEL_MIN_SIZE = 64 * 1024 * 1024
+# 分割位置を探すとき、候補位置から先を見る範囲。引用符内の改行がこれより長いと分割しない
+BOUNDARY_WINDOW = 4 * 1024 * 1024
+SCAN_BLOCK = 16 * 1024 * 1024
+
+QUOTE = b'"'
+NEWLINE = b"\n"
+# 区切り・改行・引用符のいずれにも隣接しない引用符。
+# 引用符で囲まれていない値の途中に " があるファイルは、引用符の数から行の境目を判断できない
+_STRAY_QUOTE = re.compile(rb'[^,\n"]"[^,\r\n"]')
+
+
+def _scan_range(path, start, end):
+    """
+    [start, end) の引用符の数と、先頭から数えて引用符が偶数個 / 奇数個の時点にある
+    最初の改行の直後の位置を返す。
+    """
+    quotes = 0
+    first = [None, None]
+    stray = False
+    with open(path, "rb") as f:
+        f.seek(start)
+        pos = start
+        while pos < end:
+            # 前のブロックの末尾 2 バイトと重ねて、境目をまたぐ不正な引用符も見逃さない
+            overlap = 2 if pos > start else 0
+            f.seek(pos - overlap)
+            block = f.read(min(SCAN_BLOCK, end - pos) + overlap)
+            if len(block) <= overlap:
+                break
+
+            if pos - start < BOUNDARY_WINDOW and (first[0] is None or first[1] is None):
+                count = quotes
+                i = overlap
+                limit = min(len(block), overlap + BOUNDARY_WINDOW - (pos - start))
+                while i < limit and (first[0] is None or first[1] is None):
+                    if first[count % 2] is not None:
+                        # この偶奇の改行はもう見つかっている。次の引用符まで飛ばす
+                        q = block.find(QUOTE, i, limit)
+                        if q < 0:
+                            break
+                        count += 1
+                        i = q + 1
+                        continue
+                    nl = block.find(NEWLINE, i, limit)
+                    if nl < 0:
+                        break
+                    count += block.count(QUOTE, i, nl)
+                    if first[count % 2] is None:
+                        first[count % 2] = pos - overlap + nl + 1
+                    i = nl + 1
+
+            n = block.count(QUOTE, overlap)
+            quotes += n
+            if n and not stray and _STRAY_QUOTE.search(block):
+                stray = True
+            pos += len(block) - overlap
+    return quotes, first[0], first[1], stray
+
+
+def _parse_range(path, start, end, names, usecols, dtype):
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return pd.read_csv(io.BytesIO(data), header=None, names=names, usecols=usecols, dtype=dtype)
+
+
+def _header_end(path):
+    """ヘッダ行の直後の位置（ヘッダ内の引用符付き改行も考慮）"""
+    count = 0
+    with open(path, "rb") as f:
+        offset = 0
+        while True:
+            block = f.read(1024 * 1024)
+            if not block:
+                return None
+            i = 0
+            while True:
+                nl = block.find(NEWLINE, i)
+                if nl < 0:
+                    count += block.count(QUOTE, i)
+                    break
+                count += block.count(QUOTE, i, nl)
+                if count % 2 == 0:
+                    return offset + nl + 1
+                i = nl + 1
+            offset += len(block)
+
+
+class ParallelCsvReader:
+    """
+    CSV をレコードの境目でバイト範囲に分け、複数プロセスで解析して順に連結する。
+    境目は「データ先頭からの引用符の数が偶数の位置にある改行」で判断する。
+    安全に分けられないとき（不正な引用符、引用符内の長い改行など）は通常の読み込みに戻る。
+    """
+
+    def __init__(self, workers=None, min_size=PARALLEL_MIN_SIZE):
+        self.workers = workers
+        self.min_size = min_size
+
+    def worker_count(self):
+        return self.workers or os.cpu_count() or 1
+
+    def accepts(self, path):
+        return self.worker_count() > 1 and os.path.getsize(path) >= self.min_size
+
+    def read(self, path, usecols=None, dtype=None):
+        pieces = None
+        try:
+            ranges = self.split(path)
+            if ranges is not None:
+                pieces = self._parse(path, ranges, usecols, dtype)
+        except (ValueError, pd.errors.ParserError, UnicodeDecodeError):
+            # 分割の判断を誤った可能性があるので、結果は使わず通常の読み込みに任せる
+            pieces = None
+        if pieces is None:
+            return pd.read_csv(path, usecols=usecols, dtype=dtype)
+        return self._combine(path, pieces, usecols, dtype)
+
+    def split(self, path):
+        """データ部分を分割した [(start, end), ...] を返す。分けられなければ None"""
+        size = os.path.getsize(path)
+        data_start = _header_end(path)
+        if data_start is None or data_start >= size:
+            return None
+
+        parts = self.worker_count()
+        step = max(1, (size - data_start) // parts)
+        starts = [data_start + i * step for i in range(parts)]
+        ends = starts[1:] + [size]
+        with ProcessPoolExecutor(max_workers=parts) as pool:
+            scans = list(pool.map(_scan_range, [path] * parts, starts, ends))
+
+        if any(stray for _, _, _, stray in scans):
+            return None
+        if sum(quotes for quotes, _, _, _ in scans) % 2:
+            return None
+
+        # 各範囲の先頭までの引用符の数の偶奇から、その範囲で使う改行を選ぶ
+        boundaries = [data_start]
+        parity = 0
+        for i in range(1, parts):
+            parity = (parity + scans[i - 1][0]) % 2
+            boundary = scans[i][1 + parity]
+            if boundary is not None and boundaries[-1] < boundary < size:
+                boundaries.append(boundary)
+        if len(boundaries) < 2:
+            return None
+        return list(zip(boundaries, boundaries[1:] + [size]))
+
+    def _parse(self, path, ranges, usecols, dtype):
+        names = list(pd.read_csv(path, nrows=0).columns)
+        count = len(ranges)
+        with ProcessPoolExecutor(max_workers=min(count, self.worker_count())) as pool:
+            return list(pool.map(
+                _parse_range, [path] * count, [s for s, _ in ranges], [e for _, e in ranges],
+                [names] * count, [usecols] * count, [dtype] * count,
+            ))
+
+    @staticmethod
+    def _combine(path, pieces, usecols, dtype):
+        df = pd.concat(pieces, ignore_index=True)
+        # 範囲ごとに推定された型が食い違う列（数値と文字列の混在など）は、
+        # 一括で読んだときと同じ型になるようその列だけ通常の方法で読み直す
+        mismatched = [
+            name for i, name in enumerate(df.columns)
+            if len({piece.dtypes.iloc[i] for piece in pieces}) > 1
+        ]
+        if mismatched:
+            column_dtype = dtype
+            if isinstance(dtype, dict):
+                column_dtype = {k: v for k, v in dtype.items() if k in mismatched}
+            reread = pd.read_csv(path, usecols=mismatched, dtype=column_dtype)
+            for name in mismatched:
+                df[name] = reread[name]
+        return df
@@ -0,0 +1,215 @@
+# core/services/parse_cache.py
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# キャッシュ全体の既定上限（バイト）。超えたら最後に使われたのが古いものから消す
+DEFAULT_PARSE_CACHE_BYTES = 4 * 1024 * 1024 * 1024
+# これより小さい CSV は解析し直しても速いのでキャッシュしない
+MIN_CACHED_FILE_SIZE = 1024 * 1024
+# 内容の簡易指紋に使う、先頭・中央・末尾から読むバイト数
+FINGERPRINT_BLOCK = 64 * 1024
+
+_FORMAT_VERSION = 1
+_META = "meta.json"
+
+
+def default_cache_dir():
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "csv_workflow", "parsed")
+
+
+class ParseCache:
+    """
+    解析済み CSV を列ごとのバイナリで保存するキャッシュ。
+    数値列は .npy（読み込み時はメモリマップ）、文字列などそれ以外の列は pickle で持つ。
+    元ファイルのサイズ・更新時刻・内容の簡易指紋が一致するときだけ使う。
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_PARSE_CACHE_BYTES,
+                 min_file_size=MIN_CACHED_FILE_SIZE):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.min_file_size = min_file_size
+
+    # --- 判定 ---
+    @staticmethod
+    def source_stamp(path):
+        """元ファイルの (サイズ, 更新時刻, 指紋)。解析の前に取っておく"""
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns, ParseCache.fingerprint(path, stat.st_size)
+
+    @staticmethod
+    def fingerprint(path, size):
+        digest = hashlib.blake2b(str(size).encode("ascii"), digest_size=16)
+        with open(path, "rb") as f:
+            for offset in (0, max(0, size // 2 - FINGERPRINT_BLOCK // 2), max(0, size - FINGERPRINT_BLOCK)):
+                f.seek(offset)
+                digest.update(f.read(FINGERPRINT_BLOCK))
+        return digest.hexdigest()
+
+    def accepts(self, path):
+        return os.path.getsize(path) >= self.min_file_size
+
+    def _entry_dir(self, path, dtype, usecols=None):
+        # 型指定が違えば解析結果も違うので別のエントリにする。
+        # 一部の列だけのエントリも列の組ごとに分け、全列のエントリを上書きしないようにする
+        source = os.path.normcase(os.path.abspath(path))
+        columns = None if usecols is None else sorted(usecols)
+        key = hashlib.blake2b(repr((source, dtype, columns)).encode("utf-8"), digest_size=16)
+        return os.path.join(self.cache_dir, key.hexdigest())
+
+    # --- 取得・登録 ---
+    def get(self, path, usecols=None, dtype=None):
+        """有効なキャッシュがあれば DataFrame を返す。なければ None"""
+        df = self._get(self._entry_dir(path, dtype), path, usecols)
+        if df is None and usecols is not None:
+            # 全列のエントリがなければ、同じ列の組で読んだときのエントリを探す
+            df = self._get(self._entry_dir(path, dtype, usecols), path, usecols)
+        return df
+
+    def _get(self, entry, path, usecols):
+        try:
+            with open(os.path.join(entry, _META), encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["version"] != _FORMAT_VERSION:
+                return None
+            if [meta["size"], meta["mtime_ns"], meta["fingerprint"]] != list(self.source_stamp(path)):
+                return None
+
+            stored = [column["name"] for column in meta["columns"]]
+            if usecols is None:
+                if not meta["complete"]:
+                    return None
+                wanted = stored
+            else:
+                # 一部の列だけのエントリでも、要求された列がそろっていれば使える
+                if not set(usecols) <= set(stored):
+                    return None
+                wanted = [name for name in stored if name in usecols]
+
+            data = {}
+            files = {column["name"]: column for column in meta["columns"]}
+            for name in wanted:
+                column = files[name]
+                file_path = os.path.join(entry, column["file"])
+                if column["kind"] == "npy":
+                    # "c" は書き込んでも元ファイルに反映されないメモリマップ。
+                    # memmap のままだと演算結果まで memmap になるので ndarray として包む
+                    data[name] = np.asarray(np.load(file_path, mmap_mode="c", allow_pickle=False))
+                else:
+                    with open(file_path, "rb") as f:
+                        data[name] = pickle.load(f)
+            df = pd.DataFrame(data, index=pd.RangeIndex(meta["rows"]), columns=pd.Index(wanted), copy=False)
+            # 最終利用時刻として記録（追い出しの順番に使う）
+            os.utime(os.path.join(entry, _META))
+            return df
+        except (OSError, ValueError, KeyError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def put(self, path, df, stamp, dtype=None, usecols=None):
+        """
+        解析結果を保存する。stamp は解析前に取った source_stamp(path)
+        usecols: 一部の列だけ読んだときの列。全列のエントリとは別に保存する
+        """
+        size, mtime_ns, fingerprint = stamp
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry = self._entry_dir(path, dtype, usecols)
+        tmp = tempfile.mkdtemp(prefix=os.path.basename(entry) + ".", suffix=".tmp", dir=self.cache_dir)
+        try:
+            columns = []
+            nbytes = 0
+            for i, name in enumerate(df.columns):
+                series = df.iloc[:, i]
+                if isinstance(series.dtype, np.dtype) and series.dtype.kind in "biufcmM":
+                    file_name = f"{i:05d}.npy"
+                    np.save(os.path.join(tmp, file_name), series.to_numpy(), allow_pickle=False)
+                    kind = "npy"
+                else:
+                    file_name = f"{i:05d}.pkl"
+                    with open(os.path.join(tmp, file_name), "wb") as f:
+                        pickle.dump(series.array, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    kind = "pickle"
+                nbytes += os.path.getsize(os.path.join(tmp, file_name))
+                columns.append({"name": name, "file": file_name, "kind": kind})
+
+            if nbytes > self.max_bytes:
+                shutil.rmtree(tmp, ignore_errors=True)
+                return
+            meta = {
+                "version": _FORMAT_VERSION,
+                "source": os.path.abspath(path),
+                "size": size,
+                "mtime_ns": mtime_ns,
+                "fingerprint": fingerprint,
+                "rows": len(df),
+                "complete": usecols is None,
+                "nbytes": nbytes,
+                "columns": columns,
+            }
+            with open(os.path.join(tmp, _META), "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False)
+
+            shutil.rmtree(entry, ignore_errors=True)
+            try:
+                os.replace(tmp, entry)
+            except OSError:
+                # 別プロセスが同時に書いた場合などはそちらを使う
+                shutil.rmtree(tmp, ignore_errors=True)
+                return
+            self._evict(keep=entry)
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+    # --- 管理 ---
+    def invalidate(self, path):
+        """path のキャッシュをすべての型指定ぶん消す"""
+        source = os.path.abspath(path)
+        for entry, meta, _ in self._entries():
+            if meta.get("source") == source:
+                shutil.rmtree(entry, ignore_errors=True)
+
+    def clear(self):
+        for entry, _, _ in self._entries():
+            shutil.rmtree(entry, ignore_errors=True)
+
+    @property
+    def nbytes(self):
+        return sum(meta.get("nbytes", 0) for _, meta, _ in self._entries())
+
+    def _entries(self):
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".tmp"):
+                continue
+            entry = os.path.join(self.cache_dir, name)
+            meta_path = os.path.join(entry, _META)
+            try:
+                with open(meta_path, encoding="utf-8") as f:
+                    meta = json.load(f)
+                entries.append((entry, meta, os.path.getmtime(meta_path)))
+            except (OSError, ValueError):
+                continue
+        return entries
+
+    def _evict(self, keep=None):
+        entries = sorted(self._entries(), key=lambda item: item[2])
+        total = sum(meta.get("nbytes", 0) for _, meta, _ in entries)
+        for entry, meta, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if entry == keep:
+                continue
+            # メモリマップ中のファイルは消せないことがある（次回に持ち越す）
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= meta.get("nbytes", 0)
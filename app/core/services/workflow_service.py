@@ -0,0 +1,31 @@
+import json
+
+from core.rule_factory import create_rule_from_dict
+
+
+class WorkflowService:
+
+    @staticmethod
+    def read(path):
+        """ワークフロー JSON を読み、(version, ルール dict のリスト) を返す"""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        if isinstance(data, list):
+            # 旧バージョン（versionなし）
+            return 0, data
+        return data.get("version", 0), data.get("rules", [])
+
+    @staticmethod
+    def load(path):
+        _, rules_data = WorkflowService.read(path)
+        return [create_rule_from_dict(r) for r in rules_data]
+
+    @staticmethod
+    def save(rules, path):
+        data = {
+            "version": 1,
+            "rules": [rule.to_dict() for rule in rules]
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4, ensure_ascii=False)
@@ -0,0 +1,141 @@
+# core/sort_keys.py
+
+import numpy as np
+import pandas as pd
+
+NA_POSITIONS = ("last", "first")
+# 整数コードを1本の int64 にまとめるときの上限（符号ビットと余裕を残す）
+_PACK_LIMIT = 1 << 62
+
+
+def normalize_keys(columns, ascending=True, na_position="last"):
+    """列名・昇順・欠損位置を (列名, 昇順, 欠損位置) のリストにそろえる（スカラーは全キー共通）"""
+    columns = [columns] if isinstance(columns, str) else list(columns)
+    if isinstance(ascending, (bool, np.bool_)):
+        ascending = [bool(ascending)] * len(columns)
+    if isinstance(na_position, str):
+        na_position = [na_position] * len(columns)
+    ascending, na_position = list(ascending), list(na_position)
+    if not (len(columns) == len(ascending) == len(na_position)):
+        raise ValueError("並び替えキーの列数と昇順・欠損位置の指定数が一致しません")
+    for position in na_position:
+        if position not in NA_POSITIONS:
+            raise ValueError(f"欠損位置は last / first のいずれかです: {position}")
+    return [(column, bool(asc), position) for column, asc, position in zip(columns, ascending, na_position)]
+
+
+def sort_order(frame, keys):
+    """
+    keys（normalize_keys の形）で frame を安定ソートしたときの行位置（0..len-1）を返す。
+
+    各キーを「小さいほど前」の配列に変換してから並べる。
+    カテゴリ・文字列・整数などは欠損位置と昇降順を織り込んだ 0 以上の整数コードにし、
+    全キーの組み合わせが int64 に収まれば1本にまとめて1回の argsort、
+    小数を含む場合は lexsort で並べる。
+    """
+    parts = []
+    for column, ascending, na_position in keys:
+        parts.extend(encode_key(frame[column], ascending, na_position))
+    if not parts:
+        return np.arange(len(frame), dtype=np.int64)
+    if len(parts) == 1:
+        values, span = parts[0]
+        return np.argsort(values, kind="stable") if span is None else _argsort_codes(values, span)
+
+    spans = [span for _, span in parts]
+    if None not in spans and int(np.prod([float(span) for span in spans])) < _PACK_LIMIT:
+        composite = np.zeros(len(frame), dtype=np.int64)
+        total = 1
+        for codes, span in parts:
+            composite *= span
+            composite += codes
+            total *= span
+        return _argsort_codes(composite, total)
+    # np.lexsort は最後の配列を第1キーとして安定ソートする
+    return np.lexsort([values for values, _ in reversed(parts)])
+
+
+def _argsort_codes(codes, span):
+    """
+    0..span-1 の整数コードを安定ソートする。
+    NumPy の安定ソートは 16 ビット以下の整数なら基数ソートになるので、
+    32 ビットに収まるコードは上位・下位 16 ビットに分けて lexsort する（int64 のままより数倍速い）。
+    """
+    if span <= 1 << 16:
+        return np.argsort(codes.astype(np.uint16), kind="stable")
+    if span <= 1 << 32:
+        return np.lexsort([(codes & 0xFFFF).astype(np.uint16), (codes >> 16).astype(np.uint16)])
+    return np.argsort(codes, kind="stable")
+
+
+def encode_key(series, ascending=True, na_position="last"):
+    """
+    1キー分を [(配列, 値の範囲), ...]（前ほど優先）に変換する。
+    範囲が int なら配列は 0..範囲-1 の整数コード、None なら小数などの値そのもの。
+    """
+    nulls_first = na_position == "first"
+    dtype = series.dtype
+
+    if isinstance(dtype, pd.CategoricalDtype):
+        # カテゴリの並び順（コード）で並べる
+        codes = series.cat.codes.to_numpy().astype(np.int64)
+        return [_ranked(codes, codes < 0, len(dtype.categories), ascending, nulls_first)]
+
+    if isinstance(dtype, np.dtype) and dtype.kind in "biu":
+        values = series.to_numpy()
+        if dtype.kind == "b" or not len(values):
+            return [_ranked(values.astype(np.int64), None, 2 if dtype.kind == "b" else 1, ascending, nulls_first)]
+        low, high = int(values.min()), int(values.max())
+        if high - low < _PACK_LIMIT:
+            return [_ranked(values.astype(np.int64) - low, None, high - low + 1, ascending, nulls_first)]
+        # 範囲が広すぎる整数は値のまま（降順は ~x で順序を反転。桁あふれしない）
+        return [(values if ascending else ~values, None)]
+
+    if isinstance(dtype, np.dtype) and dtype.kind in "fmM":
+        values = series.to_numpy()
+        null = pd.isna(values)
+        if dtype.kind in "mM":
+            values = values.view(np.int64)
+            values = values if ascending else ~values
+        else:
+            values = values if ascending else -values
+        if not null.any():
+            return [(values, None)]
+        values = np.where(null, 0, values)
+        flag = (~null if nulls_first else null).astype(np.int64)
+        return [(flag, 2), (values, None)]
+
+    numpy_dtype = getattr(dtype, "numpy_dtype", None)
+    if numpy_dtype is not None and numpy_dtype.kind in "biuf":
+        # Int64 などの拡張型: 欠損を仮の値で埋めてから NumPy の型として扱い、欠損位置を付け直す
+        null = series.isna().to_numpy()
+        filled = pd.Series(series.to_numpy(dtype=numpy_dtype, na_value=0))
+        if not null.any():
+            return encode_key(filled, ascending, na_position)
+        flag = (~null if nulls_first else null).astype(np.int64)
+        return [(flag, 2)] + encode_key(filled, ascending)
+
+    # 文字列など: 値の種類を並べた順位（欠損は -1）
+    if dtype == object:
+        # factorize(sort=True) は型の混在した値も型ごとに並べてしまうので、値どうしを直接比べて
+        # sort_values と同じく比べられない組み合わせ（文字列と数値など）は TypeError にする
+        codes, uniques = pd.factorize(series)
+        order = np.asarray(uniques, dtype=object).argsort(kind="stable")
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        codes = np.where(codes < 0, -1, rank[np.maximum(codes, 0)]) if len(rank) else codes.astype(np.int64)
+    else:
+        codes, uniques = pd.factorize(series, sort=True)
+        codes = codes.astype(np.int64, copy=False)
+    return [_ranked(codes, codes < 0, len(uniques), ascending, nulls_first)]
+
+
+def _ranked(codes, null, span, ascending, nulls_first):
+    """0..span-1 のコードに昇降順と欠損位置を織り込み、(コード, 範囲) を返す"""
+    if not ascending:
+        codes = span - 1 - codes
+    if null is None or not null.any():
+        return codes, span
+    if nulls_first:
+        return np.where(null, 0, codes + 1), span + 1
+    return np.where(null, span, codes), span + 1
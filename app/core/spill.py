@@ -0,0 +1,80 @@
+# core/spill.py
+
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+# 既定のメモリ上限（バイト）
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+
+
+class SpillBuffer:
+    """
+    チャンクを順番に溜めるバッファ。
+    メモリ上限を超えたら一時ファイルへ書き出し、読み出し時は元の順序で返す。
+    """
+
+    def __init__(self, memory_budget=DEFAULT_MEMORY_BUDGET, spill_dir=None):
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
+        self._chunks = []
+        self._files = []
+        self._bytes = 0
+        self._row_bytes = None
+        self._tmpdir = None
+        self.rows = 0
+
+    def append(self, chunk):
+        if self._row_bytes is None and len(chunk):
+            # 1行あたりのサイズは最初のチャンクから見積もる
+            self._row_bytes = max(1, int(chunk.memory_usage(deep=True).sum() / len(chunk)))
+        self._chunks.append(chunk)
+        self._bytes += len(chunk) * (self._row_bytes or 0)
+        self.rows += len(chunk)
+        if self._bytes > self.memory_budget:
+            self._spill()
+
+    def _spill(self):
+        if self._tmpdir is None:
+            self._tmpdir = tempfile.mkdtemp(prefix="csvwf_spill_", dir=self.spill_dir)
+        path = os.path.join(self._tmpdir, f"{len(self._files):06d}.pkl")
+        pd.concat(self._chunks).to_pickle(path)
+        self._files.append(path)
+        self._chunks = []
+        self._bytes = 0
+
+    @property
+    def spilled(self):
+        return len(self._files)
+
+    def __iter__(self):
+        for path in self._files:
+            yield pd.read_pickle(path)
+        yield from self._chunks
+
+    def __reversed__(self):
+        """後ろから順に返す（ファイル1つ分はまとめて1つのチャンクになる）"""
+        yield from reversed(self._chunks)
+        for path in reversed(self._files):
+            yield pd.read_pickle(path)
+
+    def to_frame(self):
+        chunks = list(self)
+        if not chunks:
+            return pd.DataFrame()
+        return pd.concat(chunks)
+
+    def close(self):
+        self._chunks = []
+        self._files = []
+        if self._tmpdir is not None:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+            self._tmpdir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
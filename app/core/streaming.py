@@ -0,0 +1,114 @@
+# core/streaming.py
+
+import os
+import time
+
+from core.planner import QueryPlanner
+from core.processor import ExecutionCancelled
+from core.services.csv_service import CsvService, DEFAULT_CHUNKSIZE
+
+
+class _StageCounter:
+    """各ルールを通過した行数を数える"""
+
+    def __init__(self):
+        self.rows_in = 0
+        self.rows_out = 0
+
+    def count_in(self, chunks):
+        for chunk in chunks:
+            self.rows_in += len(chunk)
+            yield chunk
+
+    def count_out(self, chunks):
+        for chunk in chunks:
+            self.rows_out += len(chunk)
+            yield chunk
+
+
+class StreamingProcessor:
+    """
+    メモリに乗らない大きな CSV 用の実行エンジン。
+    入力をチャンクごとに読み、各ルールを通して出力へ逐次書き込む。
+    並び替えなど全行が必要なルール（pipeline_breaker）は
+    そのルールの apply_stream がディスク退避しながら処理する。
+    """
+
+    def __init__(self, rules, logger=None, chunksize=DEFAULT_CHUNKSIZE, optimize=True,
+                 progress=None, cancel=None):
+        """progress / cancel は CsvProcessor と同じ（中断はチャンクの区切りで行う）"""
+        self.rules = rules
+        self.logger = logger
+        self.chunksize = chunksize
+        self.optimize = optimize
+        self.progress = progress
+        self.cancel = cancel
+
+    def execute(self, input_path, output_path):
+        """input_path を処理して output_path へ書き出し、出力行数を返す"""
+        unsupported = [rule.description() for rule in self.rules if not rule.supports_streaming()]
+        if unsupported:
+            # 全行をメモリに集めないと処理できないルールは、読み込みを始める前に弾く
+            raise ValueError(f"ストリーミング処理に対応していないルールがあります: {', '.join(unsupported)}")
+        header = CsvService.read_header(input_path).columns
+        self.usecols = QueryPlanner(header).required_columns(self.rules)
+        if self.usecols is not None:
+            if self.logger:
+                self.logger(f"読み込み列: {len(self.usecols)} / {len(header)} 列")
+            header = [c for c in header if c in self.usecols]
+
+        rules = self.rules
+        if self.optimize:
+            # 一度書き出し始めた出力は実行し直さないので、計画のエラーもそのまま出す
+            plan = QueryPlanner(header).optimize(self.rules)
+            if self.logger:
+                self.logger(plan.explain() + "\n")
+            rules = plan.rules
+
+        return self._run(rules, input_path, output_path)
+
+    def _run(self, rules, input_path, output_path):
+        start = time.perf_counter()
+        self.rows_read = 0
+        self._fraction = 0.0
+        stream = self._checked(CsvService.load_chunks(
+            input_path, self.chunksize, usecols=self.usecols, progress=self._report
+        ))
+
+        counters = []
+        for rule in rules:
+            counter = _StageCounter()
+            stream = counter.count_out(rule.apply_stream(counter.count_in(stream)))
+            counters.append(counter)
+
+        try:
+            rows = CsvService.save_chunks(stream, output_path)
+        except ExecutionCancelled:
+            # 書きかけの出力は残さない
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            raise
+
+        if self.logger:
+            for index, (rule, counter) in enumerate(zip(rules, counters), start=1):
+                mark = " (全件処理)" if rule.pipeline_breaker else ""
+                self.logger(f"[{index}] {rule.description()}{mark}")
+                for note in rule.execution_notes():
+                    self.logger(note)
+                self.logger(f"件数: {counter.rows_in} → {counter.rows_out}\n")
+            elapsed = time.perf_counter() - start
+            self.logger(f"ストリーミング出力: {rows} 行 ({elapsed:.2f} 秒)")
+        return rows
+
+    def _checked(self, chunks):
+        for chunk in chunks:
+            if self.cancel and self.cancel():
+                raise ExecutionCancelled()
+            self.rows_read += len(chunk)
+            if self.progress:
+                self.progress(self.rows_read, self._fraction)
+            yield chunk
+
+    def _report(self, position, size):
+        # 読み込んだバイト数から進捗率を出す（総行数は事前に分からないため）
+        self._fraction = position / size if size else 1.0
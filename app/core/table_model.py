@@ -1,25 +1,92 @@
-from PySide6.QtCore import QAbstractTableModel, Qt
+from collections import OrderedDict
+
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+# 文字列化は BLOCK_ROWS 行単位でまとめて行い、LRU で CACHE_BLOCKS ブロックまで保持する
+BLOCK_ROWS = 256
+CACHE_BLOCKS = 512
+# rowCount に一度に見せる行数（スクロールに合わせて fetchMore で増やす）
+FETCH_ROWS = 10_000
+# 列幅の見積もりに使う行数
+WIDTH_SAMPLE_ROWS = 200
+
 
 class DataFrameModel(QAbstractTableModel):
     def __init__(self, df):
         super().__init__()
         self._df = df
+        self._arrays = {}
+        self._blocks = OrderedDict()
+        self._loaded = min(len(df), FETCH_ROWS)
 
-    def rowCount(self, parent=None):
-        return len(self._df)
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self._loaded
 
-    def columnCount(self, parent=None):
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
         return len(self._df.columns)
 
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._loaded < len(self._df)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(FETCH_ROWS, len(self._df) - self._loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + count - 1)
+        self._loaded += count
+        self.endInsertRows()
+
     def data(self, index, role=Qt.DisplayRole):
         if role == Qt.DisplayRole:
-            return str(self._df.iloc[index.row(), index.column()])
+            row = index.row()
+            block = self._block(index.column(), row // BLOCK_ROWS)
+            return block[row % BLOCK_ROWS]
         return None
 
     def headerData(self, section, orientation, role):
         if role == Qt.DisplayRole:
             if orientation == Qt.Horizontal:
-                return self._df.columns[section]
+                return str(self._df.columns[section])
             else:
                 return str(section)
         return None
+
+    def estimate_column_widths(self, metrics, padding=16, max_width=400):
+        """先頭・途中・末尾から抜き出した行だけで列幅を見積もる（全行は走査しない）"""
+        total = len(self._df)
+        step = max(1, total // WIDTH_SAMPLE_ROWS)
+        sample = range(0, total, step)
+        widths = []
+        for col in range(len(self._df.columns)):
+            array = self._column(col)
+            texts = [str(self._df.columns[col])] + [str(array[row]) for row in sample]
+            width = max(metrics.horizontalAdvance(text) for text in texts) + padding
+            widths.append(min(width, max_width))
+        return widths
+
+    # --- 内部 ---
+    def _column(self, col):
+        # 列ごとの NumPy 配列は最初に表示されたときに作る
+        if col not in self._arrays:
+            self._arrays[col] = self._df.iloc[:, col].to_numpy()
+        return self._arrays[col]
+
+    def _block(self, col, block_no):
+        key = (col, block_no)
+        block = self._blocks.get(key)
+        if block is not None:
+            self._blocks.move_to_end(key)
+            return block
+
+        start = block_no * BLOCK_ROWS
+        block = [str(value) for value in self._column(col)[start:start + BLOCK_ROWS]]
+        self._blocks[key] = block
+        if len(self._blocks) > CACHE_BLOCKS:
+            self._blocks.popitem(last=False)
+        return block
@@ -0,0 +1,182 @@
+# core/text_search.py
+
+import re
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+# オートマトンに一度に流す文字数の上限（文字コード配列のメモリを抑える）
+BATCH_CHARS = 4_000_000
+# これより長い文字列はオートマトンを1文字ずつ進めるより正規表現の方が速い
+LONG_TEXT = 2048
+# パターンがこの件数以上なら Aho-Corasick、未満なら正規表現の選択（|）でまとめる
+AHO_CORASICK_MIN_PATTERNS = 64
+# 抜き取った行の種類数 / 行数 がこれ以下なら、値の種類ごとに判定する
+DEDUPE_MAX_RATIO = 0.5
+SAMPLE_ROWS = 10_000
+
+
+class TextMatcher:
+    """
+    「patterns のどれかを含むか」を判定する。
+      regex=False: 部分一致（既定）。1件なら in 演算子、少数なら正規表現の選択、
+                   多数なら Aho-Corasick
+      regex=True : patterns を正規表現としてまとめてコンパイルしておき search する
+    カテゴリ型・数値の列や重複の多い文字列列は、値の種類ごとに1回だけ判定して各行へ引き当てる。
+    欠損は一致しない。
+    """
+
+    def __init__(self, patterns, regex=False):
+        self.patterns = [str(pattern) for pattern in patterns]
+        self.regex = regex
+        self._automaton = None
+        self._compiled = None
+        if not self.patterns or "" in self.patterns:
+            pass
+        elif regex:
+            self._compiled = re.compile("|".join(f"(?:{p})" for p in self.patterns))
+        elif len(self.patterns) >= AHO_CORASICK_MIN_PATTERNS:
+            self._automaton = AhoCorasick(self.patterns)
+        elif len(self.patterns) > 1:
+            self._compiled = re.compile("|".join(re.escape(p) for p in self.patterns))
+
+    def mask(self, series):
+        """series の各行が一致するかを bool の ndarray で返す"""
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            codes = series.cat.codes.to_numpy()
+            uniques = series.cat.categories.to_numpy()
+        else:
+            values = series.to_numpy()
+            is_text = pd.api.types.is_string_dtype(series)
+            if is_text and not (self._expensive and _duplicated(values)):
+                # 1件の部分一致などは種類をまとめる（ハッシュ計算）より1行ずつ調べる方が速い
+                valid = np.flatnonzero(pd.notna(values))
+                result = np.zeros(len(values), dtype=bool)
+                result[valid] = self.match_values(values[valid])
+                return result
+            try:
+                codes, uniques = pd.factorize(values)
+            except TypeError:
+                # ハッシュできない値（リストなど）を含む列は1行ずつ判定する
+                return self.match_values(series.astype(str).to_numpy(dtype=object)) & series.notna().to_numpy()
+        if not pd.api.types.is_string_dtype(uniques):
+            # 数値などは従来どおり文字列にしてから判定する（種類ごとに1回だけ）
+            uniques = pd.Series(uniques).astype(str).to_numpy(dtype=object)
+        # 末尾に False を足し、欠損のコード -1 がそこを引くようにする
+        hits = np.append(self.match_values(uniques), False)
+        return hits[codes]
+
+    @property
+    def _expensive(self):
+        return self._compiled is not None or self._automaton is not None
+
+    def match_values(self, values):
+        """文字列の配列の各要素が一致するか"""
+        values = list(values)
+        if not self.patterns:
+            return np.zeros(len(values), dtype=bool)
+        if self._compiled is not None:
+            search = self._compiled.search
+            return np.fromiter((search(v) is not None for v in values), dtype=bool, count=len(values))
+        if self._automaton is not None:
+            return self._automaton.search(values)
+        if "" in self.patterns:
+            return np.ones(len(values), dtype=bool)
+        pattern = self.patterns[0]
+        return np.fromiter((pattern in v for v in values), dtype=bool, count=len(values))
+
+
+def _duplicated(values):
+    """抜き取った行で、値の重複が多いか（種類ごとに判定した方が速いか）を見積もる"""
+    if len(values) <= SAMPLE_ROWS:
+        sample = values
+    else:
+        sample = values[np.linspace(0, len(values) - 1, SAMPLE_ROWS).astype(np.int64)]
+    return len(set(sample)) <= len(sample) * DEDUPE_MAX_RATIO
+
+
+class AhoCorasick:
+    """
+    複数パターンの部分一致を1回の走査で判定するオートマトン。
+    遷移は (状態, 文字) の表にしておき、多数の文字列を NumPy で同時に1文字ずつ進める。
+    """
+
+    def __init__(self, patterns):
+        # トライ木
+        children = [{}]
+        accept = [False]
+        for pattern in patterns:
+            state = 0
+            for char in pattern:
+                if char not in children[state]:
+                    children[state][char] = len(children)
+                    children.append({})
+                    accept.append(False)
+                state = children[state][char]
+            accept[state] = True
+
+        # パターンに出てくる文字だけに番号を振る（0 はそれ以外の文字）
+        self.alphabet = np.array(sorted({ord(c) for p in patterns for c in p}), dtype=np.uint32)
+        char_ids = {chr(code): i + 1 for i, code in enumerate(self.alphabet)}
+
+        # 失敗リンクをたどって、すべての (状態, 文字) の遷移先を埋める
+        table = np.zeros((len(children), len(self.alphabet) + 1), dtype=np.int32)
+        fail = [0] * len(children)
+        queue = deque()
+        for char, child in children[0].items():
+            table[0, char_ids[char]] = child
+            queue.append(child)
+        while queue:
+            state = queue.popleft()
+            accept[state] = accept[state] or accept[fail[state]]
+            table[state] = table[fail[state]]
+            for char, child in children[state].items():
+                fail[child] = table[fail[state], char_ids[char]]
+                table[state, char_ids[char]] = child
+                queue.append(child)
+
+        self.table = table
+        self.accept = np.array(accept, dtype=bool)
+        self._fallback = re.compile("|".join(re.escape(p) for p in patterns))
+
+    def search(self, values):
+        lengths = np.fromiter((len(v) for v in values), dtype=np.int64, count=len(values))
+        result = np.zeros(len(values), dtype=bool)
+
+        long_rows = np.flatnonzero(lengths > LONG_TEXT)
+        for i in long_rows:
+            result[i] = self._fallback.search(values[i]) is not None
+
+        # 長さ順に並べ、長さの近いものをまとめて流す（詰め物の文字を減らす）
+        order = np.argsort(lengths, kind="stable")
+        order = order[lengths[order] <= LONG_TEXT]
+        sorted_lengths = lengths[order]
+        start = 0
+        while start < len(order):
+            # 行数 × 最長の文字数 が BATCH_CHARS に収まるところまでを1回分にする
+            stop = min(len(order), start + max(1, BATCH_CHARS // max(1, int(sorted_lengths[start]))))
+            while stop - start > 1 and (stop - start) * int(sorted_lengths[stop - 1]) > BATCH_CHARS:
+                stop = start + max(1, BATCH_CHARS // int(sorted_lengths[stop - 1]))
+            rows = order[start:stop]
+            width = max(1, int(sorted_lengths[stop - 1]))
+            result[rows] = self._search_batch([values[i] for i in rows], sorted_lengths[start:stop], width)
+            start = stop
+        return result
+
+    def _search_batch(self, texts, lengths, width):
+        codes = np.array(texts, dtype=f"<U{width}").view(np.uint32).reshape(len(texts), width)
+        position = np.searchsorted(self.alphabet, codes)
+        position = np.minimum(position, len(self.alphabet) - 1)
+        ids = np.where(self.alphabet[position] == codes, position + 1, 0).astype(np.int32)
+
+        state = np.zeros(len(texts), dtype=np.int32)
+        hit = np.zeros(len(texts), dtype=bool)
+        # lengths は昇順なので、j 文字目を持つ行は末尾側の連続した範囲になる
+        for j in range(width):
+            first = int(np.searchsorted(lengths, j, side="right"))
+            if first >= len(texts):
+                break
+            state[first:] = self.table[state[first:], ids[first:, j]]
+            hit[first:] |= self.accept[state[first:]]
+        return hit
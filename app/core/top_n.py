@@ -0,0 +1,109 @@
+# core/top_n.py
+
+import numpy as np
+import pandas as pd
+
+from core.sort_keys import sort_order
+
+# n が行数のこの割合を超えたら、部分選択をせずに全件を安定ソートする
+PARTIAL_MAX_RATIO = 0.5
+
+
+def top_n_order(frame, keys, n):
+    """
+    frame を keys（sort_keys.normalize_keys の形）で安定ソートしたときの先頭 n 行の位置を返す。
+
+    1. 第1キーの n 番目の値を部分選択（np.partition, O(N)）で求める
+    2. その値以下（降順なら以上）の行だけを候補にする（同値の行はすべて残る）
+    3. 候補だけを元の行順のまま安定ソートして先頭 n 行を取る
+    候補は元の行順を保つので、同値の並びも全件の安定ソートと同じになる。
+    """
+    for column, _, _ in keys:
+        # n が 0 でも、全件ソートと同じくキー列がなければエラーにする
+        if column not in frame.columns:
+            raise KeyError(column)
+    size = len(frame)
+    n = max(0, min(int(n), size))
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+
+    candidates = None
+    if n <= size * PARTIAL_MAX_RATIO:
+        column, ascending, na_position = keys[0]
+        candidates = _candidates(frame[column], ascending, na_position, n)
+    if candidates is None:
+        return sort_order(frame, keys)[:n]
+
+    return candidates[sort_order(frame.iloc[candidates], keys)[:n]]
+
+
+def _candidates(series, ascending, na_position, n):
+    """上位 n 件に入りうる行位置（昇順）。絞り込めない型・欠損が多いときは None"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # カテゴリ型はカテゴリの並び順（コード）で比べる
+        values = series.cat.codes.to_numpy()
+        valid = values >= 0
+    elif isinstance(series.dtype, np.dtype) and series.dtype.kind in "biufmM":
+        values = series.to_numpy()
+        valid = ~pd.isna(values) if series.dtype.kind in "fmM" else None
+    elif getattr(series.dtype, "numpy_dtype", None) is not None:
+        # Int64 などの拡張型: 欠損を仮の値で埋めた NumPy 配列と欠損の位置で扱う
+        values = series.to_numpy(dtype=series.dtype.numpy_dtype, na_value=0)
+        valid = series.notna().to_numpy()
+    else:
+        values = series.to_numpy(dtype=object)
+        valid = series.notna().to_numpy()
+
+    if valid is not None and valid.all():
+        valid = None
+    positions = None if valid is None else np.flatnonzero(valid)
+    keys = values if positions is None else values[positions]
+    count = len(keys)
+    nulls = None
+    if positions is not None and na_position == "first":
+        # 欠損が先頭なら欠損の行はすべて候補にし、残りの件数を値から選ぶ
+        nulls = np.flatnonzero(~valid)
+        n -= len(nulls)
+        if n <= 0:
+            return nulls
+    if count <= n:
+        # 有効な値がすべて上位に入り、残りは欠損の行どうしの並びで決まる
+        return None
+
+    try:
+        if ascending:
+            threshold = np.partition(keys, n - 1)[n - 1]
+            hit = keys <= threshold
+        else:
+            threshold = np.partition(keys, count - n)[count - n]
+            hit = keys >= threshold
+    except TypeError:
+        # 比較できない値が混ざっている列（文字列と数値など）
+        return None
+    hit = np.flatnonzero(np.asarray(hit, dtype=bool))
+    hit = hit if positions is None else positions[hit]
+    return hit if nulls is None else np.union1d(nulls, hit)
+
+
+class TopNCollector:
+    """
+    チャンクを順に受け取り、その時点までの上位 n 行だけを保持する（ストリーミング用）。
+    保持している行は入力順で常に後から来た行より前なので、同値の並びも全件ソートと同じになる。
+    """
+
+    def __init__(self, keys, n):
+        self.keys = keys
+        self.n = n
+        self.kept = None
+
+    def add(self, chunk):
+        if self.kept is None:
+            combined = chunk
+        elif not len(chunk):
+            return
+        else:
+            combined = pd.concat([self.kept, chunk])
+        self.kept = combined.iloc[top_n_order(combined, self.keys, self.n)]
+
+    def result(self):
+        return self.kept
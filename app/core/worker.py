@@ -1,22 +1,125 @@
-import pandas as pd
+import threading
+import time
+
 from PySide6.QtCore import QObject, Signal
 
+from core.frame_view import FrameView
+from core.processor import CsvProcessor, ExecutionCancelled
+from core.streaming import StreamingProcessor
+
+# ログ・進捗シグナルの最短送出間隔（秒）。イベントループをあふれさせない
+EMIT_INTERVAL = 0.1
+
+
 class Worker(QObject):
-    finished = Signal(pd.DataFrame)
+    """
+    ルールの実行をバックグラウンドスレッドで行う。
+    QThread へ moveToThread してから run を呼ぶ。
+
+    df を渡すとメモリ上で実行し、finished に結果の DataFrame を送る。
+    df の代わりに FrameView を渡すと、実体化済みの結果 FrameView を送る。
+    df が None のときは input_path → output_path をストリーミング実行し、
+    finished に出力行数を送る。
+    """
+
+    finished = Signal(object)
+    failed = Signal(str)
+    cancelled = Signal()
     progress = Signal(int)
+    rows = Signal(int)
+    log = Signal(str)
 
-    def __init__(self, df, rules):
+    def __init__(self, df, rules, input_path=None, output_path=None, cache=None, indexes=None,
+                 profiler=None):
         super().__init__()
         self.df = df
+        self.cache = cache
+        self.indexes = indexes
+        self.profiler = profiler
         self.rules = rules
+        self.input_path = input_path
+        self.output_path = output_path
+        self._cancel = threading.Event()
+        self._lines = []
+        self._last_log = 0.0
+        self._last_progress = 0.0
+        self._percent = -1
+
+    def cancel(self):
+        """次のルール / チャンクの区切りで中断する（どのスレッドから呼んでもよい）"""
+        self._cancel.set()
 
     def run(self):
-        result = self.df
-        total = len(self.rules)
+        try:
+            if self.df is not None:
+                processor = CsvProcessor(
+                    self.rules, logger=self._log,
+                    progress=self._progress, cancel=self._cancel.is_set,
+                    cache=self.cache, indexes=self.indexes, profiler=self.profiler,
+                )
+                if isinstance(self.df, FrameView):
+                    # 実体化もこのスレッドで済ませておく
+                    result = processor.execute_view(self.df)
+                    result.materialize()
+                else:
+                    result = processor.execute(self.df)
+            else:
+                processor = StreamingProcessor(
+                    self.rules, logger=self._log,
+                    progress=self._progress, cancel=self._cancel.is_set,
+                )
+                result = processor.execute(self.input_path, self.output_path)
+        except ExecutionCancelled:
+            self._flush_log()
+            self.cancelled.emit()
+            return
+        except Exception as e:
+            self._flush_log()
+            self.failed.emit(str(e))
+            return
+
+        self._flush_log()
+        self.progress.emit(100)
+        self.finished.emit(result)
+
+    # --- 間引き付きの送出 ---
+    def _log(self, message):
+        self._lines.append(message)
+        if time.monotonic() - self._last_log >= EMIT_INTERVAL:
+            self._flush_log()
 
-        for i, rule in enumerate(self.rules):
-            result = rule.apply(result)
-            percent = int((i+1)/total*100)
+    def _flush_log(self):
+        if self._lines:
+            self.log.emit("\n".join(self._lines))
+            self._lines = []
+        self._last_log = time.monotonic()
+
+    def _progress(self, rows, fraction):
+        percent = int(fraction * 100)
+        now = time.monotonic()
+        if percent != self._percent and now - self._last_progress >= EMIT_INTERVAL:
+            self._percent = percent
+            self._last_progress = now
             self.progress.emit(percent)
+            self.rows.emit(rows)
 
-        self.finished.emit(result)
+
+class RestoreWorker(Worker):
+    """
+    元に戻す / やり直す の状態の復元をバックグラウンドで行う。
+    restore() が返す FrameView（ディスクへ退避した履歴の読み戻しを含む）を
+    このスレッドで実体化してから finished に送る（GUI スレッドでは全行をコピーしない）。
+    """
+
+    def __init__(self, restore):
+        super().__init__(None, [])
+        self.restore = restore
+
+    def run(self):
+        try:
+            view = self.restore()
+            view.materialize()
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.finished.emit(view)
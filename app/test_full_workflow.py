@@ -40,3 +40,16 @@ result_df = processor.execute(df)
 print("----------------------------------------")
 print(f"最終データ ({len(result_df)}件):")
 print(result_df)
+
+# --- ストリーミングの重複削除（最後の行を残す・ディスク退避あり）が全件処理と同じ順序になるか ---
+import numpy as np
+from core.rules.dedupe_rule import DedupeRule
+
+keys = np.random.default_rng(0).integers(0, 1500, 2000)
+dedupe_df = pd.DataFrame({"キー": keys, "行": np.arange(2000)})
+dedupe_rule = DedupeRule(["キー"], keep="last", memory_budget=2000)
+chunks = [dedupe_df.iloc[i:i + 100] for i in range(0, len(dedupe_df), 100)]
+streamed = pd.concat(list(dedupe_rule.apply_stream(iter(chunks))))
+assert streamed.equals(dedupe_rule.apply(dedupe_df)), "ストリーミングの重複削除の結果が一致しません"
+print("----------------------------------------")
+print(f"ストリーミング重複削除（退避あり）: {len(streamed)} 件、全件処理と一致")
@@ -4,14 +4,22 @@ import os
 import time
 import json
 import pandas as pd
-from PySide6.QtCore import Qt, QStandardPaths
+from PySide6.QtCore import Qt, QStandardPaths, QThread
 from PySide6.QtWidgets import (
     QPushButton, QMainWindow, QVBoxLayout, QHBoxLayout,
     QListWidget, QWidget, QListWidgetItem, QFileDialog, 
-    QTextEdit, QTableView, QSplitter, QLabel, QProgressBar,
+    QTextEdit, QTableView, QSplitter, QLabel, QProgressBar, QCheckBox,
 )
 
 from core.processor import CsvProcessor
+from core.worker import RestoreWorker, Worker
+from core.frame_view import FrameView
+from core.history import HistoryStore
+from core.result_cache import ResultCache
+from core.column_index import ColumnIndexes
+from core.profiling import ChromeTraceSink, LogSink, Profiler
+from core.services.csv_service import CsvService
+from core.services.compact_dtypes import DtypeCompactor
 from core.table_model import DataFrameModel
 from core.rule_factory import create_rule_from_dict
 from .rule_dialog import RuleDialog
@@ -22,9 +30,15 @@ class MainWindow(QMainWindow):
         super().__init__()
 
         self.rules = []
-        self.history = []
-        self.future = []
+        # 履歴は読み込んだ元データからの差分で持つ（DataFrame のコピーは持たない）
+        self.history = HistoryStore()
+        # ルールの先頭部分が同じなら途中結果を再利用する
+        self.result_cache = ResultCache()
+        self.column_indexes = ColumnIndexes()
         self.current_df = None
+        self.current_view = None
+        self._thread = None
+        self._worker = None
 
         self._setup_ui()
         self._connect_signals()
@@ -43,12 +57,24 @@ class MainWindow(QMainWindow):
         self.save_result_button = QPushButton("結果をCSV保存")
         self.save_workflow_button = QPushButton("ワークフロー保存")
         self.load_workflow_button = QPushButton("ワークフロー読込")
+        self.stream_button = QPushButton("大容量CSVを直接処理")
+        self.usecols_checkbox = QCheckBox("ルールで使う列だけ読込")
+        self.compact_checkbox = QCheckBox("省メモリ型で読込")
+        self.compact_checkbox.setToolTip("整数を小さい型に、種類の少ない文字列列をカテゴリ型に変換して読み込みます")
+        self.profile_checkbox = QCheckBox("ルールごとに計測")
+        self.profile_checkbox.setToolTip(
+            "ルールごとの処理時間・行数をログに出し、トレース（chrome://tracing で表示）を保存します"
+        )
 
         top_layout = QHBoxLayout()
         top_layout.addWidget(self.load_button)
         top_layout.addWidget(self.save_result_button)
         top_layout.addWidget(self.save_workflow_button)
         top_layout.addWidget(self.load_workflow_button)
+        top_layout.addWidget(self.stream_button)
+        top_layout.addWidget(self.usecols_checkbox)
+        top_layout.addWidget(self.compact_checkbox)
+        top_layout.addWidget(self.profile_checkbox)
 
         # ===== テーブル =====
         self.table_view = QTableView()
@@ -97,11 +123,14 @@ class MainWindow(QMainWindow):
         self.undo_button = QPushButton("元に戻す")
         self.redo_button = QPushButton("やり直す")
         self.execute_button = QPushButton("実行")
+        self.cancel_button = QPushButton("中止")
+        self.cancel_button.setEnabled(False)
 
         bottom_button_layout = QHBoxLayout()
         bottom_button_layout.addWidget(self.undo_button)
         bottom_button_layout.addWidget(self.redo_button)
         bottom_button_layout.addWidget(self.execute_button)
+        bottom_button_layout.addWidget(self.cancel_button)
 
         # ===== ログ =====
         self.log_output = QTextEdit()
@@ -135,9 +164,11 @@ class MainWindow(QMainWindow):
         self.rule_list.itemDoubleClicked.connect(self.edit_rule)
         self.redo_button.clicked.connect(self.redo)
         self.execute_button.clicked.connect(self.execute_rules)
+        self.cancel_button.clicked.connect(self.cancel_execution)
         self.save_workflow_button.clicked.connect(self.save_workflow)
         self.load_workflow_button.clicked.connect(self.load_workflow)
         self.save_result_button.clicked.connect(self.save_result_csv)
+        self.stream_button.clicked.connect(self.execute_streaming)
 
     def load_csv(self):
         file_path, _ = QFileDialog.getOpenFileName(
@@ -148,11 +179,18 @@ class MainWindow(QMainWindow):
             return
 
         try:
-            self.current_df = pd.read_csv(file_path)
-            self.table_view.setModel(DataFrameModel(self.current_df))
-            self.table_view.resizeColumnsToContents()
-            self.history.clear()
-            self.future.clear()
+            rules = self._current_rules()
+            compact = DtypeCompactor() if self.compact_checkbox.isChecked() else None
+            if self.usecols_checkbox.isChecked() and rules:
+                # ワークフローが参照・出力しない列は解析しない
+                self.current_df = CsvProcessor(rules, logger=self.log).load(file_path, compact=compact)
+            else:
+                self.current_df = CsvService.load(file_path, compact=compact, logger=self.log)
+            self.current_view = FrameView.from_frame(self.current_df)
+            self._show_df(self.current_df, resize=True)
+            self.history.reset(self.current_df)
+            self.result_cache.clear()
+            self.column_indexes.clear()
             self._update_undo_button()
             self._update_redo_button()
             self.log(f"CSV loaded: {file_path}")
@@ -197,49 +235,152 @@ class MainWindow(QMainWindow):
         if self.current_df is None:
             self.log("CSVが読み込まれていません")
             return
+        if self._thread is not None:
+            self.log("実行中です")
+            return
 
-        try:
-            self.log("--- 実行開始 ---")
-            self.progress_bar.setValue(0)
-            self.statusBar().showMessage("実行中...")
-            start_time = time.perf_counter()
+        # 適用ルールを取得
+        rules = self._current_rules()
+        self.log("--- 実行開始 ---")
+        self.log(f"適用ルール数: {len(rules)}")
 
-            # 実行前の状態を保存（Undo用）
-            self.history.append(self.current_df.copy())
-            self.future.clear()
+        if not rules:
+            self.log("適用するルールがありません")
+            self.statusBar().showMessage("ルール未設定")
+            return
+
+        # CsvProcessor はバックグラウンドで実行し、実行中もプレビューは操作できる
+        profiler = None
+        if self.profile_checkbox.isChecked():
+            trace_path = os.path.join(os.path.dirname(self._get_config_path()), "profile_trace.json")
+            profiler = Profiler([LogSink(), ChromeTraceSink(trace_path)])
+            self.log(f"計測結果のトレース: {trace_path}")
+        worker = Worker(
+            self.current_view, rules, cache=self.result_cache, indexes=self.column_indexes, profiler=profiler
+        )
+        self._start_worker(worker, self._on_execute_finished)
 
-            # 適用ルールを取得
-            rules = [self.rule_list.item(i).data(Qt.UserRole) for i in range(self.rule_list.count())]
-            self.log(f"適用ルール数: {len(rules)}")
+    def _on_execute_finished(self, result_view):
+        # 実行前の状態を保存（Undo用）
+        self.history.push(self.current_view)
 
-            if not rules:
-                self.log("適用するルールがありません")
-                self.statusBar().showMessage("ルール未設定")
-                return
+        # プレビュー更新
+        self._set_current(result_view)
 
-            # CsvProcessor で一括実行
-            processor = CsvProcessor(rules, logger=self.log)
-            result_df = processor.execute(self.current_df)
+        self._update_undo_button()
+        self._update_redo_button()
+        self._finish_worker("--- 実行完了 ---")
 
-            # プレビュー更新
-            self.table_view.setModel(DataFrameModel(result_df))
-            self.current_df = result_df
+    def execute_streaming(self):
+        """ファイル全体を読み込まずに、チャンク単位でルールを適用して保存する"""
+        if self._thread is not None:
+            self.log("実行中です")
+            return
 
-            self._update_undo_button()
-            self._update_redo_button()
+        rules = self._current_rules()
+        if not rules:
+            self.log("適用するルールがありません")
+            return
 
-            # 経過時間
-            elapsed = time.perf_counter() - start_time
-            msg = f"実行時間: {elapsed:.4f} 秒"
-            self.log(msg)
-            self.statusBar().showMessage(msg)
-            self.progress_bar.setValue(100)
-            self.log("--- 実行完了 ---")
+        input_path, _ = QFileDialog.getOpenFileName(
+            self, "処理するCSV選択", "", "CSV Files (*.csv)"
+        )
+        if not input_path:
+            return
 
-        except Exception as e:
-            self.log(f"処理エラー: {e}")
+        output_path, _ = QFileDialog.getSaveFileName(
+            self, "結果CSV保存", "", "CSV Files (*.csv)"
+        )
+        if not output_path:
+            return
+
+        self.log("--- ストリーミング実行開始 ---")
+        self._output_path = output_path
+        worker = Worker(None, rules, input_path=input_path, output_path=output_path)
+        self._start_worker(worker, self._on_streaming_finished)
+
+    def _on_streaming_finished(self, rows):
+        self._finish_worker(f"保存完了: {self._output_path} ({rows} 行)")
+
+    # --- バックグラウンド実行 ---
+    def _current_rules(self):
+        return [self.rule_list.item(i).data(Qt.UserRole) for i in range(self.rule_list.count())]
+
+    def _start_worker(self, worker, on_finished):
+        self._start_time = time.perf_counter()
+        self.progress_bar.setValue(0)
+        self.statusBar().showMessage("実行中...")
+        self._set_running(True)
+
+        self._thread = QThread(self)
+        self._worker = worker
+        worker.moveToThread(self._thread)
+        self._thread.started.connect(worker.run)
+        worker.log.connect(self.log)
+        worker.progress.connect(self.progress_bar.setValue)
+        # スロットは MainWindow のメソッドにして GUI スレッドで実行させる
+        worker.rows.connect(self._on_worker_rows)
+        worker.finished.connect(on_finished)
+        worker.failed.connect(self._on_worker_failed)
+        worker.cancelled.connect(self._on_worker_cancelled)
+        self._thread.start()
+
+    def _on_worker_rows(self, rows):
+        self.statusBar().showMessage(f"実行中... {rows:,} 行処理")
+
+    def _on_worker_failed(self, message):
+        self._finish_worker(f"処理エラー: {message}")
+
+    def _on_worker_cancelled(self):
+        self._finish_worker("実行を中止しました")
+
+    def cancel_execution(self):
+        if self._worker is not None:
+            self.log("中止しています...")
+            self._worker.cancel()
+
+    def _finish_worker(self, message):
+        self._thread.quit()
+        self._thread.wait()
+        self._thread.deleteLater()
+        self._worker.deleteLater()
+        self._thread = None
+        self._worker = None
+        self._set_running(False)
+
+        # 経過時間
+        elapsed = time.perf_counter() - self._start_time
+        msg = f"実行時間: {elapsed:.4f} 秒"
+        self.log(msg)
+        self.statusBar().showMessage(msg)
+        self.progress_bar.setValue(100)
+        self.log(message)
+
+    def _set_running(self, running):
+        self.execute_button.setEnabled(not running)
+        self.stream_button.setEnabled(not running)
+        self.load_button.setEnabled(not running)
+        self.cancel_button.setEnabled(running)
+        if running:
+            self.undo_button.setEnabled(False)
+            self.redo_button.setEnabled(False)
+        else:
+            self._update_undo_button()
+            self._update_redo_button()
 
+    def _set_current(self, view):
+        self.current_view = view
+        self.current_df = view.materialize()
+        self._show_df(self.current_df)
 
+    def _show_df(self, df, resize=False):
+        model = DataFrameModel(df)
+        self.table_view.setModel(model)
+        if resize:
+            # resizeColumnsToContents は全行を走査するため、抜き出した行から幅を決める
+            metrics = self.table_view.fontMetrics()
+            for col, width in enumerate(model.estimate_column_widths(metrics)):
+                self.table_view.setColumnWidth(col, width)
 
     def log(self, message: str):
         self.log_output.append(message)
@@ -408,38 +549,44 @@ class MainWindow(QMainWindow):
             self.log(f"自動読込エラー: {e}")
 
     def undo(self):
-        if not self.history:
+        if not self.history.can_undo:
             self.log("戻せる履歴がありません")
             return
-
-        self.future.append(self.current_df.copy())  # ← 追加
-        self.current_df = self.history.pop()
-        self.table_view.setModel(DataFrameModel(self.current_df))
-        self.log("1つ前の状態に戻しました")
-
-        self._update_undo_button()
-        self._update_redo_button()
+        self._restore(lambda view=self.current_view: self.history.undo(view), "1つ前の状態に戻しました")
 
     def _update_undo_button(self):
-        self.undo_button.setEnabled(len(self.history) > 0)
+        self.undo_button.setEnabled(self.history.can_undo)
 
     def redo(self):
-        if not self.future:
+        if not self.history.can_redo:
             self.log("やり直せる履歴がありません")
             return
+        self._restore(lambda view=self.current_view: self.history.redo(view), "やり直しました")
 
-        self.history.append(self.current_df.copy())
-        self.current_df = self.future.pop()
-        self.table_view.setModel(DataFrameModel(self.current_df))
-        self.log("やり直しました")
+    def _restore(self, restore, message):
+        """履歴の状態の読み戻しと実体化はバックグラウンドで行い、できたら表示する"""
+        if self._thread is not None:
+            self.log("実行中です")
+            return
+        self._restore_message = message
+        self._start_worker(RestoreWorker(restore), self._on_restore_finished)
 
-        self._update_undo_button()
-        self._update_redo_button()
+    def _on_restore_finished(self, view):
+        if view.base is not self.history.source:
+            # 履歴から読み戻した表は別の DataFrame なので、前の索引は使わない
+            self.column_indexes.invalidate(view.base)
+        self._set_current(view)
+        self._finish_worker(self._restore_message)
 
     def _update_redo_button(self):
-        self.redo_button.setEnabled(len(self.future) > 0)
+        self.redo_button.setEnabled(self.history.can_redo)
 
     def closeEvent(self, event):
+        if self._worker is not None:
+            self._worker.cancel()
+            self._thread.quit()
+            self._thread.wait()
+        self.history.close()
         self._auto_save_workflow()
         event.accept()
 
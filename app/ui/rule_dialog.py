@@ -3,13 +3,21 @@
 from PySide6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout,
     QPushButton, QLabel, QComboBox,
-    QLineEdit, QWidget, QListWidget, QListWidgetItem
+    QLineEdit, QWidget, QListWidget, QListWidgetItem, QCheckBox, QMessageBox, QFileDialog
 )
 
 from core.rules.drop_column_rule import DropColumnRule
 from core.rules.filter_rule import FilterRule
 from core.rules.sort_rule import SortRule
 from core.rules.rename_column_rule import RenameColumnRule
+from core.rules.expression_rule import ExpressionRule
+from core.rules.limit_rule import LimitRule
+from core.rules.top_n_rule import TopNRule
+from core.rules.aggregate_rule import AggregateRule
+from core.aggregate import FUNCTIONS
+from core.rules.join_rule import JoinRule
+from core.join import JOIN_TYPES
+from core.rules.dedupe_rule import DedupeRule
 
 class RuleDialog(QDialog):
 
@@ -29,7 +37,7 @@ class RuleDialog(QDialog):
 
         # ルール種類選択
         self.rule_type_combo = QComboBox()
-        self.rule_type_combo.addItems(["列削除", "フィルタ", "並び替え", "列名変更"])
+        self.rule_type_combo.addItems(["列削除", "フィルタ", "並び替え", "列名変更", "式", "先頭N件", "上位N件", "集計", "結合", "重複削除"])
         self.layout.addWidget(QLabel("ルール種類"))
         self.layout.addWidget(self.rule_type_combo)
 
@@ -84,24 +92,40 @@ class RuleDialog(QDialog):
             self.filter_column_combo = QComboBox()
             self.filter_column_combo.addItems(self.columns)
             self.operator_combo = QComboBox()
-            self.operator_combo.addItems(["==", "!=", ">", "<", ">=", "<=", "contains"])
+            self.operator_combo.addItems(["==", "!=", ">", "<", ">=", "<=", "contains", "contains_any"])
             self.value_input = QLineEdit()
+            self.value_input.setPlaceholderText("contains_any はカンマ区切りで複数指定")
+            self.regex_checkbox = QCheckBox("正規表現（contains / contains_any）")
             self.config_layout.addWidget(QLabel("列"))
             self.config_layout.addWidget(self.filter_column_combo)
             self.config_layout.addWidget(QLabel("演算子"))
             self.config_layout.addWidget(self.operator_combo)
             self.config_layout.addWidget(QLabel("値"))
             self.config_layout.addWidget(self.value_input)
+            self.config_layout.addWidget(self.regex_checkbox)
 
         elif rule_type == "並び替え":
-            self.sort_column_combo = QComboBox()
-            self.sort_column_combo.addItems(self.columns)
-            self.order_combo = QComboBox()
-            self.order_combo.addItems(["昇順", "降順"])
-            self.config_layout.addWidget(QLabel("列"))
-            self.config_layout.addWidget(self.sort_column_combo)
-            self.config_layout.addWidget(QLabel("順序"))
-            self.config_layout.addWidget(self.order_combo)
+            # キーごとに (列, 順序, 欠損の位置)。第2キーは「（なし）」で使わない
+            self.sort_key_widgets = []
+            for label, optional in (("第1キー", False), ("第2キー（任意）", True)):
+                column_combo = QComboBox()
+                column_combo.addItems((["（なし）"] if optional else []) + list(self.columns))
+                order_combo = QComboBox()
+                order_combo.addItems(["昇順", "降順"])
+                na_combo = QComboBox()
+                na_combo.addItems(["欠損は末尾", "欠損は先頭"])
+                row = QHBoxLayout()
+                row.addWidget(column_combo)
+                row.addWidget(order_combo)
+                row.addWidget(na_combo)
+                row_widget = QWidget()
+                row_widget.setLayout(row)
+                self.config_layout.addWidget(QLabel(label))
+                self.config_layout.addWidget(row_widget)
+                self.sort_key_widgets.append((column_combo, order_combo, na_combo))
+            self.sort_column_combo, self.order_combo, _ = self.sort_key_widgets[0]
+            # 3つ目以降のキー（ワークフロー JSON で指定されたもの）は編集しても保持する
+            self._extra_sort_keys = []
 
         elif rule_type == "列名変更":
             self.rename_column_combo = QComboBox()
@@ -112,6 +136,101 @@ class RuleDialog(QDialog):
             self.config_layout.addWidget(QLabel("新しい列名"))
             self.config_layout.addWidget(self.new_name_input)
 
+        elif rule_type == "式":
+            self.expression_input = QLineEdit()
+            self.expression_input.setPlaceholderText("例: 給与 * 12 > 5000 and 部署 == '営業'")
+            self.target_input = QLineEdit()
+            self.target_input.setPlaceholderText("空欄なら式が真の行に絞り込み")
+            self.config_layout.addWidget(QLabel("式（空白などを含む列名は `列名`）"))
+            self.config_layout.addWidget(self.expression_input)
+            self.config_layout.addWidget(QLabel("計算結果を入れる列"))
+            self.config_layout.addWidget(self.target_input)
+
+        elif rule_type in ("先頭N件", "上位N件"):
+            if rule_type == "上位N件":
+                self.top_column_combo = QComboBox()
+                self.top_column_combo.addItems(self.columns)
+                self.top_order_combo = QComboBox()
+                self.top_order_combo.addItems(["昇順", "降順"])
+                self.config_layout.addWidget(QLabel("列"))
+                self.config_layout.addWidget(self.top_column_combo)
+                self.config_layout.addWidget(QLabel("順序"))
+                self.config_layout.addWidget(self.top_order_combo)
+            self.count_input = QLineEdit("10")
+            self.config_layout.addWidget(QLabel("件数"))
+            self.config_layout.addWidget(self.count_input)
+
+        elif rule_type == "集計":
+            self.group_list_widget = QListWidget()
+            self.group_list_widget.addItems(self.columns)
+            self.group_list_widget.setSelectionMode(QListWidget.MultiSelection)
+            self.config_layout.addWidget(QLabel("グループ化する列（未選択なら全体で1行）"))
+            self.config_layout.addWidget(self.group_list_widget)
+            # 集計ごとに (関数, 列, 出力列名)。第2集計は「（なし）」で使わない
+            self.aggregation_widgets = []
+            for label, optional in (("集計1", False), ("集計2（任意）", True)):
+                func_combo = QComboBox()
+                func_combo.addItems((["（なし）"] if optional else []) + list(FUNCTIONS.values()))
+                column_combo = QComboBox()
+                column_combo.addItems(["（全行）"] + list(self.columns))
+                name_input = QLineEdit()
+                name_input.setPlaceholderText("出力列名（省略可）")
+                row = QHBoxLayout()
+                row.addWidget(func_combo)
+                row.addWidget(column_combo)
+                row.addWidget(name_input)
+                row_widget = QWidget()
+                row_widget.setLayout(row)
+                self.config_layout.addWidget(QLabel(label))
+                self.config_layout.addWidget(row_widget)
+                self.aggregation_widgets.append((func_combo, column_combo, name_input))
+            # 3つ目以降の集計（ワークフロー JSON で指定されたもの）は編集しても保持する
+            self._extra_aggregations = []
+
+        elif rule_type == "結合":
+            self.join_path_input = QLineEdit()
+            self.join_path_input.setPlaceholderText("社員マスタなどの参照CSV")
+            browse_button = QPushButton("参照...")
+            browse_button.clicked.connect(self._browse_join_path)
+            path_row = QHBoxLayout()
+            path_row.addWidget(self.join_path_input)
+            path_row.addWidget(browse_button)
+            path_widget = QWidget()
+            path_widget.setLayout(path_row)
+            self.join_column_combo = QComboBox()
+            self.join_column_combo.addItems(self.columns)
+            self.join_reference_input = QLineEdit()
+            self.join_reference_input.setPlaceholderText("空欄なら入力側と同じ列名")
+            self.join_type_combo = QComboBox()
+            self.join_type_combo.addItems(list(JOIN_TYPES.values()))
+            self.config_layout.addWidget(QLabel("参照CSV"))
+            self.config_layout.addWidget(path_widget)
+            self.config_layout.addWidget(QLabel("キー列"))
+            self.config_layout.addWidget(self.join_column_combo)
+            self.config_layout.addWidget(QLabel("参照CSVのキー列"))
+            self.config_layout.addWidget(self.join_reference_input)
+            self.config_layout.addWidget(QLabel("結合の種類"))
+            self.config_layout.addWidget(self.join_type_combo)
+            # 複数キー・取り出す列の指定（ワークフロー JSON で指定されたもの）は編集しても保持する
+            self._join_rule = None
+
+        elif rule_type == "重複削除":
+            self.dedupe_list_widget = QListWidget()
+            self.dedupe_list_widget.addItems(self.columns)
+            self.dedupe_list_widget.setSelectionMode(QListWidget.MultiSelection)
+            self.keep_combo = QComboBox()
+            self.keep_combo.addItems(["最初の行を残す", "最後の行を残す"])
+            self.config_layout.addWidget(QLabel("重複を判定する列（未選択なら全列）"))
+            self.config_layout.addWidget(self.dedupe_list_widget)
+            self.config_layout.addWidget(self.keep_combo)
+            # 近似モードの指定（ワークフロー JSON で指定されたもの）は編集しても保持する
+            self._dedupe_rule = None
+
+    def _browse_join_path(self):
+        path, _ = QFileDialog.getOpenFileName(self, "参照CSVを選択", "", "CSV Files (*.csv)")
+        if path:
+            self.join_path_input.setText(path)
+
     def _create_rule(self):
         rule_type = self.rule_type_combo.currentText()
         if rule_type == "列削除":
@@ -122,23 +241,98 @@ class RuleDialog(QDialog):
             column = self.filter_column_combo.currentText()
             operator = self.operator_combo.currentText()
             value = self.value_input.text()
-            # 数値なら変換
-            try:
-                value = int(value)
-            except:
+            if operator == "contains_any":
+                value = [v.strip() for v in value.split(",") if v.strip()]
+            elif operator != "contains":
+                # 数値なら変換
                 try:
-                    value = float(value)
+                    value = int(value)
                 except:
-                    pass
-            self.selected_rule = FilterRule(column, operator, value)
+                    try:
+                        value = float(value)
+                    except:
+                        pass
+            self.selected_rule = FilterRule(column, operator, value, self.regex_checkbox.isChecked())
         elif rule_type == "並び替え":
-            column = self.sort_column_combo.currentText()
-            ascending = self.order_combo.currentText() == "昇順"
-            self.selected_rule = SortRule(column, ascending)
+            keys = []
+            for column_combo, order_combo, na_combo in self.sort_key_widgets:
+                if column_combo.currentText() == "（なし）":
+                    continue
+                keys.append((
+                    column_combo.currentText(),
+                    order_combo.currentText() == "昇順",
+                    "first" if na_combo.currentText() == "欠損は先頭" else "last",
+                ))
+            keys.extend(self._extra_sort_keys)
+            columns, ascending, na_position = zip(*keys)
+            self.selected_rule = SortRule(list(columns), list(ascending), na_position=list(na_position))
         elif rule_type == "列名変更":
             old = self.rename_column_combo.currentText()
             new = self.new_name_input.text()
             self.selected_rule = RenameColumnRule(old, new)
+        elif rule_type == "式":
+            rule = ExpressionRule(self.expression_input.text().strip(), self.target_input.text().strip())
+            try:
+                rule.compiled()
+            except ValueError as e:
+                QMessageBox.warning(self, "式の誤り", str(e))
+                return
+            self.selected_rule = rule
+        elif rule_type in ("先頭N件", "上位N件"):
+            try:
+                count = int(self.count_input.text())
+            except ValueError:
+                QMessageBox.warning(self, "件数の誤り", "件数は整数で入力してください")
+                return
+            if rule_type == "先頭N件":
+                self.selected_rule = LimitRule(count)
+            else:
+                ascending = self.top_order_combo.currentText() == "昇順"
+                self.selected_rule = TopNRule(self.top_column_combo.currentText(), ascending, count)
+        elif rule_type == "集計":
+            keys = [item.text() for item in self.group_list_widget.selectedItems()]
+            functions = {label: func for func, label in FUNCTIONS.items()}
+            aggregations = []
+            for func_combo, column_combo, name_input in self.aggregation_widgets:
+                if func_combo.currentText() == "（なし）":
+                    continue
+                column = column_combo.currentText()
+                aggregations.append((
+                    None if column == "（全行）" else column,
+                    functions[func_combo.currentText()],
+                    name_input.text().strip() or None,
+                ))
+            aggregations.extend(self._extra_aggregations)
+            try:
+                self.selected_rule = AggregateRule(keys, aggregations)
+            except ValueError as e:
+                QMessageBox.warning(self, "集計の誤り", str(e))
+                return
+        elif rule_type == "結合":
+            path = self.join_path_input.text().strip()
+            if not path:
+                QMessageBox.warning(self, "結合の誤り", "参照CSVを指定してください")
+                return
+            how = {label: how for how, label in JOIN_TYPES.items()}[self.join_type_combo.currentText()]
+            on = [self.join_column_combo.currentText()]
+            reference_on = [self.join_reference_input.text().strip() or on[0]]
+            columns, suffix = None, "_参照"
+            previous = self._join_rule
+            if previous is not None:
+                on += previous.on[1:]
+                reference_on += previous.reference_on[1:]
+                columns, suffix = previous.columns_to_add, previous.suffix
+            self.selected_rule = JoinRule(path, on, how, reference_on, columns, suffix)
+        elif rule_type == "重複削除":
+            columns = [item.text() for item in self.dedupe_list_widget.selectedItems()] or None
+            keep = "first" if self.keep_combo.currentText() == "最初の行を残す" else "last"
+            previous = self._dedupe_rule
+            if previous is not None:
+                self.selected_rule = DedupeRule(
+                    columns, keep, previous.expected_keys, previous.error_rate, previous.memory_budget
+                )
+            else:
+                self.selected_rule = DedupeRule(columns, keep)
         self.accept()
 
     def get_rule(self):
@@ -161,19 +355,80 @@ class RuleDialog(QDialog):
             if rule.column in df_columns:
                 self.filter_column_combo.setCurrentText(rule.column)
             self.operator_combo.setCurrentText(rule.operator)
-            self.value_input.setText(str(rule.value))
+            if rule.operator == "contains_any":
+                self.value_input.setText(", ".join(map(str, rule.value)))
+            else:
+                self.value_input.setText(str(rule.value))
+            self.regex_checkbox.setChecked(rule.regex)
         elif isinstance(rule, SortRule):
             self.rule_type_combo.setCurrentText("並び替え")
             self._update_config_ui()
-            if rule.column in df_columns:
-                self.sort_column_combo.setCurrentText(rule.column)
-            self.order_combo.setCurrentText("昇順" if rule.ascending else "降順")
+            for (column_combo, order_combo, na_combo), (column, ascending, na_position) in zip(
+                self.sort_key_widgets, rule.keys
+            ):
+                if column in df_columns:
+                    column_combo.setCurrentText(column)
+                order_combo.setCurrentText("昇順" if ascending else "降順")
+                na_combo.setCurrentText("欠損は先頭" if na_position == "first" else "欠損は末尾")
+            self._extra_sort_keys = rule.keys[len(self.sort_key_widgets):]
         elif isinstance(rule, RenameColumnRule):
             self.rule_type_combo.setCurrentText("列名変更")
             self._update_config_ui()
             if rule.old_name in df_columns:
                 self.rename_column_combo.setCurrentText(rule.old_name)
             self.new_name_input.setText(rule.new_name)
+        elif isinstance(rule, ExpressionRule):
+            self.rule_type_combo.setCurrentText("式")
+            self._update_config_ui()
+            self.expression_input.setText(rule.expression)
+            self.target_input.setText(rule.target or "")
+        elif isinstance(rule, LimitRule):
+            self.rule_type_combo.setCurrentText("先頭N件")
+            self._update_config_ui()
+            self.count_input.setText(str(rule.count))
+        elif isinstance(rule, TopNRule):
+            self.rule_type_combo.setCurrentText("上位N件")
+            self._update_config_ui()
+            if rule.columns[0] in df_columns:
+                self.top_column_combo.setCurrentText(rule.columns[0])
+            self.top_order_combo.setCurrentText("昇順" if rule.ascending[0] else "降順")
+            self.count_input.setText(str(rule.count))
+        elif isinstance(rule, AggregateRule):
+            self.rule_type_combo.setCurrentText("集計")
+            self._update_config_ui()
+            for i in range(self.group_list_widget.count()):
+                item = self.group_list_widget.item(i)
+                if item.text() in rule.keys:
+                    item.setSelected(True)
+            for (func_combo, column_combo, name_input), (column, func, name) in zip(
+                self.aggregation_widgets, rule.aggregations
+            ):
+                func_combo.setCurrentText(FUNCTIONS[func])
+                if column is None:
+                    column_combo.setCurrentText("（全行）")
+                elif column in df_columns:
+                    column_combo.setCurrentText(column)
+                name_input.setText(name)
+            self._extra_aggregations = rule.aggregations[len(self.aggregation_widgets):]
+        elif isinstance(rule, JoinRule):
+            self.rule_type_combo.setCurrentText("結合")
+            self._update_config_ui()
+            self.join_path_input.setText(rule.path)
+            if rule.on[0] in df_columns:
+                self.join_column_combo.setCurrentText(rule.on[0])
+            if rule.reference_on[0] != rule.on[0]:
+                self.join_reference_input.setText(rule.reference_on[0])
+            self.join_type_combo.setCurrentText(JOIN_TYPES[rule.how])
+            self._join_rule = rule
+        elif isinstance(rule, DedupeRule):
+            self.rule_type_combo.setCurrentText("重複削除")
+            self._update_config_ui()
+            for i in range(self.dedupe_list_widget.count()):
+                item = self.dedupe_list_widget.item(i)
+                if rule.columns is not None and item.text() in rule.columns:
+                    item.setSelected(True)
+            self.keep_combo.setCurrentText("最初の行を残す" if rule.keep == "first" else "最後の行を残す")
+            self._dedupe_rule = rule
 
         self.selected_rule = rule
 